@@ -1,72 +1,32 @@
 import pygame
-import random
 import textwrap
-from pygame import mixer
-
-class TextBox:
-    def __init__(self, x, y, width, height):
-        self.rect = pygame.Rect(x, y, width, height)
-        self.text = ""
-        self.rendered_text = []
-        self.text_content = []
-        self.reveal_index = 0
-        self.line_spacing = 10
-        self.font = pygame.font.Font(None, 40)
-
-    def set_text(self, text):
-        self.text = text
-        self.rendered_text = []
-        self.text_content = []
-        wrapped_text = self.wrap_text(text, self.rect.width - 20)
-        for line in wrapped_text:
-            self.rendered_text.append(self.font.render(line, True, (255, 255, 255)))
-            self.text_content.append(line)
-        self.reveal_index = 0
-
-    def wrap_text(self, text, max_width):
-        words = text.split(' ')
-        wrapped_lines = []
-        current_line = ""
-        for word in words:
-            test_line = current_line + word + " "
-            if self.font.size(test_line)[0] <= max_width:
-                current_line = test_line
-            else:
-                wrapped_lines.append(current_line.strip())
-                current_line = word + " "
-        wrapped_lines.append(current_line.strip())
-        return wrapped_lines
-
-    def update(self):
-        self.reveal_index += 1
-
-    def draw(self, surface):
-        pygame.draw.rect(surface, (0, 0, 0), self.rect)
-        pygame.draw.rect(surface, (255, 255, 255), self.rect, 3)
-
-        y = self.rect.top + 10
-        for i, (line, content) in enumerate(zip(self.rendered_text, self.text_content)):
-            x = self.rect.left + 10
-            if i * len(content) < self.reveal_index:
-                surface.blit(line, (x, y))
-                y += line.get_height() + self.line_spacing
-
-    def is_finished(self):
-        return self.reveal_index >= sum(len(line) for line in self.text_content)
-
+from textcache import texts
+from textbox import TextBox
+from music import music
+from sounds import sounds
+from scenes import SceneManager
+from runtime import runtime
+from replay import inputs
+from render import Renderer
+from loop import FixedStep
+
+# Decoded ahead of time while the stage is highlighted in the level menu
+PRELOAD_IMAGES = []
+PRELOAD_SOUNDS = ['src/jumpshort.mp3', 'src/explosion.wav']
+MUSIC = None
 
 class Earth:
-    def __init__(self):
-        # Initialize Pygame and Mixer
-        pygame.init()
-        mixer.init()
-
-        # Set up the display
-        info = pygame.display.Info()
-        self.WIDTH = info.current_w
-        self.HEIGHT = info.current_h
-
-        self.screen = pygame.display.set_mode((self.WIDTH, self.HEIGHT))
+    def __init__(self, screen):
+        # Shared display surface
+        self.screen = screen
+        # The whole scene moves every frame, so there are no dirty rectangles to track
+        self.renderer = Renderer(screen, dirty=False)
+        # Seeded by the runtime, so a run can be reproduced
+        self.rng = runtime.rng
+        self.WIDTH, self.HEIGHT = screen.get_size()
+        # Sizes, distances and speeds below are for a 1080-line screen and are
+        # scaled to this one, so the stage looks and plays the same at any resolution
+        self.scale = self.HEIGHT / 1080
         pygame.display.set_caption("2D Airplane Dodge")
 
         # Colors
@@ -78,94 +38,153 @@ class Earth:
         self.GREEN = (0, 255, 0)
 
         # Player
-        self.player_width = 80
-        self.player_height = 40
+        self.player_width = int(80 * self.scale)
+        self.player_height = int(40 * self.scale)
         self.player_x = self.WIDTH // 4
         self.player_y = self.HEIGHT // 2
-        self.player_speed = 8
-        self.player_jump = -15
-        self.gravity = 1
+        self.player_speed = 8 * self.scale
+        self.player_jump = -15 * self.scale
+        self.gravity = 1 * self.scale
+        self.player_vel = 0
+        self.previous_player_y = self.player_y
 
         # Buildings
-        self.building_width = 150
-        self.building_min_height = 200
-        self.building_max_height = 500
+        self.building_width = int(150 * self.scale)
+        self.building_min_height = int(200 * self.scale)
+        self.building_max_height = int(500 * self.scale)
+        self.building_spacing = int(300 * self.scale)
         self.buildings = []
 
         # Game variables
-        self.scroll_speed = 5
+        self.scroll_speed = 5 * self.scale
         self.score = 0
         self.game_over = False
+        self.victory = False
         self.paused = False
 
+        # Gravity, scrolling and scoring run at a fixed 60 ticks per second
+        self.loop = FixedStep(tick_rate=60)
+
         # Load sounds
-        self.jump_sound = mixer.Sound('src/jumpshort.mp3')
-        self.explosion_sound = mixer.Sound('src/explosion.wav')
+        sounds.preload(['jump', 'explosion'])
+
+        # This stage has no music, so fade out the menu's
+        music.stop()
 
         # Create initial buildings
         self.create_buildings()
 
-        self.text_box = TextBox(50, self.HEIGHT-250, self.WIDTH-100, 200)
+        self.text_box = TextBox(int(50 * self.scale), self.HEIGHT - int(250 * self.scale),
+                                self.WIDTH - int(100 * self.scale), int(200 * self.scale), int(40 * self.scale),
+                                line_spacing=int(10 * self.scale))
         self.game_state = "intro"
         self.intro_text = "Here we are! John, your mission is to navigate through the city. Avoid buildings and reach a score of 20 to win!"
         self.victory_text = "Congratulations! You've successfully completed the Earth stage! Obtained the Aries gem"
         self.defeat_text = "Mission failed. Watch out, John. Try again!"
 
     def draw_airplane(self, surface, x, y):
+        s = self.scale
         # Body
-        pygame.draw.rect(surface, self.WHITE, (x, y + 10, self.player_width, 20))
-        pygame.draw.polygon(surface, self.WHITE, [(x + self.player_width, y + 10), (x + self.player_width + 20, y + 20),
-                                                  (x + self.player_width, y + 30)])
-        pygame.draw.polygon(surface, self.WHITE, [(x, y + 10), (x - 20, y), (x, y + 20)])
-        pygame.draw.polygon(surface, self.WHITE, [(x, y + 30), (x - 20, y + 40), (x, y + 50)])
+        pygame.draw.rect(surface, self.WHITE, (x, y + 10 * s, self.player_width, 20 * s))
+        pygame.draw.polygon(surface, self.WHITE, [(x + self.player_width, y + 10 * s), (x + self.player_width + 20 * s, y + 20 * s),
+                                                  (x + self.player_width, y + 30 * s)])
+        pygame.draw.polygon(surface, self.WHITE, [(x, y + 10 * s), (x - 20 * s, y), (x, y + 20 * s)])
+        pygame.draw.polygon(surface, self.WHITE, [(x, y + 30 * s), (x - 20 * s, y + 40 * s), (x, y + 50 * s)])
         # Cockpit
-        pygame.draw.rect(surface, self.RED, (x + 50, y + 10, 20, 20))
+        pygame.draw.rect(surface, self.RED, (x + 50 * s, y + 10 * s, 20 * s, 20 * s))
 
     def draw_building(self, surface, x, y, width, height, color):
+        s = self.scale
         # Front face
         pygame.draw.rect(surface, color, (x, y, width, height))
         # Windows
-        for row in range(5, height, 40):
-            for col in range(20, width, 80):
-                pygame.draw.rect(surface, self.SKY_BLUE, (x + col, y + row, 40, 30))
-                pygame.draw.rect(surface, self.DARK_GRAY, (x + col, y + row, 40, 30), 2)
+        for row in range(int(5 * s), height, int(40 * s)):
+            for col in range(int(20 * s), width, int(80 * s)):
+                pygame.draw.rect(surface, self.SKY_BLUE, (x + col, y + row, 40 * s, 30 * s))
+                pygame.draw.rect(surface, self.DARK_GRAY, (x + col, y + row, 40 * s, 30 * s), max(1, int(2 * s)))
 
     def create_buildings(self):
         self.buildings = []
         for i in range(6):
-            height = random.randint(self.building_min_height, self.building_max_height)
-            x = self.WIDTH + i * 300
+            height = self.rng.randint(self.building_min_height, self.building_max_height)
+            x = self.WIDTH + i * self.building_spacing
             y = self.HEIGHT - height
             self.buildings.append({'x': x, 'y': y, 'height': height})
 
     def draw_pause_menu(self):
-        font = pygame.font.Font(None, 72)
-        pause_text = font.render("Paused", True, self.DARK_GRAY)
-        resume_text = font.render("Resume (Press R)", True, self.DARK_GRAY)
-        restart_text = font.render("Restart (Press N)", True, self.DARK_GRAY)
-        quit_text = font.render("Quit (Press Q)", True, self.DARK_GRAY)
-
-        menu_width = 600
-        menu_height = 400
+        font = texts.font(None, int(72 * self.scale))
+        pause_text = texts.render(font, "Paused", True, self.DARK_GRAY)
+        resume_text = texts.render(font, "Resume (Press R)", True, self.DARK_GRAY)
+        restart_text = texts.render(font, "Restart (Press N)", True, self.DARK_GRAY)
+        quit_text = texts.render(font, "Quit (Press Q)", True, self.DARK_GRAY)
+
+        menu_width = int(600 * self.scale)
+        menu_height = int(400 * self.scale)
         menu_x = (self.WIDTH - menu_width) // 2
         menu_y = (self.HEIGHT - menu_height) // 2
 
         pygame.draw.rect(self.screen, self.WHITE, (menu_x, menu_y, menu_width, menu_height))
-        self.screen.blit(pause_text, (self.WIDTH // 2 - pause_text.get_width() // 2, menu_y + 50))
-        self.screen.blit(resume_text, (self.WIDTH // 2 - resume_text.get_width() // 2, menu_y + 150))
-        self.screen.blit(restart_text, (self.WIDTH // 2 - restart_text.get_width() // 2, menu_y + 250))
-        self.screen.blit(quit_text, (self.WIDTH // 2 - quit_text.get_width() // 2, menu_y + 350))
+        self.screen.blit(pause_text, (self.WIDTH // 2 - pause_text.get_width() // 2, menu_y + int(50 * self.scale)))
+        self.screen.blit(resume_text, (self.WIDTH // 2 - resume_text.get_width() // 2, menu_y + int(150 * self.scale)))
+        self.screen.blit(restart_text, (self.WIDTH // 2 - restart_text.get_width() // 2, menu_y + int(250 * self.scale)))
+        self.screen.blit(quit_text, (self.WIDTH // 2 - quit_text.get_width() // 2, menu_y + int(350 * self.scale)))
+
+    def update(self):
+        if self.game_over or self.game_state != "playing":
+            return
+        self.previous_player_y = self.player_y
+
+        # Apply gravity
+        self.player_vel += self.gravity
+        self.player_y += self.player_vel
+
+        # Move buildings
+        for building in self.buildings:
+            building['x'] -= self.scroll_speed
+
+        # Remove off-screen buildings and add new ones
+        if self.buildings[0]['x'] < -self.building_width:
+            self.buildings.pop(0)
+            height = self.rng.randint(self.building_min_height, self.building_max_height)
+            x = self.buildings[-1]['x'] + self.building_spacing
+            y = self.HEIGHT - height
+            self.buildings.append({'x': x, 'y': y, 'height': height})
+            self.score += 1
+
+        # Check for collision
+        for building in self.buildings:
+            if (self.player_x + self.player_width > building['x'] and
+                    self.player_x < building['x'] + self.building_width and
+                    self.player_y + self.player_height > building['y']):
+                # Play explosion sound
+                sounds.play('explosion')
+                self.game_over = True
+
+        # Check for hitting the ground or going too high
+        if self.player_y + self.player_height > self.HEIGHT or self.player_y < 0:
+            # Play explosion sound
+            sounds.play('explosion')
+            self.game_over = True
+
+        # Check if score reaches 20 for victory condition
+        if self.score >= 20:
+            self.game_over = True
+            self.victory = True
+            self.game_state = "victory"
+            self.text_box.set_text(self.victory_text)
+
+        # Check if game is over (not victory)
+        if self.game_over and not self.victory:
+            self.game_state = "defeat"
+            self.text_box.set_text(self.defeat_text)
 
     def main(self):
-        clock = pygame.time.Clock()
         running = True
-        player_vel = 0
-        victory = False
 
         self.text_box.set_text(self.intro_text)
 
         while running:
-            for event in pygame.event.get():
+            for event in inputs.events():
                 if event.type == pygame.QUIT:
                     running = False
 
@@ -176,17 +195,18 @@ class Earth:
                         if self.text_box.is_finished():
                             self.game_state = "playing"
                         else:
-                            self.text_box.reveal_index = sum(len(line) for line in self.text_box.text_content)
+                            self.text_box.reveal_all()
                     elif self.game_state == "playing" and event.key == pygame.K_SPACE:
-                        self.jump_sound.play()
-                        player_vel = self.player_jump
+                        sounds.play('jump')
+                        self.player_vel = self.player_jump
                     elif self.game_state in ["victory", "defeat"]:
                         if event.key == pygame.K_r:
                             self.game_over = False
                             self.score = 0
-                            victory = False
+                            self.victory = False
                             self.player_y = self.HEIGHT // 2
-                            player_vel = 0
+                            self.previous_player_y = self.player_y
+                            self.player_vel = 0
                             self.create_buildings()
                             self.game_state = "intro"
                             self.text_box.set_text(self.intro_text)
@@ -194,50 +214,9 @@ class Earth:
                             return "main_menu"
 
             if not self.paused and self.game_state == "playing":
-                if not self.game_over:
-                    # Apply gravity
-                    player_vel += self.gravity
-                    self.player_y += player_vel
-
-                    # Move buildings
-                    for building in self.buildings:
-                        building['x'] -= self.scroll_speed
-
-                    # Remove off-screen buildings and add new ones
-                    if self.buildings[0]['x'] < -self.building_width:
-                        self.buildings.pop(0)
-                        height = random.randint(self.building_min_height, self.building_max_height)
-                        x = self.buildings[-1]['x'] + 300
-                        y = self.HEIGHT - height
-                        self.buildings.append({'x': x, 'y': y, 'height': height})
-                        self.score += 1
-
-                    # Check for collision
-                    for building in self.buildings:
-                        if (self.player_x + self.player_width > building['x'] and
-                                self.player_x < building['x'] + self.building_width and
-                                self.player_y + self.player_height > building['y']):
-                            # Play explosion sound
-                            self.explosion_sound.play()
-                            self.game_over = True
-
-                    # Check for hitting the ground or going too high
-                    if self.player_y + self.player_height > self.HEIGHT or self.player_y < 0:
-                        # Play explosion sound
-                        self.explosion_sound.play()
-                        self.game_over = True
-
-                    # Check if score reaches 20 for victory condition
-                    if self.score >= 20:
-                        self.game_over = True
-                        victory = True
-                        self.game_state = "victory"
-                        self.text_box.set_text(self.victory_text)
-
-                    # Check if game is over (not victory)
-                    if self.game_over and not victory:
-                        self.game_state = "defeat"
-                        self.text_box.set_text(self.defeat_text)
+                self.loop.step(self.update)
+            else:
+                self.loop.hold()
 
             # Clear the screen
             self.screen.fill(self.SKY_BLUE)
@@ -246,18 +225,21 @@ class Earth:
                 self.text_box.update()
                 self.text_box.draw(self.screen)
             elif self.game_state == "playing":
+                # Draw between the last two ticks; buildings scroll by a constant amount per tick
+                scroll = 0 if self.game_over else self.scroll_speed * (1 - self.loop.alpha)
+
                 # Draw buildings
                 for building in self.buildings:
-                    self.draw_building(self.screen, building['x'], building['y'],
+                    self.draw_building(self.screen, building['x'] + scroll, building['y'],
                                        self.building_width, building['height'], self.GRAY)
 
                 # Draw player
-                self.draw_airplane(self.screen, self.player_x, self.player_y)
+                self.draw_airplane(self.screen, self.player_x, self.loop.lerp(self.previous_player_y, self.player_y))
 
                 # Draw score
-                font = pygame.font.Font(None, 72)
-                score_text = font.render(f"Score: {self.score}", True, self.WHITE)
-                self.screen.blit(score_text, (30, 30))
+                font = texts.font(None, int(72 * self.scale))
+                score_text = texts.render(font, f"Score: {self.score}", True, self.WHITE)
+                self.screen.blit(score_text, (int(30 * self.scale), int(30 * self.scale)))
 
             elif self.game_state in ["victory", "defeat"]:
                 # Game over or Victory screen
@@ -265,23 +247,23 @@ class Earth:
                                  (self.WIDTH // 4, self.HEIGHT // 4, self.WIDTH // 2, self.HEIGHT // 2))
 
                 # Main game over text
-                font_large = pygame.font.Font(None, 96)
-                if victory:
-                    game_over_text = font_large.render("Congratulations!", True, self.GREEN)
+                font_large = texts.font(None, int(96 * self.scale))
+                if self.victory:
+                    game_over_text = texts.render(font_large, "Congratulations!", True, self.GREEN)
                 else:
-                    game_over_text = font_large.render("Game Over", True, self.RED)
+                    game_over_text = texts.render(font_large, "Game Over", True, self.RED)
                 self.screen.blit(game_over_text, (self.WIDTH // 2 - game_over_text.get_width() // 2,
                                                   self.HEIGHT // 3 - game_over_text.get_height() // 2))
 
                 # Restart and Quit options
-                font_small = pygame.font.Font(None, 54)
-                restart_text = font_small.render("Press R to Restart", True, self.DARK_GRAY)
-                quit_text = font_small.render("Press Q to Quit", True, self.DARK_GRAY)
+                font_small = texts.font(None, int(54 * self.scale))
+                restart_text = texts.render(font_small, "Press R to Restart", True, self.DARK_GRAY)
+                quit_text = texts.render(font_small, "Press Q to Quit", True, self.DARK_GRAY)
                 self.screen.blit(restart_text,
                                  (self.WIDTH // 2 - restart_text.get_width() // 2,
-                                  self.HEIGHT // 3 + game_over_text.get_height() + 50))
+                                  self.HEIGHT // 3 + game_over_text.get_height() + int(50 * self.scale)))
                 self.screen.blit(quit_text, (self.WIDTH // 2 - quit_text.get_width() // 2,
-                                             self.HEIGHT // 3 + game_over_text.get_height() + restart_text.get_height() + 100))
+                                             self.HEIGHT // 3 + game_over_text.get_height() + restart_text.get_height() + int(100 * self.scale)))
 
                 # Display the text box with victory/defeat text
                 self.text_box.update()
@@ -291,15 +273,16 @@ class Earth:
                 # Draw pause menu
                 self.draw_pause_menu()
 
-                keys = pygame.key.get_pressed()
+                keys = inputs.pressed()
                 if keys[pygame.K_r]:
                     self.paused = False
                 elif keys[pygame.K_n]:
                     self.game_over = False
                     self.score = 0
-                    victory = False
+                    self.victory = False
                     self.player_y = self.HEIGHT // 2
-                    player_vel = 0
+                    self.previous_player_y = self.player_y
+                    self.player_vel = 0
                     self.create_buildings()
                     self.paused = False
                     self.game_state = "intro"
@@ -308,14 +291,13 @@ class Earth:
                     return "main_menu"
 
             # Update the display
-            pygame.display.flip()
+            self.renderer.present()
 
             # Control the game speed
-            clock.tick(60)
+            runtime.tick(60)
 
-        # Quit the game
-        pygame.quit()
+        # Window closed
+        return "quit"
 
 if __name__ == "__main__":
-    game = Earth()
-    game.main()
\ No newline at end of file
+    SceneManager().run("earth")
\ No newline at end of file
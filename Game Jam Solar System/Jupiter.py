@@ -1,88 +1,47 @@
 import pygame
-import random
-from pygame import mixer
 import textwrap
-
-
-class TextBox:
-    def __init__(self, x, y, width, height, screen_width, screen_height):
-        self.rect = pygame.Rect(int(x * screen_width), int(y * screen_height),
-                                int(width * screen_width), int(height * screen_height))
-        self.text = ""
-        self.rendered_text = []
-        self.text_content = []
-        self.reveal_index = 0
-        self.line_spacing = 5
-        self.font = pygame.font.Font(None, int(screen_height * 0.04))
-
-    def set_text(self, text):
-        self.text = text
-        self.rendered_text = []
-        self.text_content = []
-        wrapped_text = self.wrap_text(text, self.rect.width - 20)
-        for line in wrapped_text:
-            self.rendered_text.append(self.font.render(line, True, (255, 255, 255)))
-            self.text_content.append(line)
-        self.reveal_index = 0
-
-    def wrap_text(self, text, max_width):
-        words = text.split(' ')
-        wrapped_lines = []
-        current_line = ""
-        for word in words:
-            test_line = current_line + word + " "
-            if self.font.size(test_line)[0] <= max_width:
-                current_line = test_line
-            else:
-                wrapped_lines.append(current_line.strip())
-                current_line = word + " "
-        wrapped_lines.append(current_line.strip())
-        return wrapped_lines
-
-    def update(self):
-        self.reveal_index += 1
-
-    def draw(self, surface):
-        pygame.draw.rect(surface, (0, 0, 0), self.rect)
-        pygame.draw.rect(surface, (255, 255, 255), self.rect, 3)
-
-        y = self.rect.top + 10
-        for i, (line, content) in enumerate(zip(self.rendered_text, self.text_content)):
-            x = self.rect.left + 10
-            if i * len(content) < self.reveal_index:
-                surface.blit(line, (x, y))
-                y += line.get_height() + self.line_spacing
-
-    def is_finished(self):
-        return self.reveal_index >= sum(len(line) for line in self.text_content)
+from assets import assets
+from textcache import texts
+from modal import Modal
+from textbox import TextBox
+from music import music
+from scenes import SceneManager
+from runtime import runtime
+from replay import inputs
+from render import Renderer
+
+# Decoded ahead of time while the stage is highlighted in the level menu
+PRELOAD_IMAGES = ['src/Jupiterbackground.jpg']
+PRELOAD_SOUNDS = []
+MUSIC = 'src/Jupiter.mp3'
 
 
 class Jupiter:
-    def __init__(self):
-        # Initialize Pygame
-        pygame.init()
-        info = pygame.display.Info()
-        self.WIDTH, self.HEIGHT = info.current_w, info.current_h
-        self.screen = pygame.display.set_mode((self.WIDTH, self.HEIGHT))
+    def __init__(self, screen):
+        # Shared display surface
+        self.screen = screen
+        # Seeded by the runtime, so a run can be reproduced
+        self.rng = runtime.rng
+        self.WIDTH, self.HEIGHT = screen.get_size()
         pygame.display.set_caption("Balance the Stones")
 
         # Load background image
         try:
-            self.background = pygame.image.load('src/Jupiterbackground.jpg')
-            self.background = pygame.transform.scale(self.background, (self.WIDTH, self.HEIGHT))
+            self.background = assets.background('src/Jupiterbackground.jpg', (self.WIDTH, self.HEIGHT))
         except pygame.error as e:
             print(f"Unable to load background image: {e}")
             self.background = pygame.Surface((self.WIDTH, self.HEIGHT))
             self.background.fill((0, 0, 0))  # Fill with black if image fails to load
+        self.renderer = Renderer(self.screen, self.background)
+        # Pause menu, and the result screen over a white veil
+        self.pause_modal = Modal()
+        self.result_modal = Modal((255, 255, 255, 180))
 
         # Load and play background music
-        try:
-            mixer.music.load('src/Jupiter.mp3')
-            mixer.music.play(-1)
-        except pygame.error as e:
-            print(f"Unable to load music file: {e}")
+        music.play(MUSIC)
 
-        self.text_box = TextBox(0.04, 0.75, 0.92, 0.19, self.WIDTH, self.HEIGHT)
+        self.text_box = TextBox(int(0.04 * self.WIDTH), int(0.75 * self.HEIGHT), int(0.92 * self.WIDTH),
+                                int(0.19 * self.HEIGHT), int(0.04 * self.HEIGHT))
         self.game_state = "intro"
         self.intro_text = "Welcome to Jupiter! John, your mission is to use the scale to find out the correct weights of the stones."
         self.victory_text = "Congratulations! You've successfully completed the Jupiter stage! Obtained the Libra gem"
@@ -100,8 +59,8 @@ class Jupiter:
         self.PINK = (238, 25, 91, 255)
 
         # Fonts
-        self.font = pygame.font.Font(None, int(self.HEIGHT * 0.09))
-        self.small_font = pygame.font.Font(None, int(self.HEIGHT * 0.045))
+        self.font = texts.font(None, int(self.HEIGHT * 0.09))
+        self.small_font = texts.font(None, int(self.HEIGHT * 0.045))
 
         # Fixed weights for the stones
         self.gold_weight = 7
@@ -114,17 +73,7 @@ class Jupiter:
         self.copper_guess = ""
 
         # Initialize stones
-        self.stones = []
-        for i in range(10):
-            self.stones.append(
-                self.Stone(0.08 + random.uniform(-0.02, 0.02), 0.875 + random.uniform(-0.025, 0.025), self.GOLD,
-                           self.gold_weight, self.WIDTH, self.HEIGHT))
-            self.stones.append(
-                self.Stone(0.17 + random.uniform(-0.02, 0.02), 0.875 + random.uniform(-0.025, 0.025), self.SILVER,
-                           self.silver_weight, self.WIDTH, self.HEIGHT))
-            self.stones.append(
-                self.Stone(0.25 + random.uniform(-0.02, 0.02), 0.875 + random.uniform(-0.025, 0.025), self.COPPER,
-                           self.copper_weight, self.WIDTH, self.HEIGHT))
+        self.stones = self.create_stones()
 
         self.left_weight = 0
         self.right_weight = 0
@@ -134,6 +83,21 @@ class Jupiter:
         self.current_stone = None
         self.correct = False
 
+    def create_stones(self):
+        # Ten of each stone, scattered a little around their piles
+        stones = []
+        for i in range(10):
+            stones.append(
+                self.Stone(0.08 + self.rng.uniform(-0.02, 0.02), 0.875 + self.rng.uniform(-0.025, 0.025), self.GOLD,
+                           self.gold_weight, self.WIDTH, self.HEIGHT))
+            stones.append(
+                self.Stone(0.17 + self.rng.uniform(-0.02, 0.02), 0.875 + self.rng.uniform(-0.025, 0.025), self.SILVER,
+                           self.silver_weight, self.WIDTH, self.HEIGHT))
+            stones.append(
+                self.Stone(0.25 + self.rng.uniform(-0.02, 0.02), 0.875 + self.rng.uniform(-0.025, 0.025), self.COPPER,
+                           self.copper_weight, self.WIDTH, self.HEIGHT))
+        return stones
+
     class Stone:
         def __init__(self, x, y, color, weight, screen_width, screen_height):
             self.x = int(x * screen_width)
@@ -145,7 +109,7 @@ class Jupiter:
             self.side = None
 
         def draw(self, screen):
-            pygame.draw.circle(screen, self.color, (self.x, self.y), self.radius)
+            return pygame.draw.circle(screen, self.color, (self.x, self.y), self.radius)
 
         def is_mouse_on_stone(self, pos):
             return (self.x - pos[0]) ** 2 + (self.y - pos[1]) ** 2 < self.radius ** 2
@@ -199,37 +163,45 @@ class Jupiter:
         self.gold_guess = ""
         self.silver_guess = ""
         self.copper_guess = ""
-        self.stones = []
-        for i in range(10):
-            self.stones.append(self.Stone(100 + random.randint(-20, 20), 700 + random.randint(-20, 20), self.GOLD, self.gold_weight))
-            self.stones.append(self.Stone(200 + random.randint(-20, 20), 700 + random.randint(-20, 20), self.SILVER, self.silver_weight))
-            self.stones.append(self.Stone(300 + random.randint(-20, 20), 700 + random.randint(-20, 20), self.COPPER, self.copper_weight))
+        self.stones = self.create_stones()
+        self.paused = False
+        self.current_stone = None
+        self.correct = False
 
     def pause_menu(self):
-        overlay = pygame.Surface((self.WIDTH, self.HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 180))
-        self.screen.blit(overlay, (0, 0))
+        self.pause_modal.draw(self.screen, self.draw_pause_options)
+
+    def draw_pause_options(self, surface):
+        pause_text = texts.render(self.font, "Paused", True, self.WHITE)
+        surface.blit(pause_text, (self.WIDTH // 2 - pause_text.get_width() // 2, self.HEIGHT // 2 - int(0.139 * self.HEIGHT)))
 
-        pause_text = self.font.render("Paused", True, self.WHITE)
-        self.screen.blit(pause_text, (self.WIDTH // 2 - pause_text.get_width() // 2, self.HEIGHT // 2 - 150))
+        resume_text = texts.render(self.small_font, "Press 'R' to Resume", True, self.WHITE)
+        surface.blit(resume_text, (self.WIDTH // 2 - resume_text.get_width() // 2, self.HEIGHT // 2 - int(0.046 * self.HEIGHT)))
 
-        resume_text = self.small_font.render("Press 'R' to Resume", True, self.WHITE)
-        self.screen.blit(resume_text, (self.WIDTH // 2 - resume_text.get_width() // 2, self.HEIGHT // 2 - 50))
+        restart_text = texts.render(self.small_font, "Press 'N' to Restart", True, self.WHITE)
+        surface.blit(restart_text, (self.WIDTH // 2 - restart_text.get_width() // 2, self.HEIGHT // 2))
 
-        restart_text = self.small_font.render("Press 'N' to Restart", True, self.WHITE)
-        self.screen.blit(restart_text, (self.WIDTH // 2 - restart_text.get_width() // 2, self.HEIGHT // 2))
+        quit_text = texts.render(self.small_font, "Press 'Q' to Quit", True, self.WHITE)
+        surface.blit(quit_text, (self.WIDTH // 2 - quit_text.get_width() // 2, self.HEIGHT // 2 + int(0.046 * self.HEIGHT)))
 
-        quit_text = self.small_font.render("Press 'Q' to Quit", True, self.WHITE)
-        self.screen.blit(quit_text, (self.WIDTH // 2 - quit_text.get_width() // 2, self.HEIGHT // 2 + 50))
+    def draw_result(self, surface):
+        if self.correct:
+            result_text = texts.render(self.font, "Congratulations!", True, self.GREEN)
+        else:
+            result_text = texts.render(self.font, "Wrong guesses! Try again.", True, self.RED)
+        surface.blit(result_text, (self.WIDTH // 2 - result_text.get_width() // 2, self.HEIGHT // 2 - int(0.093 * self.HEIGHT)))
+
+        retry_text = texts.render(self.small_font, "Press 'R' to retry 'Q' to quit", True, self.GREEN)
+        surface.blit(retry_text, (self.WIDTH // 2 - retry_text.get_width() // 2, self.HEIGHT // 2 + int(0.139 * self.HEIGHT)))
 
     def main(self):
         running = True
-        clock = pygame.time.Clock()
 
         self.text_box.set_text(self.intro_text)
 
         while running:
-            for event in pygame.event.get():
+            for event in inputs.events():
+                self.renderer.handle_event(event)
                 if event.type == pygame.QUIT:
                     running = False
 
@@ -240,7 +212,7 @@ class Jupiter:
                         if self.text_box.is_finished():
                             self.game_state = "playing"
                         else:
-                            self.text_box.reveal_index = sum(len(line) for line in self.text_box.text_content)
+                            self.text_box.reveal_all()
                     elif self.paused:
                         if event.key == pygame.K_r:
                             self.paused = False
@@ -248,7 +220,7 @@ class Jupiter:
                             self.reset_game()
                             self.paused = False
                         elif event.key == pygame.K_q:
-                            pygame.mixer.music.stop()
+                            music.stop()
                             return "main_menu"
                     elif self.game_state == "playing":
                         if event.key == pygame.K_RETURN:
@@ -284,13 +256,14 @@ class Jupiter:
                                 self.silver_guess += event.unicode
                             elif len(self.copper_guess) == 0:
                                 self.copper_guess += event.unicode
-                        elif event.key == pygame.K_r and self.game_over:
+                    elif self.game_state in ["victory", "defeat"]:
+                        if event.key == pygame.K_r:
                             # Restart the game
                             self.reset_game()
                             self.game_state = "intro"
                             self.text_box.set_text(self.intro_text)
-                        elif event.key == pygame.K_q and self.game_over:
-                            pygame.mixer.music.stop()
+                        elif event.key == pygame.K_q:
+                            music.stop()
                             return "main_menu"
                 elif event.type == pygame.MOUSEBUTTONDOWN and self.game_state == "playing" and not self.game_over and not self.entering_guesses and not self.paused:
                     for stone in self.stones:
@@ -321,15 +294,22 @@ class Jupiter:
                         self.current_stone.x, self.current_stone.y = event.pos
 
             # Draw background first
-            self.screen.blit(self.background, (0, 0))
+            full = self.renderer.begin()
 
+            # Apart from a dragged stone and the text box reveal, nothing changes between events
+            idle = True
             if self.game_state == "intro":
+                revealing = not self.text_box.is_finished()
+                idle = not revealing
                 self.text_box.update()
-                self.text_box.draw(self.screen)
+                if full or revealing:
+                    self.text_box.draw(self.screen)
+                    self.renderer.mark(self.text_box.rect)
             elif self.paused:
-                self.pause_menu()
+                if full:
+                    self.pause_menu()
             elif self.game_state == "playing":
-                if not self.entering_guesses and not self.game_over:
+                if not self.entering_guesses and not self.game_over and full:
                     self.gold_rect = pygame.Rect(int(0.03 * self.WIDTH), int(0.81 * self.HEIGHT),
                                                  int(0.11 * self.WIDTH), int(0.15 * self.HEIGHT))
                     self.silver_rect = pygame.Rect(int(0.125 * self.WIDTH), int(0.81 * self.HEIGHT),
@@ -344,59 +324,48 @@ class Jupiter:
                     self.draw_scales(self.left_weight, self.right_weight)
 
                     for stone in self.stones:
-                        stone.draw(self.screen)
-                elif self.entering_guesses:
-                    result_text = self.font.render("Guess the weights!", True, self.BLACK)
-                    self.screen.blit(result_text, (self.WIDTH // 2 - result_text.get_width() // 2, 50))
+                        if stone is not self.current_stone:
+                            stone.draw(self.screen)
+                    self.renderer.capture()
+
+                if self.current_stone is not None and not self.entering_guesses and not self.game_over:
+                    self.renderer.track(self.current_stone.draw(self.screen))
+                elif self.entering_guesses and full:
+                    result_text = texts.render(self.font, "Guess the weights!", True, self.BLACK)
+                    self.screen.blit(result_text, (self.WIDTH // 2 - result_text.get_width() // 2, int(0.046 * self.HEIGHT)))
 
-                    gold_text = self.font.render(f"Gold: {self.gold_guess}", True, self.GOLD)
-                    self.screen.blit(gold_text, (self.WIDTH // 2 - gold_text.get_width() // 2, 200))
+                    gold_text = texts.render(self.font, f"Gold: {self.gold_guess}", True, self.GOLD)
+                    self.screen.blit(gold_text, (self.WIDTH // 2 - gold_text.get_width() // 2, int(0.185 * self.HEIGHT)))
 
-                    silver_text = self.font.render(f"Silver: {self.silver_guess}", True, self.SILVER)
-                    self.screen.blit(silver_text, (self.WIDTH // 2 - silver_text.get_width() // 2, 300))
+                    silver_text = texts.render(self.font, f"Silver: {self.silver_guess}", True, self.SILVER)
+                    self.screen.blit(silver_text, (self.WIDTH // 2 - silver_text.get_width() // 2, int(0.278 * self.HEIGHT)))
 
-                    copper_text = self.font.render(f"Copper: {self.copper_guess}", True, self.COPPER)
-                    self.screen.blit(copper_text, (self.WIDTH // 2 - silver_text.get_width() // 2, 400))
+                    copper_text = texts.render(self.font, f"Copper: {self.copper_guess}", True, self.COPPER)
+                    self.screen.blit(copper_text, (self.WIDTH // 2 - silver_text.get_width() // 2, int(0.37 * self.HEIGHT)))
 
                     if self.gold_guess and self.silver_guess and self.copper_guess:
-                        submit_text = self.small_font.render("Press Enter to submit your guess", True, self.BLACK)
-                        self.screen.blit(submit_text, (self.WIDTH // 2 - submit_text.get_width() // 2, 500))
+                        submit_text = texts.render(self.small_font, "Press Enter to submit your guess", True, self.BLACK)
+                        self.screen.blit(submit_text, (self.WIDTH // 2 - submit_text.get_width() // 2, int(0.463 * self.HEIGHT)))
 
             elif self.game_state in ["victory", "defeat"]:
-                overlay = pygame.Surface((self.WIDTH, self.HEIGHT), pygame.SRCALPHA)
-                overlay.fill((255, 255, 255, 180))
-                self.screen.blit(overlay, (0, 0))
-
-                if self.correct:
-                    result_text = self.font.render("Congratulations!", True, self.GREEN)
-                else:
-                    result_text = self.font.render("Wrong guesses! Try again.", True, self.RED)
-
-                self.screen.blit(result_text,(self.WIDTH // 2 - result_text.get_width() // 2, self.HEIGHT // 2 - 100))
+                if full:
+                    self.result_modal.draw(self.screen, self.draw_result, key=self.correct)
 
+                revealing = not self.text_box.is_finished()
+                idle = not revealing
                 self.text_box.update()
-                self.text_box.draw(self.screen)
-
-                retry_text = self.small_font.render("Press 'R' to retry 'Q' to quit", True, self.GREEN)
-                self.screen.blit(retry_text,(self.WIDTH // 2 - retry_text.get_width() // 2, self.HEIGHT // 2 + 150))
-
-                for event in pygame.event.get():
-                    if event.type == pygame.KEYDOWN:
-                        if event.key == pygame.K_r:
-                            self.reset_game()
-                            self.game_state = "intro"
-                            self.text_box.set_text(self.intro_text)
-                        elif event.key == pygame.K_q:
-                            pygame.mixer.music.stop()
-                            return "main_menu"
+                if full or revealing:
+                    self.text_box.draw(self.screen)
+                    self.renderer.mark(self.text_box.rect)
 
-            pygame.display.flip()
+            self.renderer.present()
 
-            clock.tick(30)
+            # Stones follow mouse motion events and guesses are typed, so between
+            # inputs the loop sleeps
+            runtime.tick(30, idle=idle)
 
-        pygame.quit()
+        return "quit"
 
 
 if __name__ == "__main__":
-    game = Jupiter()
-    game.main()
\ No newline at end of file
+    SceneManager().run("jupiter")
\ No newline at end of file
@@ -1,70 +1,26 @@
 import pygame
-import random
-import time
 import textwrap
-
-
-class TextBox:
-    def __init__(self, x, y, width, height):
-        self.rect = pygame.Rect(x, y, width, height)
-        self.text = ""
-        self.rendered_text = []
-        self.text_content = []
-        self.reveal_index = 0
-        self.line_spacing = 10
-        self.font = pygame.font.Font(None, 48)
-
-    def set_text(self, text):
-        self.text = text
-        self.rendered_text = []
-        self.text_content = []
-        wrapped_text = self.wrap_text(text, self.rect.width - 20)
-        for line in wrapped_text:
-            self.rendered_text.append(self.font.render(line, True, (255, 255, 255)))
-            self.text_content.append(line)
-        self.reveal_index = 0
-
-    def wrap_text(self, text, max_width):
-        words = text.split(' ')
-        wrapped_lines = []
-        current_line = ""
-        for word in words:
-            test_line = current_line + word + " "
-            if self.font.size(test_line)[0] <= max_width:
-                current_line = test_line
-            else:
-                wrapped_lines.append(current_line.strip())
-                current_line = word + " "
-        wrapped_lines.append(current_line.strip())
-        return wrapped_lines
-
-    def update(self):
-        self.reveal_index += 1
-
-    def draw(self, surface):
-        pygame.draw.rect(surface, (0, 0, 0), self.rect)
-        pygame.draw.rect(surface, (255, 255, 255), self.rect, 3)
-
-        y = self.rect.top + 10
-        for i, (line, content) in enumerate(zip(self.rendered_text, self.text_content)):
-            x = self.rect.left + 10
-            if i * len(content) < self.reveal_index:
-                surface.blit(line, (x, y))
-                y += line.get_height() + self.line_spacing
-
-    def is_finished(self):
-        return self.reveal_index >= sum(len(line) for line in self.text_content)
+from assets import assets
+from textcache import texts
+from modal import Modal
+from textbox import TextBox
+from music import music
+from scenes import SceneManager
+from runtime import runtime
+from replay import inputs
+from render import Renderer
+from loop import FixedStep
+
+# Decoded ahead of time while the stage is highlighted in the level menu
+PRELOAD_IMAGES = ['src/ufo.png', 'src/rock.png', 'src/mars.jpg']
+PRELOAD_SOUNDS = []
+MUSIC = 'src/marsbgm.mp3'
 
 
 class Mars:
-    def __init__(self):
-        # Initialize Pygame
-        pygame.init()
-
+    def __init__(self, screen):
         # Screen dimensions
-        screen_info = pygame.display.Info()
-        self.screen_width = screen_info.current_w
-        self.screen_height = screen_info.current_h
+        self.screen_width, self.screen_height = screen.get_size()
 
         # Colors
         self.white = (255, 255, 255)
@@ -73,35 +29,45 @@ class Mars:
         self.semi_transparent_black = (0, 0, 0, 128)
 
         # Set up display
-        self.screen = pygame.display.set_mode((self.screen_width, self.screen_height))
+        self.screen = screen
+        # Text sizes, offsets and speeds in pixels were set on a 1080-line
+        # screen; they are multiplied by this so smaller screens match
+        self.scale = self.screen_height / 1080
+        # The whole scene moves every frame, so there are no dirty rectangles to track
+        self.renderer = Renderer(screen, dirty=False)
+        self.pause_modal = Modal(self.semi_transparent_black)
+        self.end_modal = Modal(self.semi_transparent_black)
+        # Seeded by the runtime, so a run can be reproduced
+        self.rng = runtime.rng
         pygame.display.set_caption('Volcano Climbing')
 
         # Load images
-        self.player_img = pygame.image.load('src/ufo.png')
-        self.player_img = pygame.transform.scale(self.player_img,
-                                                 (int(self.screen_width * 0.05), int(self.screen_height * 0.075)))
-        self.rock_img = pygame.image.load('src/rock.png')
-        self.rock_img = pygame.transform.scale(self.rock_img,
-                                               (int(self.screen_width * 0.05), int(self.screen_height * 0.05)))
-        self.background = pygame.image.load('src/mars.jpg')
-        self.background = pygame.transform.scale(self.background, (self.screen_width, self.screen_height))
+        self.player_img = assets.image('src/ufo.png',
+                                       (int(self.screen_width * 0.05), int(self.screen_height * 0.075)), alpha=True)
+        self.rock_img = assets.image('src/rock.png',
+                                     (int(self.screen_width * 0.05), int(self.screen_height * 0.05)), alpha=True)
+        self.background = assets.background('src/mars.jpg', (self.screen_width, self.screen_height))
 
         # Player settings
         self.player_width = int(self.screen_width * 0.05)
         self.player_height = int(self.screen_height * 0.075)
         self.player_x = self.screen_width // 2
         self.player_y = self.screen_height - self.player_height
-        self.player_speed = int(self.screen_width * 0.005)
+        self.player_speed = 9 * self.scale
         self.player_jump = False
-        self.jump_speed = int(self.screen_height * 0.015)
-        self.gravity = int(self.screen_height * 0.001)
+        self.jump_speed = 16 * self.scale
+        self.gravity = 1 * self.scale
 
         # Rock settings
         self.rock_width = int(self.screen_width * 0.05)
         self.rock_height = int(self.screen_height * 0.05)
-        self.rock_speed = int(self.screen_height * 0.005)
+        self.rock_speed = 5 * self.scale
         self.rock_interval = 2.0
-        self.last_rock_time = time.time()
+
+        # Climbing, jumping and falling rocks run at a fixed 60 ticks per second,
+        # and rocks are scheduled in ticks rather than wall-clock time
+        self.loop = FixedStep(tick_rate=60)
+        self.next_rock_tick = self.loop.ticks_in(self.rock_interval)
 
         # Game variables
         self.player_y_velocity = 0
@@ -110,10 +76,11 @@ class Mars:
         self.level_complete = False
         self.score = 0
         self.target_score = 22000
+        self.climb_speed = 9  # metres per tick
 
         # Fonts
-        self.font = pygame.font.Font(None, int(self.screen_height * 0.1))
-        self.small_font = pygame.font.Font(None, int(self.screen_height * 0.05))
+        self.font = texts.font(None, int(self.screen_height * 0.1))
+        self.small_font = texts.font(None, int(self.screen_height * 0.05))
 
         # Rocks list
         self.rocks = []
@@ -121,22 +88,21 @@ class Mars:
         # Pause state
         self.paused = False
 
-        # Initialize Pygame mixer
-        pygame.mixer.init()
-        pygame.mixer.music.load('src/marsbgm.mp3')
-        pygame.mixer.music.play(-1)
+        # Background music
+        music.play(MUSIC)
 
         self.text_box = TextBox(int(self.screen_width * 0.05), int(self.screen_height * 0.75),
-                                int(self.screen_width * 0.9), int(self.screen_height * 0.2))
+                                int(self.screen_width * 0.9), int(self.screen_height * 0.2), int(48 * self.scale),
+                                line_spacing=int(10 * self.scale))
         self.game_state = "intro"
         self.intro_text = "Welcome to Mars! John, your mission is to climb the volcano while avoiding falling rocks. Reach a height of 22,000m to win!"
         self.victory_text = "Congratulations! You've successfully climbed the Martian volcano! Obtained the Cancer gem"
         self.defeat_text = "Mission failed. John, don't rush! Try again!"
 
-    def show_text(self, text, x, y, font_size=74):
-        font = pygame.font.Font(None, font_size)
-        text_surface = font.render(text, True, self.white)
-        self.screen.blit(text_surface, (x, y))
+    def show_text(self, text, x, y, font_size=74, surface=None):
+        font = texts.font(None, int(font_size * self.scale))
+        text_surface = texts.render(font, text, True, self.white)
+        (self.screen if surface is None else surface).blit(text_surface, (x, y))
 
     def reset_game(self):
         self.player_x = self.screen_width // 2
@@ -150,27 +116,96 @@ class Mars:
         self.game_state = "intro"
         self.text_box.set_text(self.intro_text)
 
+    def entity_counts(self):
+        # Shown by the profiler overlay
+        return {'rocks': len(self.rocks)}
+
     def pause_menu(self):
-        # Create a semi-transparent overlay
-        overlay = pygame.Surface((self.screen_width, self.screen_height), pygame.SRCALPHA)
-        overlay.fill(self.semi_transparent_black)
-        self.screen.blit(overlay, (0, 0))
+        self.pause_modal.draw(self.screen, self.draw_pause_options)
+
+    def draw_pause_options(self, surface):
+        s = self.scale
+        x = self.screen_width // 2 - int(150 * s)
+        self.show_text('PAUSED', x, self.screen_height // 2 - int(50 * s), surface=surface)
+        self.show_text('Press R to Resume', x, self.screen_height // 2 + int(50 * s), font_size=36, surface=surface)
+        self.show_text('Press N to Restart', x, self.screen_height // 2 + int(100 * s), font_size=36, surface=surface)
+        self.show_text('Press Q to Quit', x, self.screen_height // 2 + int(150 * s), font_size=36, surface=surface)
+
+    def draw_end_options(self, surface):
+        font_large = texts.font(None, int(74 * self.scale))
+        if self.game_state == "victory":
+            game_over_text = texts.render(font_large, "Congratulations!", True, self.white)
+        else:
+            game_over_text = texts.render(font_large, "Game Over", True, self.red)
+        surface.blit(game_over_text, (self.screen_width // 2 - game_over_text.get_width() // 2,
+                                      self.screen_height // 3 - game_over_text.get_height() // 2))
+
+        font_small = texts.font(None, int(36 * self.scale))
+        restart_text = texts.render(font_small, "Press R to Restart", True, self.white)
+        quit_text = texts.render(font_small, "Press Q to Quit", True, self.white)
+        surface.blit(restart_text,
+                     (self.screen_width // 2 - restart_text.get_width() // 2,
+                      self.screen_height // 3 + game_over_text.get_height()))
+        surface.blit(quit_text,
+                     (self.screen_width // 2 - quit_text.get_width() // 2,
+                      self.screen_height // 3 + game_over_text.get_height() + restart_text.get_height() + int(10 * self.scale)))
 
-        self.show_text('PAUSED', self.screen_width // 2 - 150, self.screen_height // 2 - 50)
-        self.show_text('Press R to Resume', self.screen_width // 2 - 150, self.screen_height // 2 + 50, font_size=36)
-        self.show_text('Press N to Restart', self.screen_width // 2 - 150, self.screen_height // 2 + 100, font_size=36)
-        self.show_text('Press Q to Quit', self.screen_width // 2 - 150, self.screen_height // 2 + 150, font_size=36)
+    def update(self):
+        if self.game_over or self.level_complete or self.game_state != "playing":
+            return
+
+        keys = inputs.pressed()
+        if keys[pygame.K_LEFT] and self.player_x > 0:
+            self.player_x -= self.player_speed
+        if keys[pygame.K_RIGHT] and self.player_x < self.screen_width - self.player_width:
+            self.player_x += self.player_speed
+
+        if self.player_jump:
+            self.player_y += self.player_y_velocity
+            self.player_y_velocity += self.gravity
+            if self.player_y >= self.screen_height - self.player_height:
+                self.player_y = self.screen_height - self.player_height
+                self.player_jump = False
+
+        # Update score based on player movement
+        self.score += self.climb_speed
+
+        # Check if player has reached target score
+        if self.score >= self.target_score:
+            self.level_complete = True
+            self.game_state = "victory"
+            self.text_box.set_text(self.victory_text)
+
+        # Spawn rocks at random intervals
+        if self.loop.ticks >= self.next_rock_tick:
+            rock_x = self.rng.randint(0, self.screen_width - self.rock_width)
+            self.rocks.append([rock_x, 0])
+            self.rock_interval = self.rng.uniform(1, 3)  # randomize the interval between rocks
+            self.next_rock_tick = self.loop.ticks + self.loop.ticks_in(self.rock_interval)
+
+        # Update rocks and check for collisions
+        for rock in self.rocks[:]:
+            rock[1] += self.rock_speed
+            rock_rect = pygame.Rect(rock[0], rock[1], self.rock_width, self.rock_height)
+            player_rect = pygame.Rect(self.player_x, self.player_y, self.player_width, self.player_height)
+
+            # Check for collision with player
+            if rock_rect.colliderect(player_rect):
+                self.game_over = True
+                self.game_state = "defeat"
+                self.text_box.set_text(self.defeat_text)
+
+            if rock[1] > self.screen_height:
+                self.rocks.remove(rock)
 
     def main(self):
-        clock = pygame.time.Clock()
-
         self.text_box.set_text(self.intro_text)
 
         while self.running:
             self.screen.fill(self.black)
             self.screen.blit(self.background, (0, 0))
 
-            for event in pygame.event.get():
+            for event in inputs.events():
                 if event.type == pygame.QUIT:
                     self.running = False
                 elif event.type == pygame.KEYDOWN:
@@ -180,7 +215,7 @@ class Mars:
                         if self.text_box.is_finished():
                             self.game_state = "playing"
                         else:
-                            self.text_box.reveal_index = sum(len(line) for line in self.text_box.text_content)
+                            self.text_box.reveal_all()
                     elif not self.paused and self.game_state == "playing":
                         if event.key == pygame.K_SPACE and not self.player_jump:
                             self.player_jump = True
@@ -191,108 +226,48 @@ class Mars:
                         elif event.key == pygame.K_n:  # Restart game
                             self.reset_game()
                         elif event.key == pygame.K_q:  # Quit game
-                            pygame.mixer.music.stop()
+                            music.stop()
                             return "main_menu"
 
+            if not self.paused and self.game_state == "playing":
+                self.loop.step(self.update)
+            else:
+                self.loop.hold()
+
             if not self.paused:
                 if self.game_state == "intro":
                     self.text_box.update()
                     self.text_box.draw(self.screen)
                 elif self.game_state == "playing":
-                    if not self.game_over and not self.level_complete:
-                        keys = pygame.key.get_pressed()
-                        if keys[pygame.K_LEFT] and self.player_x > 0:
-                            self.player_x -= self.player_speed
-                        if keys[pygame.K_RIGHT] and self.player_x < self.screen_width - self.player_width:
-                            self.player_x += self.player_speed
-
-                        if self.player_jump:
-                            self.player_y += self.player_y_velocity
-                            self.player_y_velocity += self.gravity
-                            if self.player_y >= self.screen_height - self.player_height:
-                                self.player_y = self.screen_height - self.player_height
-                                self.player_jump = False
-
-                        # Update score based on player movement
-                        self.score += self.player_speed
-
-                        # Check if player has reached target score
-                        if self.score >= self.target_score:
-                            self.level_complete = True
-                            self.game_state = "victory"
-                            self.text_box.set_text(self.victory_text)
-
-                        # Spawn rocks at random intervals
-                        if time.time() - self.last_rock_time > self.rock_interval:
-                            rock_x = random.randint(0, self.screen_width - self.rock_width)
-                            self.rocks.append([rock_x, 0])
-                            self.last_rock_time = time.time()
-                            self.rock_interval = random.uniform(1, 3)  # randomize the interval between rocks
-
-                        # Update rocks and check for collisions
-                        for rock in self.rocks[:]:
-                            rock[1] += self.rock_speed
-                            rock_rect = pygame.Rect(rock[0], rock[1], self.rock_width, self.rock_height)
-                            player_rect = pygame.Rect(self.player_x, self.player_y, self.player_width, self.player_height)
-
-                            # Check for collision with player
-                            if rock_rect.colliderect(player_rect):
-                                self.game_over = True
-                                self.game_state = "defeat"
-                                self.text_box.set_text(self.defeat_text)
-
-                            if rock[1] > self.screen_height:
-                                self.rocks.remove(rock)
-                            else:
-                                self.screen.blit(self.rock_img, (rock[0], rock[1]))
+                    for rock in self.rocks:
+                        self.screen.blit(self.rock_img, (rock[0], rock[1]))
 
                     self.screen.blit(self.player_img, (self.player_x, self.player_y))
 
                 elif self.game_state in ["victory", "defeat"]:
                     # Game over or Victory screen
-                    overlay = pygame.Surface((self.screen_width, self.screen_height), pygame.SRCALPHA)
-                    overlay.fill(self.semi_transparent_black)
-                    self.screen.blit(overlay, (0, 0))
-
-                    font_large = pygame.font.Font(None, 74)
-                    if self.game_state == "victory":
-                        game_over_text = font_large.render("Congratulations!", True, self.white)
-                    else:
-                        game_over_text = font_large.render("Game Over", True, self.red)
-                    self.screen.blit(game_over_text, (self.screen_width // 2 - game_over_text.get_width() // 2,
-                                                      self.screen_height // 3 - game_over_text.get_height() // 2))
-
-                    font_small = pygame.font.Font(None, 36)
-                    restart_text = font_small.render("Press R to Restart", True, self.white)
-                    quit_text = font_small.render("Press Q to Quit", True, self.white)
-                    self.screen.blit(restart_text,
-                                     (self.screen_width // 2 - restart_text.get_width() // 2,
-                                      self.screen_height // 3 + game_over_text.get_height()))
-                    self.screen.blit(quit_text,
-                                     (self.screen_width // 2 - quit_text.get_width() // 2,
-                                      self.screen_height // 3 + game_over_text.get_height() + restart_text.get_height() + 10))
+                    self.end_modal.draw(self.screen, self.draw_end_options, key=self.game_state)
 
                     self.text_box.update()
                     self.text_box.draw(self.screen)
 
-                    keys = pygame.key.get_pressed()
+                    keys = inputs.pressed()
                     if keys[pygame.K_r]:
                         self.reset_game()
                     elif keys[pygame.K_q]:
-                        pygame.mixer.music.stop()
+                        music.stop()
                         return "main_menu"
 
                 # Display score
-                self.show_text(f'Height: {self.score}m', 10, 10, font_size=36)
+                self.show_text(f'Height: {self.score}m', int(10 * self.scale), int(10 * self.scale), font_size=36)
             else:
                 self.pause_menu()
 
-            pygame.display.update()
-            clock.tick(60)
+            self.renderer.present()
+            runtime.tick(60)
 
-        pygame.quit()
+        return "quit"
 
 
 if __name__ == "__main__":
-    game = Mars()
-    game.main()
+    SceneManager().run("mars")
@@ -1,112 +1,58 @@
 import pygame
 import textwrap
-
-class TextBox:
-    def __init__(self, x, y, width, height):
-        self.rect = pygame.Rect(x, y, width, height)
-        self.text = ""
-        self.rendered_text = []
-        self.text_content = []
-        self.reveal_index = 0
-        self.line_spacing = 5
-        self.font = pygame.font.Font(None, 32)
-        self.current_text_index = 0
-
-    def set_text(self, text):
-        if isinstance(text, list):
-            self.text = text
-            self.current_text_index = 0
-            self.set_current_text()
-        else:
-            self.text = [text]
-            self.set_current_text()
-
-    def set_current_text(self):
-        current_text = self.text[self.current_text_index]
-        self.rendered_text = []
-        self.text_content = []
-        wrapped_text = self.wrap_text(current_text, self.rect.width - 20)
-        for line in wrapped_text:
-            self.rendered_text.append(self.font.render(line, True, (255, 255, 255)))
-            self.text_content.append(line)
-        self.reveal_index = 0
-
-    def wrap_text(self, text, max_width):
-        lines = text.split('\n')
-        wrapped_lines = []
-        for line in lines:
-            words = line.split(' ')
-            current_line = ""
-            for word in words:
-                test_line = current_line + word + " "
-                if self.font.size(test_line)[0] <= max_width:
-                    current_line = test_line
-                else:
-                    wrapped_lines.append(current_line.strip())
-                    current_line = word + " "
-            wrapped_lines.append(current_line.strip())
-        return wrapped_lines
-
-    def update(self):
-        self.reveal_index += 1
-
-    def draw(self, surface):
-        pygame.draw.rect(surface, (0, 0, 0), self.rect)
-        pygame.draw.rect(surface, (255, 255, 255), self.rect, 3)
-
-        y = self.rect.top + 10
-        for i, (line, content) in enumerate(zip(self.rendered_text, self.text_content)):
-            x = self.rect.left + 10
-            if i * len(content) < self.reveal_index:
-                surface.blit(line, (x, y))
-                y += line.get_height() + self.line_spacing
-
-    def is_finished(self):
-        if self.reveal_index >= sum(len(line) for line in self.text_content):
-            if self.current_text_index < len(self.text) - 1:
-                self.current_text_index += 1
-                self.set_current_text()
-                return False
-            return True
-        return False
-
+from assets import assets
+from textcache import texts
+from modal import Modal
+from textbox import TextBox
+from music import music
+from sounds import sounds
+from scenes import SceneManager
+from runtime import runtime
+from replay import inputs
+from render import Renderer
+from loop import FixedStep
+
+# Decoded ahead of time while the stage is highlighted in the level menu
+PRELOAD_IMAGES = ['src/mercury.jpg', 'src/trolley.png', 'src/tracks.png']
+PRELOAD_SOUNDS = ['src/explosion.wav']
+MUSIC = 'src/mercurybgm.mp3'
 
 class Mercury:
-    def __init__(self):
-        pygame.init()
-
-        # Get the screen info
-        screen_info = pygame.display.Info()
-        self.screen_width = screen_info.current_w
-        self.screen_height = screen_info.current_h
+    def __init__(self, screen):
+        # Shared display surface
+        self.screen = screen
+        # The whole scene moves every frame, so there are no dirty rectangles to track
+        self.renderer = Renderer(screen, dirty=False)
+        # Background and texts of the pause, game over and victory menus
+        self.menu_modal = Modal(None)
+        self.screen_width, self.screen_height = screen.get_size()
 
         self.white = (255, 255, 255)
         self.black = (0, 0, 0)
         self.red = (255, 0, 0)
         self.translucent_gray = (128, 128, 128, 128)
 
-        self.screen = pygame.display.set_mode((self.screen_width, self.screen_height))
         pygame.display.set_caption("Trolley Problem")
 
         # Load and scale background image
-        self.background = pygame.image.load('src/mercury.jpg').convert()
-        self.background = pygame.transform.scale(self.background, (self.screen_width, self.screen_height))
+        self.background = assets.background('src/mercury.jpg', (self.screen_width, self.screen_height))
 
         # Load and scale trolley image
-        self.trolley_image = pygame.image.load('src/trolley.png')
         trolley_size = int(min(self.screen_width, self.screen_height) * 0.1)
-        self.trolley_image = pygame.transform.scale(self.trolley_image, (trolley_size, trolley_size))
+        self.trolley_image = assets.image('src/trolley.png', (trolley_size, trolley_size), alpha=True)
 
         # Load and scale track image
-        self.track_image = pygame.image.load('src/tracks.png')
         track_width = int(self.screen_width * 0.04)
         track_height = int(self.screen_height * 0.1)
-        self.track_image = pygame.transform.scale(self.track_image, (track_width, track_height))
+        self.track_image = assets.image('src/tracks.png', (track_width, track_height), alpha=True)
         self.track_image = pygame.transform.rotate(self.track_image, 90)
 
         self.trolley_x = int(self.screen_width * 0.05)
         self.trolley_y = self.screen_height // 2
-        self.trolley_speed = int(self.screen_width * 0.004)
+        # 7 pixels a tick on a 1080-line screen, in proportion on others
+        self.trolley_speed = 7 * self.screen_height / 1080
+        # The trolley moves at a fixed 60 ticks per second
+        self.loop = FixedStep(tick_rate=60)
 
         self.upper_track_y = self.screen_height // 4
         self.lower_track_y = 3 * self.screen_height // 4
@@ -116,7 +62,7 @@ class Mercury:
 
         self.direction = 0
 
-        self.font = pygame.font.SysFont(None, int(self.screen_height * 0.05))
+        self.font = texts.font(None, int(self.screen_height * 0.05))
 
         self.questions = [
             {"question": "Where is the largest Volcano in the Solar System?", "up": "Saturn", "down": "Mars", "correct": "down"},
@@ -137,18 +83,18 @@ class Mercury:
         self.game_over = False
 
         # Load and play background music
-        pygame.mixer.music.load('src/mercurybgm.mp3')
-        pygame.mixer.music.play(-1)  # -1 loops indefinitely, 0 plays once
+        music.play(MUSIC)
 
         # Load explosion sound
-        self.explosion_sound = pygame.mixer.Sound('src/explosion.wav')
+        sounds.preload(['explosion'])
 
         # Text box and game state
         text_box_width = int(self.screen_width * 0.9)
         text_box_height = int(self.screen_height * 0.2)
         text_box_x = (self.screen_width - text_box_width) // 2
         text_box_y = int(self.screen_height * 0.75)
-        self.text_box = TextBox(text_box_x, text_box_y, text_box_width, text_box_height)
+        self.text_box = TextBox(text_box_x, text_box_y, text_box_width, text_box_height,
+                                int(32 * self.screen_height / 1080))
         self.game_state = "intro"
         self.intro_text = "Welcome to Mercury! John, your mission is to get past the cave! Choose the right path wisely!"
         self.victory_text = ["Congratulations! You've successfully gone past the cave! Obtained the Taurus gem.",
@@ -171,10 +117,10 @@ class Mercury:
             self.draw_track(x, y, angle=90)
             y += self.track_image.get_width()
 
-    def draw_text(self, text, x, y):
-        screen_text = self.font.render(text, True, self.white)
+    def draw_text(self, text, x, y, surface=None):
+        screen_text = texts.render(self.font, text, True, self.white)
         text_rect = screen_text.get_rect(center=(x, y))
-        self.screen.blit(screen_text, text_rect)
+        (self.screen if surface is None else surface).blit(screen_text, text_rect)
 
     def draw_question(self, question_data):
         self.draw_text(question_data["question"], self.screen_width // 2, int(self.screen_height * 0.05))
@@ -182,34 +128,34 @@ class Mercury:
         self.draw_text("DOWN: " + question_data["down"], self.screen_width // 2, int(self.screen_height * 0.2))
 
     def draw_pause_menu(self):
-        s = pygame.Surface((self.screen_width, self.screen_height), pygame.SRCALPHA)
-        s.fill(self.translucent_gray)
-        self.screen.blit(self.background, (0, 0))
+        self.menu_modal.draw(self.screen, self.draw_pause_texts, key="pause")
 
-        self.draw_text("PAUSE MENU", self.screen_width // 2, self.screen_height // 2 - int(self.screen_height * 0.1))
-        self.draw_text("Press R to Resume", self.screen_width // 2, self.screen_height // 2)
-        self.draw_text("Press T to Retry", self.screen_width // 2, self.screen_height // 2 + int(self.screen_height * 0.07))
-        self.draw_text("Press Q to Quit", self.screen_width // 2, self.screen_height // 2 + int(self.screen_height * 0.14))
+    def draw_pause_texts(self, surface):
+        surface.blit(self.background, (0, 0))
+        self.draw_text("PAUSE MENU", self.screen_width // 2, self.screen_height // 2 - int(self.screen_height * 0.1), surface)
+        self.draw_text("Press R to Resume", self.screen_width // 2, self.screen_height // 2, surface)
+        self.draw_text("Press T to Retry", self.screen_width // 2, self.screen_height // 2 + int(self.screen_height * 0.07), surface)
+        self.draw_text("Press Q to Quit", self.screen_width // 2, self.screen_height // 2 + int(self.screen_height * 0.14), surface)
 
     def draw_game_over_menu(self):
-        s = pygame.Surface((self.screen_width, self.screen_height), pygame.SRCALPHA)
-        s.fill(self.translucent_gray)
-        self.screen.blit(self.background, (0, 0))
-
+        self.menu_modal.draw(self.screen, self.draw_game_over_texts, key="defeat")
         self.text_box.draw(self.screen)
-        self.draw_text("CRASH! Game Over.", self.screen_width // 2, self.screen_height // 2 - int(self.screen_height * 0.1))
-        self.draw_text("Press T to Retry", self.screen_width // 2, self.screen_height // 2)
-        self.draw_text("Press Q to Quit", self.screen_width // 2, self.screen_height // 2 + int(self.screen_height * 0.07))
 
-    def draw_congratulations_menu(self):
-        s = pygame.Surface((self.screen_width, self.screen_height), pygame.SRCALPHA)
-        s.fill(self.translucent_gray)
-        self.screen.blit(self.background, (0, 0))
+    def draw_game_over_texts(self, surface):
+        surface.blit(self.background, (0, 0))
+        self.draw_text("CRASH! Game Over.", self.screen_width // 2, self.screen_height // 2 - int(self.screen_height * 0.1), surface)
+        self.draw_text("Press T to Retry", self.screen_width // 2, self.screen_height // 2, surface)
+        self.draw_text("Press Q to Quit", self.screen_width // 2, self.screen_height // 2 + int(self.screen_height * 0.07), surface)
 
+    def draw_congratulations_menu(self):
+        self.menu_modal.draw(self.screen, self.draw_congratulations_texts, key="victory")
         self.text_box.draw(self.screen)
-        self.draw_text("Congratulations! You won!", self.screen_width // 2, self.screen_height // 2 - int(self.screen_height * 0.1))
-        self.draw_text("Press T to Retry", self.screen_width // 2, self.screen_height // 2)
-        self.draw_text("Press Q to Quit", self.screen_width // 2, self.screen_height // 2 + int(self.screen_height * 0.07))
+
+    def draw_congratulations_texts(self, surface):
+        surface.blit(self.background, (0, 0))
+        self.draw_text("Congratulations! You won!", self.screen_width // 2, self.screen_height // 2 - int(self.screen_height * 0.1), surface)
+        self.draw_text("Press T to Retry", self.screen_width // 2, self.screen_height // 2, surface)
+        self.draw_text("Press Q to Quit", self.screen_width // 2, self.screen_height // 2 + int(self.screen_height * 0.07), surface)
 
     def reset_game(self):
         self.trolley_x = int(self.screen_width * 0.05)
@@ -227,13 +173,67 @@ class Mercury:
         self.game_state = "intro"
         self.text_box.set_text(self.intro_text)
 
+    def update(self):
+        # Once the run is over, the end screens take over until a restart
+        if self.game_completed or self.game_over:
+            return
+
+        if not self.paused and not self.show_pause_menu:
+            self.trolley_x += self.trolley_speed
+
+        if self.trolley_x > self.divergence_x and not self.show_question and not self.at_divergence:
+            self.show_question = True
+            self.paused = True
+            self.at_divergence = True
+
+        if self.show_question and self.answered:
+            correct = self.questions[self.current_question]["correct"]
+            chosen_track_y = self.upper_track_y if self.direction == 1 else self.lower_track_y
+            if (correct == "up" and self.direction == 1) or (correct == "down" and self.direction == 2):
+                self.trolley_y = chosen_track_y
+                self.paused = False
+                self.show_question = False
+                self.answered = False
+                self.correct_answers += 1
+                self.incorrect = False
+                self.current_question += 1
+            else:
+                self.trolley_y = chosen_track_y
+                self.paused = False
+                self.show_question = False
+                self.answered = False
+                self.incorrect = True
+
+        if not self.show_question and not self.paused and not self.show_pause_menu:
+            if self.trolley_x >= self.screen_width - self.trolley_image.get_width():
+                self.trolley_x = int(self.screen_width * 0.05)
+                self.trolley_y = self.middle_track_y
+                self.at_divergence = False
+                if self.incorrect:
+                    sounds.play('explosion')  # Play explosion sound on crash
+                    self.game_over = True
+                else:
+                    if self.current_question >= len(self.questions):
+                        if self.correct_answers == 5:
+                            self.game_completed = True
+                        else:
+                            self.game_over = True
+
+        if self.game_state == "playing":
+            if self.game_completed:
+                self.game_state = "victory"
+                self.text_box.set_text(self.victory_text)
+            elif self.game_over:
+                self.game_state = "defeat"
+                self.text_box.set_text(self.defeat_text)
+
     def main(self):
         running = True
 
         self.text_box.set_text(self.intro_text)
 
         while running:
-            for event in pygame.event.get():
+            for event in inputs.events():
                 if event.type == pygame.QUIT:
                     running = False
 
@@ -243,7 +243,7 @@ class Mercury:
                             if self.text_box.is_finished():
                                 self.game_state = "playing"
                             else:
-                                self.text_box.reveal_index = sum(len(line) for line in self.text_box.text_content)
+                                self.text_box.reveal_all()
                     elif event.key == pygame.K_ESCAPE:
                         if self.show_pause_menu:
                             self.paused = False
@@ -259,13 +259,13 @@ class Mercury:
                         if event.key == pygame.K_t:
                             self.reset_game()
                         if event.key == pygame.K_q:
-                            pygame.mixer.music.stop()
+                            music.stop()
                             return "main_menu"
                     elif self.game_state in ["victory", "defeat"]:
                         if event.key == pygame.K_t:
                             self.reset_game()
                         if event.key == pygame.K_q:
-                            pygame.mixer.music.stop()
+                            music.stop()
                             return "main_menu"
                     elif self.show_question:
                         if event.key == pygame.K_UP:
@@ -283,64 +283,21 @@ class Mercury:
                 self.game_state = "victory"
                 self.screen.fill(self.white)
                 self.draw_congratulations_menu()
-                pygame.display.flip()
+                self.renderer.present()
+                self.loop.hold()
+                runtime.tick(60)
                 continue
 
             if self.game_over:
                 self.game_state = "defeat"
                 self.screen.fill(self.white)
                 self.draw_game_over_menu()
-                pygame.display.flip()
+                self.renderer.present()
+                self.loop.hold()
+                runtime.tick(60)
                 continue
 
-            if not self.paused and not self.show_pause_menu:
-                self.trolley_x += self.trolley_speed
-
-            if self.trolley_x > self.divergence_x and not self.show_question and not self.at_divergence:
-                self.show_question = True
-                self.paused = True
-                self.at_divergence = True
-
-            if self.show_question and self.answered:
-                correct = self.questions[self.current_question]["correct"]
-                chosen_track_y = self.upper_track_y if self.direction == 1 else self.lower_track_y
-                if (correct == "up" and self.direction == 1) or (correct == "down" and self.direction == 2):
-                    self.trolley_y = chosen_track_y
-                    self.paused = False
-                    self.show_question = False
-                    self.answered = False
-                    self.correct_answers += 1
-                    self.incorrect = False
-                    self.current_question += 1
-                else:
-                    self.trolley_y = chosen_track_y
-                    self.paused = False
-                    self.show_question = False
-                    self.answered = False
-                    self.incorrect = True
-
-            if not self.show_question and not self.paused and not self.show_pause_menu:
-                if self.trolley_x >= self.screen_width - self.trolley_image.get_width():
-                    self.trolley_x = int(self.screen_width * 0.05)
-                    self.trolley_y = self.middle_track_y
-                    self.at_divergence = False
-                    if self.incorrect:
-                        self.explosion_sound.play()  # Play explosion sound on crash
-                        self.game_over = True
-                    else:
-                        if self.current_question >= len(self.questions):
-                            if self.correct_answers == 5:
-                                self.game_completed = True
-                            else:
-                                self.game_over = True
-
-            if self.game_state == "playing":
-                if self.game_completed:
-                    self.game_state = "victory"
-                    self.text_box.set_text(self.victory_text)
-                elif self.game_over:
-                    self.game_state = "defeat"
-                    self.text_box.set_text(self.defeat_text)
+            self.loop.step(self.update)
 
                 # Draw background
             self.screen.blit(self.background, (0, 0))
@@ -379,12 +336,11 @@ class Mercury:
                 self.text_box.update()
                 self.draw_game_over_menu()
 
-            pygame.display.flip()
-            pygame.time.Clock().tick(60)
+            self.renderer.present()
+            runtime.tick(60)
 
-        pygame.quit()
+        return "quit"
 
 
 if __name__ == "__main__":
-    game = Mercury()
-    game.main()
\ No newline at end of file
+    SceneManager().run("mercury")
\ No newline at end of file
@@ -1,87 +1,42 @@
 import pygame
-import random
-import sys
 import textwrap
-from pygame import mixer
-
-class TextBox:
-    def __init__(self, x, y, width, height, screen_width, screen_height):
-        self.rect = pygame.Rect(int(x * screen_width), int(y * screen_height),
-                                int(width * screen_width), int(height * screen_height))
-        self.text = ""
-        self.rendered_text = []
-        self.text_content = []
-        self.reveal_index = 0
-        self.line_spacing = int(0.00625 * screen_height)
-        self.font = pygame.font.Font(None, int(0.04 * screen_height))
-
-    def set_text(self, text):
-        self.text = text
-        self.rendered_text = []
-        self.text_content = []
-        wrapped_text = self.wrap_text(text, self.rect.width - int(0.0167 * self.rect.width))
-        for line in wrapped_text:
-            self.rendered_text.append(self.font.render(line, True, (255, 255, 255)))
-            self.text_content.append(line)
-        self.reveal_index = 0
-
-    def wrap_text(self, text, max_width):
-        words = text.split(' ')
-        wrapped_lines = []
-        current_line = ""
-        for word in words:
-            test_line = current_line + word + " "
-            if self.font.size(test_line)[0] <= max_width:
-                current_line = test_line
-            else:
-                wrapped_lines.append(current_line.strip())
-                current_line = word + " "
-        wrapped_lines.append(current_line.strip())
-        return wrapped_lines
-
-    def update(self):
-        self.reveal_index += 1
-
-    def draw(self, surface):
-        pygame.draw.rect(surface, (0, 0, 0), self.rect)
-        pygame.draw.rect(surface, (255, 255, 255), self.rect, 3)
-
-        y = self.rect.top + int(0.0125 * self.rect.height)
-        for i, (line, content) in enumerate(zip(self.rendered_text, self.text_content)):
-            x = self.rect.left + int(0.0125 * self.rect.width)
-            if i * len(content) < self.reveal_index:
-                surface.blit(line, (x, y))
-                y += line.get_height() + self.line_spacing
-
-    def is_finished(self):
-        return self.reveal_index >= sum(len(line) for line in self.text_content)
+from assets import assets
+from textcache import texts
+from modal import Modal
+from textbox import TextBox
+from music import music
+from scenes import SceneManager
+from runtime import runtime
+from replay import inputs
+from render import Renderer
+
+# Decoded ahead of time while the stage is highlighted in the level menu
+PRELOAD_IMAGES = ['src/saturnbackground.jpg', 'src/saturn.png']
+PRELOAD_SOUNDS = []
+MUSIC = 'src/saturnbgm.mp3'
 
 class Saturn:
-    def __init__(self):
-        pygame.init()
-
+    def __init__(self, screen):
         # Screen setup
-        info = pygame.display.Info()
-        self.WIDTH, self.HEIGHT = info.current_w, info.current_h
-        self.screen = pygame.display.set_mode((self.WIDTH, self.HEIGHT))
+        self.screen = screen
+        # Seeded by the runtime, so a run can be reproduced
+        self.rng = runtime.rng
+        self.WIDTH, self.HEIGHT = screen.get_size()
         pygame.display.set_caption("Alien Jigsaw Puzzle")
-        self.background = pygame.image.load("src/saturnbackground.jpg")
-        self.background = pygame.transform.scale(self.background, (self.WIDTH, self.HEIGHT))
+        self.background = assets.background("src/saturnbackground.jpg", (self.WIDTH, self.HEIGHT))
+        self.renderer = Renderer(self.screen, self.background)
+        self.pause_modal = Modal((0, 0, 0, 100))
 
-        mixer.music.load('src/saturnbgm.mp3')
-        mixer.music.play(-1)
+        music.play(MUSIC)
 
         # Colors
         self.WHITE = (255, 255, 255)
         self.BLACK = (0, 0, 0)
         self.GRAY = (169, 169, 169)
 
-        # Load image
-        self.alien_image = pygame.image.load('src/saturn.png')
-
-        # Resize image
+        # Load and resize image
         self.sign_size = int(0.375 * self.HEIGHT)
-        self.alien_image = pygame.transform.scale(self.alien_image, (self.sign_size, self.sign_size))
+        self.alien_image = assets.image('src/saturn.png', (self.sign_size, self.sign_size), alpha=True)
 
         # Split image into pieces
         self.pieces_per_row = 3
@@ -95,7 +50,7 @@ class Saturn:
         # Game variables
         self.total_pieces = self.pieces_per_row * self.pieces_per_row
         self.grid = list(range(self.total_pieces))
-        random.shuffle(self.grid)
+        self.rng.shuffle(self.grid)
         self.dragging_piece = None
         self.game_over = False
 
@@ -106,16 +61,19 @@ class Saturn:
         # Pause menu variables
         self.pause_menu_active = False
         self.selected_option = 0  # 0: Resume, 1: Retry, 2: Quit
-        self.pause_menu_font = pygame.font.Font(None, int(0.045 * self.HEIGHT))
+        self.pause_options = ["Resume", "Retry", "Quit"]
+        self.pause_menu_font = texts.font(None, int(0.045 * self.HEIGHT))
 
         # Congratulations screen variables
         self.congratulations_active = False
-        self.congratulations_font = pygame.font.Font(None, int(0.06 * self.HEIGHT))
-        self.options_font = pygame.font.Font(None, int(0.045 * self.HEIGHT))
+        self.congratulations_font = texts.font(None, int(0.06 * self.HEIGHT))
+        self.options_font = texts.font(None, int(0.045 * self.HEIGHT))
         self.congratulations_options = ["Retry", "Quit"]
         self.congratulations_selected = 0
 
-        self.text_box = TextBox(0.0417, 0.75, 0.9167, 0.1875, self.WIDTH, self.HEIGHT)
+        self.text_box = TextBox(int(0.0417 * self.WIDTH), int(0.75 * self.HEIGHT), int(0.9167 * self.WIDTH),
+                                int(0.1875 * self.HEIGHT), int(0.04 * self.HEIGHT),
+                                line_spacing=int(0.00625 * self.HEIGHT), padding=int(0.0125 * self.WIDTH))
         self.game_state = "intro"
         self.intro_text = "Welcome to Saturn! John, there's a puzzle! The puzzle should look like the image on top!"
         self.victory_text = "Congratulations! You've successfully completed the Saturn stage! Obtained the Scorpio and the Capricorn gem"
@@ -131,46 +89,49 @@ class Saturn:
 
     def draw_reference_image(self):
         small_sign_size = int(0.125 * self.HEIGHT)
-        self.screen.blit(pygame.transform.scale(self.alien_image, (small_sign_size, small_sign_size)),
+        self.screen.blit(assets.image('src/saturn.png', (small_sign_size, small_sign_size), alpha=True),
                          (self.WIDTH // 2 - small_sign_size // 2, int(0.0125 * self.HEIGHT)))
 
     def check_correct_placement(self):
         return self.grid == list(range(self.total_pieces))
 
     def draw_pause_menu(self):
-        overlay = pygame.Surface((self.WIDTH, self.HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 100))  # 100 alpha for translucency
-        self.screen.blit(overlay, (0, 0))
-
-        resume_text = self.pause_menu_font.render("Resume", True,
-                                                  self.WHITE if self.selected_option != 0 else self.BLACK)
-        retry_text = self.pause_menu_font.render("Retry", True, self.WHITE if self.selected_option != 1 else self.BLACK)
-        quit_text = self.pause_menu_font.render("Quit", True, self.WHITE if self.selected_option != 2 else self.BLACK)
-
-        menu_height = resume_text.get_height() * 3
-        menu_width = max(resume_text.get_width(), retry_text.get_width(), quit_text.get_width()) + int(0.0333 * self.WIDTH)
-
-        menu_x = (self.WIDTH - menu_width) // 2
-        menu_y = (self.HEIGHT - menu_height) // 2
-
-        pygame.draw.rect(self.screen, self.WHITE, (menu_x, menu_y, menu_width, menu_height), 2)
-        self.screen.blit(resume_text, (menu_x + int(0.0167 * self.WIDTH), menu_y + int(0.025 * self.HEIGHT)))
-        self.screen.blit(retry_text, (menu_x + int(0.0167 * self.WIDTH), menu_y + int(0.025 * self.HEIGHT) + resume_text.get_height()))
-        self.screen.blit(quit_text, (menu_x + int(0.0167 * self.WIDTH), menu_y + int(0.025 * self.HEIGHT) + resume_text.get_height() * 2))
+        # Moving the highlight only redraws the two options it moves between
+        self.pause_modal.draw(self.screen, self.draw_pause_box, key=self.selected_option,
+                              option=self.draw_pause_option, options=len(self.pause_options))
+
+    def pause_menu_layout(self):
+        # The box around the options, sized to fit the widest, and the spacing
+        # of the options in it
+        widths, heights = zip(*(self.pause_menu_font.size(option) for option in self.pause_options))
+        line_height = heights[0]
+        menu_width = max(widths) + int(0.0333 * self.WIDTH)
+        menu_height = line_height * 3
+        menu = pygame.Rect((self.WIDTH - menu_width) // 2, (self.HEIGHT - menu_height) // 2, menu_width, menu_height)
+        return menu, line_height
+
+    def draw_pause_box(self, surface):
+        pygame.draw.rect(surface, self.WHITE, self.pause_menu_layout()[0], 2)
+
+    def draw_pause_option(self, surface, index, selected):
+        text = texts.render(self.pause_menu_font, self.pause_options[index], True, self.BLACK if selected else self.WHITE)
+        menu, line_height = self.pause_menu_layout()
+        return surface.blit(text, (menu.x + int(0.0167 * self.WIDTH),
+                                   menu.y + int(0.025 * self.HEIGHT) + line_height * index))
 
     def draw_congratulations(self):
         self.screen.blit(self.background, (0, 0))  # Draw the background image
 
         self.text_box.draw(self.screen)
 
-        congratulations_text = self.congratulations_font.render("Congratulations! The puzzle is solved.", True,
+        congratulations_text = texts.render(self.congratulations_font, "Congratulations! The puzzle is solved.", True,
                                                                 self.WHITE)
         text_rect = congratulations_text.get_rect(center=(self.WIDTH // 2, self.HEIGHT // 2 - int(0.125 * self.HEIGHT)))
         self.screen.blit(congratulations_text, text_rect)
 
         for i, option in enumerate(self.congratulations_options):
             color = self.BLACK if self.congratulations_selected == i else self.WHITE
-            option_text = self.options_font.render(option, True, color)
+            option_text = texts.render(self.options_font, option, True, color)
             text_x = self.WIDTH // 2 - option_text.get_width() // 2
             text_y = self.HEIGHT // 2 + int(0.0625 * self.HEIGHT) + i * (option_text.get_height() + int(0.025 * self.HEIGHT))
 
@@ -181,17 +142,17 @@ class Saturn:
             self.screen.blit(option_text, (text_x, text_y))
 
     def handle_events(self):
-        for event in pygame.event.get():
+        for event in inputs.events():
+            self.renderer.handle_event(event)
             if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
+                return "quit"
             elif event.type == pygame.KEYDOWN:
                 if self.game_state == "intro":
                     if event.key == pygame.K_RETURN:
                         if self.text_box.is_finished():
                             self.game_state = "playing"
                         else:
-                            self.text_box.reveal_index = sum(len(line) for line in self.text_box.text_content)
+                            self.text_box.reveal_all()
                 elif event.key == pygame.K_ESCAPE:
                     if not self.congratulations_active:
                         self.pause_menu_active = not self.pause_menu_active
@@ -208,7 +169,7 @@ class Saturn:
                         elif self.selected_option == 1:  # Retry
                             self.reset_game()
                         elif self.selected_option == 2:  # Quit
-                            pygame.mixer.music.stop()
+                            music.stop()
                             return "main_menu"
 
                 if self.congratulations_active:
@@ -222,7 +183,7 @@ class Saturn:
                         if self.congratulations_selected == 0:  # Retry
                             self.reset_game()
                         elif self.congratulations_selected == 1:  # Quit
-                            pygame.mixer.music.stop()
+                            music.stop()
                             return "main_menu"
 
             elif event.type == pygame.MOUSEBUTTONDOWN and not self.game_over and not self.pause_menu_active:
@@ -259,7 +220,7 @@ class Saturn:
         return None
 
     def reset_game(self):
-        random.shuffle(self.grid)
+        self.rng.shuffle(self.grid)
         self.game_over = False
         self.congratulations_active = False
         self.selected_option = 0
@@ -268,34 +229,47 @@ class Saturn:
         self.text_box.set_text(self.intro_text)
 
     def run(self):
-        clock = pygame.time.Clock()
         self.text_box.set_text(self.intro_text)
         while True:
             action = self.handle_events()
-            if action == "main_menu":
-                return "main_menu"
+            if action in ("main_menu", "quit"):
+                return action
 
-            self.screen.blit(self.background, (0, 0))
+            full = self.renderer.begin()
 
+            # The puzzle only changes on input; between events just the text box reveal is redrawn
+            idle = True
             if self.game_state == "intro":
+                revealing = not self.text_box.is_finished()
+                idle = not revealing
                 self.text_box.update()
-                self.text_box.draw(self.screen)
+                if full or revealing:
+                    self.text_box.draw(self.screen)
+                    self.renderer.mark(self.text_box.rect)
             elif self.congratulations_active:
                 if self.text_box.text != self.victory_text:
                     self.text_box.set_text(self.victory_text)
+                revealing = not self.text_box.is_finished()
+                idle = not revealing
                 self.text_box.update()
-                self.draw_congratulations()
-            elif self.game_state == "playing":
+                if full:
+                    self.draw_congratulations()
+                elif revealing:
+                    self.text_box.draw(self.screen)
+                    self.renderer.mark(self.text_box.rect)
+            elif self.game_state == "playing" and full and not (self.pause_menu_active and self.pause_modal.showing()):
+                # Behind an open pause menu the puzzle would only be covered again
                 self.draw_reference_image()
                 self.draw_grid()
 
+            # Drawn every frame while paused so the modal keeps its snapshot
             if self.pause_menu_active and not self.congratulations_active:
                 self.draw_pause_menu()
 
-            pygame.display.flip()
-            clock.tick(30)
+            self.renderer.present()
+            # Pieces only move when dragged, so between inputs the loop sleeps
+            runtime.tick(30, idle=idle)
 
 
 if __name__ == "__main__":
-    game = Saturn()
-    game.run()
\ No newline at end of file
+    SceneManager().run("saturn")
\ No newline at end of file
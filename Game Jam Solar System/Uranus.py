@@ -1,84 +1,46 @@
 import pygame
-import random
 import math
 import textwrap
 import time
-from pygame import mixer
-
-
-class TextBox:
-    def __init__(self, x, y, width, height, font_size):
-        self.rect = pygame.Rect(x, y, width, height)
-        self.text = ""
-        self.rendered_text = []
-        self.text_content = []
-        self.reveal_index = 0
-        self.line_spacing = int(height * 0.05)
-        self.font = pygame.font.Font(None, font_size)
-
-    def set_text(self, text):
-        self.text = text
-        self.rendered_text = []
-        self.text_content = []
-        wrapped_text = self.wrap_text(text, self.rect.width - 20)
-        for line in wrapped_text:
-            self.rendered_text.append(self.font.render(line, True, (255, 255, 255)))
-            self.text_content.append(line)
-        self.reveal_index = 0
-
-    def wrap_text(self, text, max_width):
-        words = text.split(' ')
-        wrapped_lines = []
-        current_line = ""
-        for word in words:
-            test_line = current_line + word + " "
-            if self.font.size(test_line)[0] <= max_width:
-                current_line = test_line
-            else:
-                wrapped_lines.append(current_line.strip())
-                current_line = word + " "
-        wrapped_lines.append(current_line.strip())
-        return wrapped_lines
-
-    def update(self):
-        self.reveal_index += 1
-
-    def draw(self, surface):
-        pygame.draw.rect(surface, (0, 0, 0), self.rect)
-        pygame.draw.rect(surface, (255, 255, 255), self.rect, 3)
-
-        y = self.rect.top + 10
-        for i, (line, content) in enumerate(zip(self.rendered_text, self.text_content)):
-            x = self.rect.left + 10
-            if i * len(content) < self.reveal_index:
-                surface.blit(line, (x, y))
-                y += line.get_height() + self.line_spacing
-
-    def is_finished(self):
-        return self.reveal_index >= sum(len(line) for line in self.text_content)
+from assets import assets
+from textcache import texts
+from modal import Modal
+from textbox import TextBox
+from music import music
+from sounds import sounds
+from scenes import SceneManager
+from runtime import runtime
+from replay import inputs
+from render import Renderer
+from loop import FixedStep
+
+# Decoded ahead of time while the stage is highlighted in the level menu
+PRELOAD_IMAGES = ['src/uranus.jpg']
+PRELOAD_SOUNDS = ['src/pop.mp3']
+MUSIC = 'src/uranusbgm.mp3'
 
 
 class Uranus:
-    def __init__(self):
-        # Initialize Pygame
-        pygame.init()
-
-        # Screen dimensions
-        info = pygame.display.Info()
-        self.WIDTH, self.HEIGHT = info.current_w, info.current_h
-        self.screen = pygame.display.set_mode((self.WIDTH, self.HEIGHT))
+    def __init__(self, screen):
+        # Shared display surface
+        self.screen = screen
+        # The whole scene moves every frame, so there are no dirty rectangles to track
+        self.renderer = Renderer(screen, dirty=False)
+        self.pause_modal = Modal()
+        self.game_over_modal = Modal(None)
+        # Seeded by the runtime, so a run can be reproduced
+        self.rng = runtime.rng
+        self.WIDTH, self.HEIGHT = screen.get_size()
         pygame.display.set_caption("Balloon Pop Game")
 
         # Load background image
-        self.background = pygame.image.load('src/uranus.jpg')
-        self.background = pygame.transform.scale(self.background, (self.WIDTH, self.HEIGHT))
+        self.background = assets.background('src/uranus.jpg', (self.WIDTH, self.HEIGHT))
 
         # Load pop sound
-        self.pop_sound = pygame.mixer.Sound('src/pop.mp3')
+        sounds.preload(['pop'])
 
         # Load background music
-        pygame.mixer.music.load('src/uranusbgm.mp3')
-        pygame.mixer.music.play(-1)  # Play the music in a loop
+        music.play(MUSIC)
 
         # Colors
         self.WHITE = (255, 255, 255)
@@ -91,16 +53,18 @@ class Uranus:
         self.small_font_size = int(self.HEIGHT * 0.03)
         self.menu_font_size = int(self.HEIGHT * 0.04)
 
-        self.font = pygame.font.Font(None, self.font_size)
-        self.small_font = pygame.font.Font(None, self.small_font_size)
-        self.menu_font = pygame.font.Font(None, self.menu_font_size)
+        self.font = texts.font(None, self.font_size)
+        self.small_font = texts.font(None, self.small_font_size)
+        self.menu_font = texts.font(None, self.menu_font_size)
 
         # Initialize game variables
+        # Balloons and the arrow move at a fixed 60 ticks per second
+        self.loop = FixedStep(tick_rate=60)
         self.game_over = False
         self.congratulations = False
         self.paused = False
-        self.balloons = [self.Balloon(random.randint(50, self.WIDTH - 50), random.randint(50, self.HEIGHT - 50), self.RED, self) for _ in range(5)]
-        self.balloons += [self.Balloon(random.randint(50, self.WIDTH - 50), random.randint(50, self.HEIGHT - 50), self.GRAY, self) for _ in range(10)]
+        self.balloons = [self.Balloon(self.rng.randint(50, self.WIDTH - 50), self.rng.randint(50, self.HEIGHT - 50), self.RED, self) for _ in range(5)]
+        self.balloons += [self.Balloon(self.rng.randint(50, self.WIDTH - 50), self.rng.randint(50, self.HEIGHT - 50), self.GRAY, self) for _ in range(10)]
         self.arrow = None
         self.player_score = 0
 
@@ -115,7 +79,8 @@ class Uranus:
         # Text box and game state
         text_box_height = int(self.HEIGHT * 0.2)
         self.text_box = TextBox(int(self.WIDTH * 0.05), self.HEIGHT - text_box_height - int(self.HEIGHT * 0.05),
-                                int(self.WIDTH * 0.9), text_box_height, int(self.HEIGHT * 0.03))
+                                int(self.WIDTH * 0.9), text_box_height, int(self.HEIGHT * 0.03),
+                                line_spacing=int(text_box_height * 0.05))
 
         self.game_state = "intro"
         self.intro_text = "Welcome to Uranus! John, your mission is to pop only the RED balloons! Don't miss a single shot!"
@@ -128,8 +93,8 @@ class Uranus:
             self.y = y
             self.color = color
             self.radius = int(parent.WIDTH * 0.025)
-            self.speed = random.uniform(1, 3)
-            self.direction = random.uniform(0, 2 * math.pi)
+            self.speed = parent.rng.uniform(1, 3)
+            self.direction = parent.rng.uniform(0, 2 * math.pi)
             self.parent = parent
 
         def move(self):
@@ -178,12 +143,13 @@ class Uranus:
                 return balloon
         return None
 
-    def display_message(self, message, sub_message=None):
-        text = self.font.render(message, True, self.BLACK)
-        self.screen.blit(text, (self.WIDTH // 2 - text.get_width() // 2, self.HEIGHT // 2 - text.get_height() // 2))
+    def display_message(self, message, sub_message=None, surface=None):
+        surface = self.screen if surface is None else surface
+        text = texts.render(self.font, message, True, self.BLACK)
+        surface.blit(text, (self.WIDTH // 2 - text.get_width() // 2, self.HEIGHT // 2 - text.get_height() // 2))
         if sub_message:
-            sub_text = self.small_font.render(sub_message, True, self.BLACK)
-            self.screen.blit(sub_text, (self.WIDTH // 2 - sub_text.get_width() // 2, self.HEIGHT // 2 + text.get_height()))
+            sub_text = texts.render(self.small_font, sub_message, True, self.BLACK)
+            surface.blit(sub_text, (self.WIDTH // 2 - sub_text.get_width() // 2, self.HEIGHT // 2 + text.get_height()))
 
     def show_game_over(self):
         self.display_message("Game Over!", "Press R to retry or Q to quit")
@@ -195,39 +161,74 @@ class Uranus:
         self.game_over = False
         self.congratulations = False
         self.paused = False
-        self.balloons = [self.Balloon(random.randint(50, self.WIDTH - 50), random.randint(50, self.HEIGHT - 50), self.RED, self) for _ in range(5)]
-        self.balloons += [self.Balloon(random.randint(50, self.WIDTH - 50), random.randint(50, self.HEIGHT - 50), self.GRAY, self) for _ in range(10)]
+        self.balloons = [self.Balloon(self.rng.randint(50, self.WIDTH - 50), self.rng.randint(50, self.HEIGHT - 50), self.RED, self) for _ in range(5)]
+        self.balloons += [self.Balloon(self.rng.randint(50, self.WIDTH - 50), self.rng.randint(50, self.HEIGHT - 50), self.GRAY, self) for _ in range(10)]
         self.arrow = None
         self.player_score = 0
         self.game_state = "playing"
 
+    def update(self):
+        if self.game_state != "playing":
+            return
+
+        for balloon in self.balloons:
+            balloon.move()
+
+        if self.arrow:
+            self.arrow.move()
+
+            # Check for collisions
+            balloon = self.check_collision(self.arrow)
+            if balloon:
+                if balloon.color == self.RED:
+                    sounds.play('pop')
+                    self.balloons.remove(balloon)
+                    self.arrow = None
+                    self.player_score += 1
+                    if self.player_score == 5:
+                        self.game_state = "victory"
+                        self.text_box.set_text(self.victory_text)
+                else:
+                    self.game_state = "defeat"
+                    self.text_box.set_text(self.defeat_text)
+                    self.arrow = None
+            elif self.arrow.y < 0 or self.arrow.x < 0 or self.arrow.x > self.WIDTH:
+                self.game_state = "defeat"
+                self.text_box.set_text(self.defeat_text)
+                self.arrow = None
+
+    def entity_counts(self):
+        # Shown by the profiler overlay
+        return {'balloons': len(self.balloons)}
+
     def draw_pause_menu(self):
-        overlay = pygame.Surface((self.WIDTH, self.HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 180))  # Translucent black
-        self.screen.blit(overlay, (0, 0))
+        # Moving the highlight only redraws the two options it moves between
+        self.pause_modal.draw(self.screen, key=self.selected_option, option=self.draw_pause_option,
+                              options=len(self.menu_options))
 
-        for idx, option in enumerate(self.menu_options):
-            text_surface = self.menu_font.render(option, True, self.WHITE)
-            x = self.WIDTH // 2 - text_surface.get_width() // 2
-            y = self.HEIGHT // 2 - len(self.menu_options) * text_surface.get_height() // 2 + idx * text_surface.get_height() * 1.5
-            self.screen.blit(text_surface, (x, y))
+    def draw_pause_option(self, surface, idx, selected):
+        text_surface = texts.render(self.menu_font, self.menu_options[idx], True, self.WHITE)
+        x = self.WIDTH // 2 - text_surface.get_width() // 2
+        y = self.HEIGHT // 2 - len(self.menu_options) * text_surface.get_height() // 2 + idx * text_surface.get_height() * 1.5
+        rect = surface.blit(text_surface, (x, y))
 
-            if idx == self.selected_option:
-                pygame.draw.rect(self.screen, self.WHITE, (x - 10, y - 10, text_surface.get_width() + 20, text_surface.get_height() + 20), 3)
+        if selected:
+            rect = pygame.draw.rect(surface, self.WHITE, (x - 10, y - 10, text_surface.get_width() + 20, text_surface.get_height() + 20), 3)
+        return rect
 
     def handle_game_over(self, is_victory):
-        overlay = pygame.Surface((self.WIDTH, self.HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 180))  # Translucent black
+        def draw_result(surface):
+            surface.blit(self.background, (0, 0))
+            if is_victory:
+                self.display_message("Congratulations!", surface=surface)
+            else:
+                self.display_message("Game Over!", surface=surface)
 
+        self.game_over_modal.close()
         waiting = True
         while waiting:
-            self.screen.blit(self.background, (0, 0))
-            # self.screen.blit(overlay, (0, 0))
-
-            if is_victory:
-                self.display_message("Congratulations!")
-            else:
-                self.display_message("Game Over!")
+            # Background and title are one cached frame; the dialogue box goes on top
+            self.game_over_modal.draw(self.screen, draw_result)
 
             self.text_box.update()
             self.text_box.draw(self.screen)
@@ -235,9 +236,9 @@ class Uranus:
             if self.text_box.is_finished():
                 self.display_message("", "Press R to restart or Q to quit")
 
-            pygame.display.flip()
+            self.renderer.present()
 
-            for event in pygame.event.get():
+            for event in inputs.events():
                 if event.type == pygame.QUIT:
                     return "quit"
                 if event.type == pygame.KEYDOWN:
@@ -245,20 +246,19 @@ class Uranus:
                         self.reset_game()
                         return "restart"
                     elif event.key == pygame.K_q:
-                        pygame.mixer.music.stop()
+                        music.stop()
                         return "main_menu"
 
-            self.clock.tick(60)
+            runtime.tick(60)
 
     def main(self):
         running = True
-        self.clock = pygame.time.Clock()
         self.text_box.set_text(self.intro_text)
 
         while running:
             self.screen.blit(self.background, (0, 0))
 
-            for event in pygame.event.get():
+            for event in inputs.events():
                 if event.type == pygame.QUIT:
                     running = False
                 elif event.type == pygame.KEYDOWN:
@@ -272,7 +272,7 @@ class Uranus:
                                 elif self.selected_option == 1:
                                     self.reset_game()  # Restart
                                 elif self.selected_option == 2:
-                                    pygame.mixer.music.stop()  # Quit
+                                    music.stop()  # Quit
                                     return "main_menu"
                             else:
                                 self.paused = not self.paused
@@ -287,12 +287,17 @@ class Uranus:
                                 elif self.selected_option == 1:  # Restart
                                     self.reset_game()
                                 elif self.selected_option == 2:  # Quit
-                                    pygame.mixer.music.stop()
+                                    music.stop()
                                     return "main_menu"
                 elif event.type == pygame.MOUSEBUTTONDOWN and self.game_state == "playing" and not self.paused and self.arrow is None:
                     x, y = event.pos
                     self.arrow = self.Arrow(self.bow_x, self.bow_y, x, y, self.RED, self)
 
+            if self.game_state == "playing" and not self.paused:
+                self.loop.step(self.update)
+            else:
+                self.loop.hold()
+
             if self.game_state == "intro":
                 self.text_box.update()
                 self.text_box.draw(self.screen)
@@ -300,39 +305,14 @@ class Uranus:
                     self.display_message("", "Press any key to start")
             elif self.game_state == "playing":
                 if not self.paused:
-                    # Move and draw balloons
                     for balloon in self.balloons:
-                        balloon.move()
                         balloon.draw(self.screen)
-
-                    # Move and draw arrow
                     if self.arrow:
-                        self.arrow.move()
                         self.arrow.draw(self.screen)
 
-                        # Check for collisions
-                        balloon = self.check_collision(self.arrow)
-                        if balloon:
-                            if balloon.color == self.RED:
-                                self.pop_sound.play()
-                                self.balloons.remove(balloon)
-                                self.arrow = None
-                                self.player_score += 1
-                                if self.player_score == 5:
-                                    self.game_state = "victory"
-                                    self.text_box.set_text(self.victory_text)
-                            else:
-                                self.game_state = "defeat"
-                                self.text_box.set_text(self.defeat_text)
-                                self.arrow = None
-                        elif self.arrow.y < 0 or self.arrow.x < 0 or self.arrow.x > self.WIDTH:
-                            self.game_state = "defeat"
-                            self.text_box.set_text(self.defeat_text)
-                            self.arrow = None
-
                     # Draw bow and aiming line
                     if self.arrow is None:
-                        mouse_x, mouse_y = pygame.mouse.get_pos()
+                        mouse_x, mouse_y = inputs.mouse_pos()
                         angle = math.atan2(mouse_y - self.bow_y, mouse_x - self.bow_x)
                         end_x = self.bow_x + self.bow_length * math.cos(angle)
                         end_y = self.bow_y + self.bow_length * math.sin(angle)
@@ -340,7 +320,7 @@ class Uranus:
                                          int(self.WIDTH * 0.005))
 
                     # Draw score
-                    score_text = self.small_font.render(f"Score: {self.player_score}/5", True, self.WHITE)
+                    score_text = texts.render(self.small_font, f"Score: {self.player_score}/5", True, self.WHITE)
                     self.screen.blit(score_text, (int(self.WIDTH * 0.02), int(self.HEIGHT * 0.02)))
                 else:
                     self.draw_pause_menu()
@@ -348,18 +328,17 @@ class Uranus:
                 result = self.handle_game_over(self.game_state == "victory")
                 if result == "restart":
                     self.game_state = "playing"
+                    self.loop.hold()
                 elif result == "main_menu":
                     return "main_menu"
                 elif result == "quit":
                     running = False
 
-            pygame.display.flip()
-            self.clock.tick(60)
+            self.renderer.present()
+            runtime.tick(60)
 
-        pygame.quit()
-        return "main_menu"
+        return "quit"
 
 
 if __name__ == "__main__":
-    game = Uranus()
-    game.main()
+    SceneManager().run("uranus")
@@ -0,0 +1,226 @@
+import io
+import os
+import sys
+import mmap
+import struct
+import hashlib
+import argparse
+import threading
+
+# Every image and sound of the game in one file, built with
+#   python assetpack.py build
+# and memory-mapped at run time. Files in the pack are read from the map instead
+# of being opened one by one; anything not in it is still read from disk, as is
+# any file edited since the pack was built (except in a frozen build).
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PACK_PATH = os.path.join(BASE_DIR, 'assets.pack')
+SOURCE_DIRS = ['src', 'planets']
+
+# Header: magic, version, entry count, index offset, index size
+HEADER = struct.Struct('<4sHIQQ')
+MAGIC = b'SRPK'
+VERSION = 1
+# Index entry: data offset, size, sha1 of the data, path length; followed by the path (utf-8)
+ENTRY = struct.Struct('<QQ20sH')
+# File data starts on these boundaries
+ALIGN = 16
+
+
+def pack_key(path):
+    # Paths are stored relative to the game directory with forward slashes
+    return os.path.normpath(path).replace(os.sep, '/')
+
+
+class PackEntry:
+    def __init__(self, offset, size, digest):
+        self.offset = offset
+        self.size = size
+        self.digest = digest
+
+
+class PackReader(io.RawIOBase):
+    # Read-only file over one entry's slice of the map, for pygame.image.load and
+    # mixer.Sound. Reads copy straight from the map; nothing is opened.
+    def __init__(self, view):
+        super().__init__()
+        self.view = view
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += len(self.view)
+        self.position = max(0, offset)
+        return self.position
+
+    def readinto(self, buffer):
+        count = max(0, min(len(buffer), len(self.view) - self.position))
+        buffer[:count] = self.view[self.position:self.position + count]
+        self.position += count
+        return count
+
+
+class AssetPack:
+    def __init__(self, path=PACK_PATH):
+        self.path = path
+        self.entries = None  # pack key -> PackEntry, None until load() has run
+        self.map = None
+        self.data = None  # memoryview of the whole map
+        self.built = None  # mtime (ns) of the pack file
+        self.checked = set()  # keys already compared with the loose file
+        self.lock = threading.Lock()
+
+        # Counters
+        self.reads = 0
+        self.misses = 0
+        self.stale = 0
+
+    def load(self):
+        # Maps the pack on first use; without one every asset comes from disk
+        with self.lock:
+            if self.entries is not None:
+                return bool(self.entries)
+            self.entries = {}
+            try:
+                with open(self.path, 'rb') as f:
+                    self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    self.built = os.fstat(f.fileno()).st_mtime_ns
+            except (OSError, ValueError):
+                return False
+
+            magic, version, count, index_offset, index_size = HEADER.unpack_from(self.map)
+            if magic != MAGIC or version != VERSION:
+                print(f"Ignoring {self.path}: not a version {VERSION} asset pack")
+                self.map.close()
+                self.map = None
+                return False
+
+            self.data = memoryview(self.map)
+            position = index_offset
+            for _ in range(count):
+                offset, size, digest, length = ENTRY.unpack_from(self.map, position)
+                position += ENTRY.size
+                name = bytes(self.data[position:position + length]).decode('utf-8')
+                position += length
+                self.entries[name] = PackEntry(offset, size, digest)
+            return True
+
+    def entry(self, path):
+        if not self.load():
+            return None
+        key = pack_key(path)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and key not in self.checked:
+                self.checked.add(key)
+                if self.is_stale(key):
+                    print(f"{key} is newer than {self.path}, loading it from disk instead "
+                          f"(run python assetpack.py build to update the pack)")
+                    del self.entries[key]
+                    self.stale += 1
+                    entry = None
+            return entry
+
+    def is_stale(self, key):
+        # Whether the loose file was changed after the pack was built. A frozen
+        # build ships without loose files, so the pack always wins there.
+        if getattr(sys, 'frozen', False):
+            return False
+        try:
+            return os.stat(os.path.join(BASE_DIR, key)).st_mtime_ns > self.built
+        except OSError:
+            return False
+
+    def view(self, path):
+        # Zero-copy view of a file's bytes, or None when it is not in the pack
+        entry = self.entry(path)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.reads += 1
+        return self.data[entry.offset:entry.offset + entry.size]
+
+    def open(self, path):
+        view = self.view(path)
+        return None if view is None else PackReader(view)
+
+    def stats(self):
+        return {
+            'entries': len(self.entries or ()),
+            'mapped_bytes': len(self.map) if self.map is not None else 0,
+            'reads': self.reads,
+            'misses': self.misses,
+            'stale': self.stale,
+        }
+
+
+def build(output=PACK_PATH, source_dirs=SOURCE_DIRS):
+    # Writes every file under source_dirs (relative to the game directory) into one pack
+    names = []
+    for directory in source_dirs:
+        for root, dirs, files in os.walk(os.path.join(BASE_DIR, directory)):
+            dirs.sort()
+            for file_name in sorted(files):
+                names.append(pack_key(os.path.relpath(os.path.join(root, file_name), BASE_DIR)))
+
+    index = []
+    # Write to a temporary file first so a crash never leaves a torn pack
+    temp = output + '.tmp'
+    with open(temp, 'wb') as out:
+        out.write(bytes(HEADER.size))
+        for name in names:
+            out.write(bytes(-out.tell() % ALIGN))
+            with open(os.path.join(BASE_DIR, name), 'rb') as f:
+                data = f.read()
+            index.append((name, out.tell(), len(data), hashlib.sha1(data).digest()))
+            out.write(data)
+
+        index_offset = out.tell()
+        for name, offset, size, digest in index:
+            encoded = name.encode('utf-8')
+            out.write(ENTRY.pack(offset, size, digest, len(encoded)) + encoded)
+        index_size = out.tell() - index_offset
+
+        out.seek(0)
+        out.write(HEADER.pack(MAGIC, VERSION, len(index), index_offset, index_size))
+    os.replace(temp, output)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or list the packed asset archive")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build_command = commands.add_parser('build', help="pack src/ and planets/")
+    build_command.add_argument('--output', default=PACK_PATH)
+    list_command = commands.add_parser('list', help="show what a pack holds")
+    list_command.add_argument('path', nargs='?', default=PACK_PATH)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        index = build(args.output)
+        total = sum(size for name, offset, size, digest in index)
+        print(f"{args.output}: {len(index)} files, {total / (1024 * 1024):.1f} MB")
+    else:
+        archive = AssetPack(args.path)
+        if not archive.load():
+            print(f"{args.path}: no asset pack")
+            sys.exit(1)
+        for name, entry in sorted(archive.entries.items()):
+            print(f"{entry.size:>10}  {entry.digest.hex()[:12]}  {name}")
+
+
+# Shared by the asset manager and the music player
+pack = AssetPack()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import pygame
+import threading
+from pygame import mixer
+from collections import OrderedDict
+from assetpack import pack
+from diskcache import BackgroundCache
+
+
+def load_image(path):
+    # Decodes from the memory-mapped asset pack when the file is in it
+    stream = pack.open(path)
+    if stream is None:
+        return pygame.image.load(path)
+    return pygame.image.load(stream, path)
+
+
+def load_sound(path):
+    stream = pack.open(path)
+    if stream is None:
+        return mixer.Sound(path)
+    return mixer.Sound(file=stream)
+
+
+class AssetManager:
+    def __init__(self, budget_bytes=256 * 1024 * 1024):
+        # Converted surfaces and decoded sounds keyed by (kind, path, size, flags),
+        # kept in least-recently-used order
+        self.cache = OrderedDict()
+        self.sizes = {}
+        self.budget_bytes = budget_bytes
+        self.used_bytes = 0
+
+        # Images decoded ahead of time (e.g. by the level menu prefetcher) that
+        # are waiting for the main thread to convert them
+        self.decoded = {}
+        self.lock = threading.RLock()
+
+        # Pre-scaled backgrounds persisted between launches
+        self.disk_cache = BackgroundCache()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def image(self, path, size=None, alpha=False):
+        key = ('image', path, size, alpha)
+        surface = self.lookup(key)
+        if surface is not None:
+            return surface
+
+        if size is None:
+            with self.lock:
+                surface = self.decoded.pop(path, None)
+            if surface is None:
+                surface = load_image(path)
+        else:
+            # Scale from the cached full-size image so other sizes skip the decode
+            surface = pygame.transform.scale(self.image(path, None, alpha), size)
+
+        # Convert to the display pixel format so blits don't convert on the fly.
+        # Without a display there is nothing to convert to, so don't cache either.
+        if pygame.display.get_surface() is None:
+            return surface
+        surface = surface.convert_alpha() if alpha else surface.convert()
+
+        self.store(key, surface, surface.get_pitch() * surface.get_height())
+        return surface
+
+    def background(self, path, size):
+        # Full-screen, opaque images: also try the on-disk cache of pre-scaled buffers
+        key = ('image', path, size, False)
+        surface = self.lookup(key)
+        if surface is not None:
+            return surface
+
+        display = pygame.display.get_surface()
+        if display is None:
+            return self.image(path, size)
+
+        surface = self.disk_cache.load(path, size, display)
+        if surface is None:
+            surface = self.image(path, size)
+            self.disk_cache.store(path, surface, display)
+            return surface
+
+        self.store(key, surface, surface.get_pitch() * surface.get_height())
+        return surface
+
+    def sound(self, path):
+        key = ('sound', path, None, False)
+        sound = self.lookup(key)
+        if sound is not None:
+            return sound
+
+        sound = load_sound(path)
+        frequency, sample_format, channels = mixer.get_init()
+        nbytes = int(sound.get_length() * frequency * channels * (abs(sample_format) // 8))
+
+        self.store(key, sound, nbytes)
+        return sound
+
+    def preload_image(self, path):
+        # Decode only; converting needs the display and happens on first use.
+        # Safe to call from a worker thread.
+        with self.lock:
+            if path in self.decoded or any(key[1] == path for key in self.cache):
+                return
+        surface = load_image(path)
+        with self.lock:
+            self.decoded[path] = surface
+
+    def release(self, paths):
+        with self.lock:
+            for path in paths:
+                self.decoded.pop(path, None)
+
+    def lookup(self, key):
+        with self.lock:
+            item = self.cache.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return item
+
+    def store(self, key, item, nbytes):
+        with self.lock:
+            self.cache[key] = item
+            self.sizes[key] = nbytes
+            self.used_bytes += nbytes
+
+            # Evict least recently used entries, but never the one just stored
+            while self.used_bytes > self.budget_bytes and len(self.cache) > 1:
+                old_key, _ = self.cache.popitem(last=False)
+                self.used_bytes -= self.sizes.pop(old_key)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+            self.sizes.clear()
+            self.decoded.clear()
+            self.used_bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': len(self.cache),
+            'decoded': len(self.decoded),
+            'used_bytes': self.used_bytes,
+            'budget_bytes': self.budget_bytes,
+        }
+
+
+# Shared by every stage so re-entering a stage reuses what's already decoded
+assets = AssetManager()
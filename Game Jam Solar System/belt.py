@@ -0,0 +1,105 @@
+import numpy as np
+import pygame
+from mipmaps import ZoomCache
+
+# Rocks drawn smaller than this many pixels across are plotted as single pixels
+# instead of blitted
+MIN_SPRITE = 2
+
+# Shades and sizes (in world units, before the screen scale factor) of the rock
+# sprites every belt picks from
+SHADES = [(120, 110, 100), (150, 140, 125), (95, 90, 85), (170, 160, 150)]
+SIZES = [2, 3, 4, 6]
+SPRITE_SIZE = 16  # pixels across of the full-size rock images that get scaled down
+
+
+def rock_images():
+    images = {}
+    for variant, shade in enumerate(SHADES):
+        image = pygame.Surface((SPRITE_SIZE, SPRITE_SIZE), pygame.SRCALPHA)
+        pygame.draw.circle(image, shade, (SPRITE_SIZE // 2, SPRITE_SIZE // 2), SPRITE_SIZE // 2)
+        images[variant] = image
+    return images
+
+
+class Belt:
+    def __init__(self, seed, count, inner, outer, rate, scale_factor=1.0):
+        # A ring of count rocks between inner and outer (distances from the Sun),
+        # kept as arrays so moving, culling and drawing them doesn't loop over
+        # rocks in Python. rate is the angular speed (radians per tick) at the
+        # inner edge; farther rocks are slower, as in Kepler's third law.
+        generator = np.random.default_rng(seed)
+        # Denser towards the middle of the ring
+        self.distance = inner + (outer - inner) * generator.beta(2.0, 2.0, count)
+        self.phase = generator.uniform(0, 2 * np.pi, count)
+        self.rate = rate * (self.distance / inner) ** -1.5 * generator.uniform(0.95, 1.05, count)
+        self.variant = generator.integers(0, len(SHADES), count)
+        self.scale_factor = scale_factor
+        self.size = np.array(SIZES, float)[self.variant] * scale_factor
+
+        # Rocks grouped by sprite, so each frame only has to pick the visible ones
+        self.groups = [np.flatnonzero(self.variant == variant) for variant in range(len(SHADES))]
+        self.sprites = ZoomCache(rock_images())
+
+        # Counters for the current frame
+        self.blitted = 0
+        self.plotted = 0
+
+    def __len__(self):
+        return len(self.distance)
+
+    def positions(self, tick):
+        # Where every rock is at a (fractional) tick, relative to the Sun
+        angle = self.phase + self.rate * tick
+        return self.distance * np.cos(angle), self.distance * np.sin(angle)
+
+    def draw(self, screen, viewport, tick, zoom, offset_x, offset_y):
+        x, y = self.positions(tick)
+        screen_x = x * zoom + offset_x
+        screen_y = y * zoom + offset_y
+        visible = viewport.circles_visible(screen_x, screen_y, self.size * zoom / 2)
+
+        blits = []
+        plots = []
+        for variant, group in enumerate(self.groups):
+            group = group[visible[group]]
+            if not len(group):
+                continue
+            size = int(SIZES[variant] * self.scale_factor * zoom)
+            if size < MIN_SPRITE:
+                plots.append((variant, group))
+                continue
+            sprite = self.sprites.sprite(variant, zoom, (size, size))
+            left = np.floor(screen_x[group] - size / 2).astype(np.int32).tolist()
+            top = np.floor(screen_y[group] - size / 2).astype(np.int32).tolist()
+            blits.extend(zip([sprite] * len(group), zip(left, top)))
+
+        self.blitted = len(blits)
+        if blits:
+            if hasattr(screen, 'fblits'):
+                screen.fblits(blits)
+            else:
+                screen.blits(blits, doreturn=False)
+
+        self.plotted = 0
+        for variant, group in plots:
+            self.plot(screen, screen_x[group], screen_y[group], SHADES[variant])
+
+    def plot(self, screen, xs, ys, color):
+        # Sets one pixel per rock straight in the screen's pixel array
+        width, height = screen.get_size()
+        # Off-screen rocks are dropped first, while still floats, so nothing
+        # overflows the cast and neither the pixel array nor set_at sees them.
+        # Flooring (not truncating) keeps rocks just left of or above the
+        # screen from landing on its first column or row.
+        inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+        xs = np.floor(xs[inside]).astype(np.int32)
+        ys = np.floor(ys[inside]).astype(np.int32)
+        if screen.get_bytesize() in (1, 2, 4):
+            pixels = pygame.surfarray.pixels2d(screen)
+            pixels[xs, ys] = screen.map_rgb(color)
+            del pixels  # unlocks the screen
+        else:
+            for point in zip(xs.tolist(), ys.tolist()):
+                screen.set_at(point, color)
+        self.plotted += len(xs)
@@ -0,0 +1,203 @@
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+
+import headless  # sets up the dummy SDL drivers before pygame starts
+import pygame
+from scenes import STAGES
+
+RESOLUTIONS = [(1280, 720), (1920, 1080), (3840, 2160)]
+
+
+# Scripted input. Each entry is (first frame, repeat every n frames or 0 for once,
+# events), where events(size, n) builds the events for the n-th time the entry fires.
+def press(key):
+    def events(size, n):
+        return [pygame.event.Event(pygame.KEYDOWN, key=key, mod=0, unicode='', scancode=0),
+                pygame.event.Event(pygame.KEYUP, key=key, mod=0, unicode='', scancode=0)]
+    return events
+
+
+def hold(key, down):
+    def events(size, n):
+        kind = pygame.KEYDOWN if down else pygame.KEYUP
+        return [pygame.event.Event(kind, key=key, mod=0, unicode='', scancode=0)]
+    return events
+
+
+def mouse(kind, points, button=1):
+    # points(size, n) -> position in pixels
+    def events(size, n):
+        pos = points(size, n)
+        if kind == pygame.MOUSEMOTION:
+            return [pygame.event.Event(kind, pos=pos, rel=(0, 0), buttons=(1, 0, 0))]
+        return [pygame.event.Event(kind, pos=pos, button=button)]
+    return events
+
+
+def at(x, y):
+    # Fractions of the screen
+    return lambda size, n: (int(x * size[0]), int(y * size[1]))
+
+
+def venus_card(size, n):
+    # Cycles through the 4x3 card grid
+    col, row = n % 4, (n // 4) % 3
+    return int(size[0] * (0.365 + 0.09 * col)), int(size[1] * (0.35 + 0.15 * row))
+
+
+def saturn_piece(offset):
+    # Cycles through the 3x3 puzzle grid, which is sized by the screen height
+    def points(size, n):
+        cell = (n + offset) % 9
+        piece = size[1] * 0.125
+        return (int(size[0] / 2 + (cell % 3 - 1) * piece),
+                int(size[1] / 2 + size[1] * 0.0625 + (cell // 3 - 1) * piece))
+    return points
+
+
+def uranus_target(size, n):
+    return int(size[0] * (0.2 + 0.15 * (n % 5))), int(size[1] * (0.2 + 0.2 * (n % 3)))
+
+
+INTRO = [(2, 0, press(pygame.K_RETURN)), (4, 0, press(pygame.K_RETURN))]
+
+SCRIPTS = {
+    'prologue': [(10, 20, press(pygame.K_RETURN))],
+    'epilogue': [(10, 20, press(pygame.K_RETURN))],
+    'earth': INTRO + [(10, 18, press(pygame.K_SPACE))],
+    'mars': INTRO + [(10, 45, press(pygame.K_SPACE))],
+    'venus': INTRO + [(10, 15, mouse(pygame.MOUSEBUTTONDOWN, venus_card))],
+    'jupiter': INTRO + [
+        (10, 30, mouse(pygame.MOUSEBUTTONDOWN, at(0.08, 0.875))),
+        (15, 30, mouse(pygame.MOUSEMOTION, at(0.15, 0.7))),
+        (20, 30, mouse(pygame.MOUSEMOTION, at(0.25, 0.5))),
+        (25, 30, mouse(pygame.MOUSEBUTTONUP, at(0.25, 0.5))),
+    ],
+    'saturn': INTRO + [
+        (10, 20, mouse(pygame.MOUSEBUTTONDOWN, saturn_piece(0))),
+        (12, 20, mouse(pygame.MOUSEBUTTONUP, saturn_piece(4))),
+    ],
+    'uranus': INTRO + [(10, 25, mouse(pygame.MOUSEBUTTONDOWN, uranus_target))],
+    'neptune': [(10, 20, press(pygame.K_RETURN))],
+    'mercury': INTRO + [(10, 30, press(pygame.K_UP)), (25, 30, press(pygame.K_DOWN))],
+    'sun': [
+        (2, 0, press(pygame.K_SPACE)), (4, 0, press(pygame.K_SPACE)),
+        (10, 12, press(pygame.K_SPACE)),
+        (10, 80, hold(pygame.K_LEFT, True)), (40, 80, hold(pygame.K_LEFT, False)),
+        (50, 80, hold(pygame.K_RIGHT, True)), (80, 80, hold(pygame.K_RIGHT, False)),
+    ],
+    'solarsystem': [
+        (10, 40, mouse(pygame.MOUSEBUTTONDOWN, at(0.5, 0.5), button=4)),
+        (30, 40, mouse(pygame.MOUSEBUTTONDOWN, at(0.5, 0.5), button=5)),
+    ],
+}
+
+
+def player(name, size):
+    # Posts the scripted events due after each frame, so the next frame sees them
+    entries = SCRIPTS.get(name, [])
+
+    def on_frame(frame):
+        for first, every, events in entries:
+            if frame == first:
+                n = 0
+            elif every and frame > first and (frame - first) % every == 0:
+                n = (frame - first) // every
+            else:
+                continue
+            for event in events(size, n):
+                pygame.event.post(event)
+    return on_frame
+
+
+def percentiles(values):
+    # Nearest-rank percentiles, in milliseconds
+    if not values:
+        return {'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'mean': 0.0, 'max': 0.0}
+    ordered = sorted(values)
+
+    def rank(p):
+        index = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered))) - 1))
+        return ordered[index] * 1000
+
+    return {
+        'p50': rank(50),
+        'p95': rank(95),
+        'p99': rank(99),
+        'mean': sum(ordered) / len(ordered) * 1000,
+        'max': ordered[-1] * 1000,
+    }
+
+
+def build_id():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench(scenes, resolutions, frames, seed):
+    results = []
+    for size in resolutions:
+        for name in scenes:
+            stats = headless.simulate(name, frames, seed, size, script=player(name, size), profile=True)
+            samples = stats['samples']
+            entry = {
+                'scene': name,
+                'size': list(size),
+                'frames': stats['frames'],
+                'fps': stats['fps'],
+                'events_ms': percentiles([events for events, update, draw, present in samples]),
+                'update_ms': percentiles([update for events, update, draw, present in samples]),
+                'draw_ms': percentiles([draw for events, update, draw, present in samples]),
+                'present_ms': percentiles([present for events, update, draw, present in samples]),
+                'frame_ms': percentiles([sum(sample) for sample in samples]),
+            }
+            results.append(entry)
+            print(f"{name} {size[0]}x{size[1]}: frame p50 {entry['frame_ms']['p50']:.2f} ms, "
+                  f"p99 {entry['frame_ms']['p99']:.2f} ms "
+                  f"(update {entry['update_ms']['p50']:.2f}, draw {entry['draw_ms']['p50']:.2f}, "
+                  f"present {entry['present_ms']['p50']:.2f})")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage frame time benchmark")
+    parser.add_argument('scenes', nargs='*', help="scene names (default: every stage)")
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--size', type=headless.parse_size, action='append',
+                        help="resolution to run at, may be repeated (default: 720p, 1080p and 4K)")
+    parser.add_argument('--output', default='bench_results.json')
+    args = parser.parse_args()
+
+    scenes = args.scenes or list(STAGES)
+    resolutions = args.size or RESOLUTIONS
+    results = bench(scenes, resolutions, args.frames, args.seed)
+
+    report = {
+        'build': build_id(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'sdl': '.'.join(str(part) for part in pygame.get_sdl_version()),
+        'platform': platform.platform(),
+        'frames': args.frames,
+        'seed': args.seed,
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+    pygame.quit()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
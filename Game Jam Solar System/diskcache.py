@@ -0,0 +1,90 @@
+import os
+import sys
+import struct
+import hashlib
+import pygame
+from assetpack import pack
+
+# Pre-scaled, display-format pixel buffers of the stage backgrounds, so later
+# launches skip the decode and the full-screen scale
+CACHE_DIR = os.path.join('.cache', 'backgrounds')
+
+# Header: magic, source mtime (ns), source size, source hash (only filled in hash mode,
+# or when the source comes from the asset pack, whose index already has it)
+HEADER = struct.Struct('<4sqq20s')
+MAGIC = b'SRBG'
+
+
+def buffer_format(surface):
+    # Byte order of the display's 32-bit pixels, as understood by frombuffer/tobytes
+    red_mask = surface.get_masks()[0]
+    if sys.byteorder == 'little':
+        return 'BGRA' if red_mask == 0x00ff0000 else 'RGBA'
+    return 'ARGB' if red_mask == 0x00ff0000 else 'RGBA'
+
+
+class BackgroundCache:
+    def __init__(self, directory=CACHE_DIR, validate='mtime'):
+        self.directory = directory
+        self.validate = validate  # 'mtime' or 'hash'
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def entry_path(self, path, size, fmt):
+        key = f"{os.path.normpath(path)}|{size[0]}x{size[1]}|{fmt}"
+        name = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, name + '.raw')
+
+    def source_stamp(self, path):
+        entry = pack.entry(path)
+        if entry is not None:
+            return 0, entry.size, entry.digest
+        stat = os.stat(path)
+        digest = b''
+        if self.validate == 'hash':
+            with open(path, 'rb') as f:
+                digest = hashlib.sha1(f.read()).digest()
+        return stat.st_mtime_ns, stat.st_size, digest.ljust(20, b'\0')
+
+    def load(self, path, size, display):
+        fmt = buffer_format(display)
+        try:
+            with open(self.entry_path(path, size, fmt), 'rb') as f:
+                data = f.read()
+            stamp = self.source_stamp(path)
+        except OSError:
+            self.misses += 1
+            return None
+
+        expected = size[0] * size[1] * 4
+        if len(data) != HEADER.size + expected:
+            self.misses += 1
+            return None
+        magic, mtime, source_size, digest = HEADER.unpack_from(data)
+        if magic != MAGIC or (mtime, source_size, digest) != stamp:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        pixels = memoryview(data)[HEADER.size:]
+        return pygame.image.frombuffer(pixels, size, fmt).convert()
+
+    def store(self, path, surface, display):
+        fmt = buffer_format(display)
+        target = self.entry_path(path, surface.get_size(), fmt)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            header = HEADER.pack(MAGIC, *self.source_stamp(path))
+            # Write to a temporary file first so a crash never leaves a torn entry
+            temp = target + '.tmp'
+            with open(temp, 'wb') as f:
+                f.write(header)
+                f.write(pygame.image.tobytes(surface, fmt))
+            os.replace(temp, target)
+            self.writes += 1
+        except OSError:
+            pass
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'writes': self.writes}
@@ -0,0 +1,48 @@
+import numpy as np
+
+# Newton steps for Kepler's equation, plenty for the eccentricities of planets and most comets
+KEPLER_ITERATIONS = 6
+
+
+class Ephemeris:
+    def __init__(self):
+        # Bodies orbiting the origin, one element per body in each array, so all
+        # of their positions are worked out in one go however many there are
+        self.names = []
+        self.index = {}  # name -> element
+        self.axis = np.zeros(0)  # semi-major axis
+        self.eccentricity = np.zeros(0)
+        self.phase = np.zeros(0)  # mean anomaly at tick 0, in radians
+        self.rate = np.zeros(0)  # radians per tick
+        self.radius = np.zeros(0)  # size of the body itself
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name, axis, radius, rate, eccentricity=0.0, phase=0.0):
+        self.extend([name], [axis], [radius], [rate], [eccentricity], [phase])
+
+    def extend(self, names, axis, radius, rate, eccentricity=0.0, phase=0.0):
+        # Adds many bodies at once; scalars apply to all of them
+        count = len(names)
+        for name in names:
+            self.index[name] = len(self.names)
+            self.names.append(name)
+        self.axis = np.concatenate((self.axis, np.broadcast_to(np.asarray(axis, float), count)))
+        self.radius = np.concatenate((self.radius, np.broadcast_to(np.asarray(radius, float), count)))
+        self.rate = np.concatenate((self.rate, np.broadcast_to(np.asarray(rate, float), count)))
+        self.eccentricity = np.concatenate((self.eccentricity, np.broadcast_to(np.asarray(eccentricity, float), count)))
+        self.phase = np.concatenate((self.phase, np.broadcast_to(np.asarray(phase, float), count)))
+
+    def positions(self, tick):
+        # Where every body is at a tick, as a (2, bodies) array of x and y
+        mean = self.phase + self.rate * tick
+        if not self.eccentricity.any():
+            return np.stack((self.axis * np.cos(mean), self.axis * np.sin(mean)))
+
+        # Solve Kepler's equation, mean = anomaly - e * sin(anomaly), for the eccentric anomaly
+        e = self.eccentricity
+        anomaly = mean.copy()
+        for _ in range(KEPLER_ITERATIONS):
+            anomaly -= (anomaly - e * np.sin(anomaly) - mean) / (1 - e * np.cos(anomaly))
+        return np.stack((self.axis * (np.cos(anomaly) - e), self.axis * np.sqrt(1 - e * e) * np.sin(anomaly)))
@@ -1,69 +1,24 @@
 import pygame
-from pygame import mixer
-import ctypes
-
-
-class TextBox:
-    def __init__(self, x, y, width, height, font_size):
-        self.rect = pygame.Rect(x, y, width, height)
-        self.text = ""
-        self.rendered_text = []
-        self.text_content = []
-        self.reveal_index = 0
-        self.line_spacing = 5
-        self.font = pygame.font.Font(None, font_size)
-
-    def set_text(self, text):
-        self.text = text
-        self.rendered_text = []
-        self.text_content = []
-        wrapped_text = self.wrap_text(text, self.rect.width - 20)
-        for line in wrapped_text:
-            self.rendered_text.append(self.font.render(line, True, (255, 255, 255)))
-            self.text_content.append(line)
-        self.reveal_index = 0
-
-    def wrap_text(self, text, max_width):
-        words = text.split(' ')
-        wrapped_lines = []
-        current_line = ""
-        for word in words:
-            test_line = current_line + word + " "
-            if self.font.size(test_line)[0] <= max_width:
-                current_line = test_line
-            else:
-                wrapped_lines.append(current_line.strip())
-                current_line = word + " "
-        wrapped_lines.append(current_line.strip())
-        return wrapped_lines
-
-    def update(self):
-        self.reveal_index += 1
-
-    def draw(self, surface):
-        pygame.draw.rect(surface, (0, 0, 0), self.rect)
-        pygame.draw.rect(surface, (255, 255, 255), self.rect, 3)
-
-        y = self.rect.top + 10
-        for i, (line, content) in enumerate(zip(self.rendered_text, self.text_content)):
-            x = self.rect.left + 10
-            if i * len(content) < self.reveal_index:
-                surface.blit(line, (x, y))
-                y += line.get_height() + self.line_spacing
+from assets import assets
+from textcache import texts
+from textbox import TextBox
+from music import music
+from scenes import SceneManager
+from runtime import runtime
+from replay import inputs
+from render import Renderer
 
-    def is_finished(self):
-        return self.reveal_index >= sum(len(line) for line in self.text_content)
+# Decoded ahead of time while the stage is highlighted in the level menu
+PRELOAD_IMAGES = ['src/epilogue.png']
+PRELOAD_SOUNDS = []
+MUSIC = 'src/epilogue.mp3'
 
 
 class Epilogue:
-    def __init__(self):
-        pygame.init()
-
-        # Get the screen size
-        user32 = ctypes.windll.user32
-        self.WIDTH = user32.GetSystemMetrics(0)
-        self.HEIGHT = user32.GetSystemMetrics(1)
-        self.screen = pygame.display.set_mode((self.WIDTH, self.HEIGHT))
+    def __init__(self, screen):
+        # Shared display surface
+        self.screen = screen
+        self.WIDTH, self.HEIGHT = screen.get_size()
         pygame.display.set_caption("Epilogue")
 
         self.WHITE = (255, 255, 255)
@@ -79,11 +34,10 @@ class Epilogue:
         self.text_box = TextBox(text_box_x, text_box_y, text_box_width, text_box_height, font_size)
 
         # Load background image
-        self.background = pygame.image.load("src/epilogue.png")
-        self.background = pygame.transform.scale(self.background, (self.WIDTH, self.HEIGHT))
+        self.background = assets.background("src/epilogue.png", (self.WIDTH, self.HEIGHT))
+        self.renderer = Renderer(self.screen, self.background)
 
-        mixer.music.load('src/epilogue.mp3')
-        mixer.music.play(-1)
+        music.play(MUSIC)
 
         # Set the full story text
         self.full_story = [
@@ -127,27 +81,26 @@ class Epilogue:
         menu_x = self.WIDTH // 2
         menu_y = self.HEIGHT // 2
         font_size = int(self.HEIGHT * 0.04)  # Adjust font size for end options
-        font = pygame.font.Font(None, font_size)
+        font = texts.font(None, font_size)
         for i, option in enumerate(self.end_options):
             color = self.WHITE
-            rendered_option = font.render(option, True, color)
+            rendered_option = texts.render(font, option, True, color)
             option_rect = rendered_option.get_rect(center=(menu_x, menu_y + i * (font_size + 10)))
             self.screen.blit(rendered_option, option_rect)
 
     def run(self):
-        clock = pygame.time.Clock()
         running = True
 
         while running:
-            for event in pygame.event.get():
+            for event in inputs.events():
+                self.renderer.handle_event(event)
                 if event.type == pygame.QUIT:
                     running = False
                 elif event.type == pygame.KEYDOWN:
                     if self.show_end_options:
                         if event.key == pygame.K_r:
                             # Reread the story
-                            mixer.music.load('src/epilogue.mp3')
-                            mixer.music.play(-1)
+                            music.play(MUSIC, restart=True)
                             self.current_part = 0
                             self.text_box.set_text(self.full_story[self.current_part])
                             self.show_end_options = False
@@ -165,20 +118,27 @@ class Epilogue:
                                 else:
                                     self.show_end_options = True
 
-            self.screen.blit(self.background, (0, 0))
+            full = self.renderer.begin()
 
             if self.show_end_options:
-                self.draw_end_options()
+                idle = True
+                if full:
+                    self.draw_end_options()
             else:
+                # Between key presses only the text box changes, and only while revealing
+                revealing = not self.text_box.is_finished()
+                idle = not revealing
                 self.text_box.update()
-                self.text_box.draw(self.screen)
+                if full or revealing:
+                    self.text_box.draw(self.screen)
+                    self.renderer.mark(self.text_box.rect)
 
-            pygame.display.flip()
-            clock.tick(60)
+            self.renderer.present()
+            # Once the text is out, sleep until the next key press
+            runtime.tick(60, idle=idle)
 
-        pygame.quit()
+        return "quit"
 
 
 if __name__ == "__main__":
-    game = Epilogue()
-    game.run()
+    SceneManager().run("epilogue")
@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+import argparse
+
+# SDL reads these when pygame starts the display and the mixer, so they have to
+# be set before any stage module gets the chance to
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+from runtime import runtime, SimulationDone
+from scenes import STAGES, SceneManager, parse_size
+
+
+def simulate(name, frames, seed=0, size=(1280, 720), script=None, profile=False):
+    # Runs a scene for a number of frames with no display, no frame cap, a seeded
+    # RNG and a virtual clock, as fast as the machine allows. script, if given, is
+    # called after every frame with the frame number (see bench.py).
+    runtime.configure(seed=seed, headless=True, size=size, frame_cap=False, max_frames=frames)
+    runtime.on_frame = script
+    runtime.profiling = profile
+    manager = SceneManager()
+
+    start = time.perf_counter()
+    result = None
+    try:
+        result = manager.push(name)
+    except SimulationDone:
+        pass
+    finally:
+        runtime.on_frame = None
+        runtime.profiling = False
+    elapsed = time.perf_counter() - start
+    # Only count the frames, not building the scene
+    elapsed -= sum(seconds for kind, scene, seconds in manager.transitions)
+
+    return {
+        'scene': name,
+        'seed': seed,
+        'size': size,
+        'frames': runtime.frames,
+        'seconds': elapsed,
+        'fps': runtime.frames / elapsed if elapsed > 0 else 0.0,
+        'result': result,
+        'samples': runtime.samples,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run stages headless and report simulated frames per second")
+    parser.add_argument('scenes', nargs='*', help="scene names (default: every stage)")
+    parser.add_argument('--frames', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--size', type=parse_size, default=(1280, 720), help="virtual screen size, e.g. 1920x1080")
+    args = parser.parse_args()
+
+    for name in args.scenes or list(STAGES):
+        stats = simulate(name, args.frames, args.seed, args.size)
+        print(f"{name}: {stats['frames']} frames in {stats['seconds']:.2f} s, "
+              f"{stats['fps']:.0f} simulated frames/s")
+
+    pygame.quit()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+import time
+from runtime import runtime
+
+
+class FixedStep:
+    def __init__(self, tick_rate=60, max_ticks=5, clock=None):
+        # The simulation advances in ticks of exactly 1 / tick_rate seconds,
+        # however often frames are drawn
+        self.tick_rate = tick_rate
+        self.dt = 1.0 / tick_rate
+        # Wall clock normally, the runtime's virtual clock when running headless
+        self.clock = clock or runtime.now
+
+        # Spiral-of-death cap: when a frame took so long that more than max_ticks
+        # are due, the rest are dropped and the game slows down instead of
+        # spending ever longer catching up
+        self.max_ticks = max_ticks
+
+        # > 1 runs the simulation faster than real time
+        self.speed = 1.0
+
+        self.accumulator = 0.0
+        self.last_time = None
+        self.alpha = 0.0  # how far between the last two ticks the next frame is drawn
+
+        # Counters
+        self.ticks = 0
+        self.dropped_ticks = 0
+
+    def advance(self):
+        # Returns how many ticks are due since the previous frame
+        now = self.clock()
+        if self.last_time is None:
+            self.last_time = now
+        self.accumulator += (now - self.last_time) * self.speed
+        self.last_time = now
+
+        due = int(self.accumulator / self.dt)
+        if due > self.max_ticks:
+            self.dropped_ticks += due - self.max_ticks
+            self.accumulator -= (due - self.max_ticks) * self.dt
+            due = self.max_ticks
+        self.accumulator -= due * self.dt
+        self.alpha = self.accumulator / self.dt
+        return due
+
+    def step(self, update):
+        # Runs update() once per due tick and returns how many ran
+        due = self.advance()
+        start = time.perf_counter()
+        for _ in range(due):
+            update()
+            self.ticks += 1
+        runtime.update_time += time.perf_counter() - start
+        return due
+
+    def hold(self):
+        # While paused or in a menu: let the time pass without simulating it
+        self.last_time = self.clock()
+        self.alpha = self.accumulator / self.dt
+
+    def ticks_in(self, seconds):
+        # Converts a delay into a number of ticks, for scheduling in simulation time
+        return max(1, round(seconds * self.tick_rate))
+
+    def lerp(self, previous, current):
+        # Position to draw at, between the state of the last two ticks
+        return previous + (current - previous) * self.alpha
@@ -1,202 +1,183 @@
 import sys
-from pygame import mixer
-import pygame
-
-pygame.init()
+from startup import startup
 
-info = pygame.display.Info()
-screen_width = info.current_w
-screen_height = info.current_h
+# Has to start before the imports below for them to be timed
+if __name__ == "__main__" and "--startup-profile" in sys.argv:
+    startup.begin()
 
-screen = pygame.display.set_mode((screen_width, screen_height))
-pygame.display.set_caption("Main Menu")
+import pygame
+from assets import assets
+from textcache import texts
+from music import music
+from prefetch import StagePrefetcher
+from render import Renderer
+from replay import inputs
+from runtime import runtime
+from scenes import STAGES, SceneManager, get_screen
 
 BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
 GRAY = (169, 169, 169)
 
-pygame.font.init()
-TITLE_FONT = pygame.font.Font(None, 74)
-MENU_FONT = pygame.font.Font(None, 50)
-
-background = pygame.image.load("src/background.png")
-background = pygame.transform.scale(background, (screen_width, screen_height))
-
-# Load and play background music
-mixer.music.load('src/main.mp3')
-mixer.music.play(-1)
+MUSIC = 'src/main.mp3'
 
 main_menu_options = ["Start Game", "Space Navigation", "Quit"]
 level_options = ["Stage 0 Prologue", "Stage 1 Earth", "Stage 2 Mars", "Stage 3 Venus", "Stage 4 Jupiter", "Stage 5 Saturn",
                  "Stage 6 Uranus", "Stage 7 Neptune", "Stage 8 Mercury", "Stage 9 Sun", "Stage Final Epilogue"]
-selected_option = 0
-
-def draw_main_menu():
-    screen.blit(background, (0, 0))
-
-    title_surface = TITLE_FONT.render("SPACE RANGERS", True, WHITE)
-    title_rect = title_surface.get_rect(center=(screen_width / 2, screen_height / 4))
-    screen.blit(title_surface, title_rect)
-
-    for i, option in enumerate(main_menu_options):
-        color = WHITE if i == selected_option else GRAY
-        text_surface = MENU_FONT.render(option, True, color)
-        text_rect = text_surface.get_rect(center=(screen_width / 2, screen_height / 2 + i * 75))
-        screen.blit(text_surface, text_rect)
-
-    pygame.display.flip()
-
-def draw_level_selection_menu():
-    screen.blit(background, (0, 0))
 
-    title_surface = TITLE_FONT.render("Level Selection", True, WHITE)
-    title_rect = title_surface.get_rect(center=(screen_width / 2, screen_height / 4))
-    screen.blit(title_surface, title_rect)
-
-    levels_left = level_options[:5]
-    levels_right = level_options[5:10]
-    level_bottom = [level_options[10]]
-
-    vertical_position = screen_height / 2 - 75
-
-    for i, option in enumerate(levels_left):
-        color = WHITE if i == selected_option and selected_option < 5 else GRAY
-        text_surface = MENU_FONT.render(option, True, color)
-        text_rect = text_surface.get_rect(center=(screen_width / 3, vertical_position + i * 60))
-        screen.blit(text_surface, text_rect)
+# Scene of each level, in the same order as level_options
+level_scenes = ["prologue", "earth", "mars", "venus", "jupiter", "saturn", "uranus", "neptune", "mercury", "sun",
+                "epilogue"]
+
+
+class MainMenu:
+    def __init__(self, screen):
+        # Nothing here runs at import time; the window, fonts, background and
+        # music are set up when the menu is created (see main_screen below)
+        self.screen = screen
+        self.screen_width, self.screen_height = screen.get_size()
+        pygame.display.set_caption("Main Menu")
+
+        # Font sizes and spacing were chosen on a 1080-line screen
+        self.scale = self.screen_height / 1080
+        self.title_font = texts.font(None, int(74 * self.scale))
+        self.menu_font = texts.font(None, int(50 * self.scale))
+
+        background = assets.background("src/background.png", (self.screen_width, self.screen_height))
+        # The menus only change on key presses, so with dirty rectangles on they are not redrawn in between
+        self.renderer = Renderer(screen, background)
+        self.selected_option = 0
+
+        # Warms up the highlighted level in the background while the menu is idle
+        self.prefetcher = StagePrefetcher(max_warm=2)
+        self.scene_manager = SceneManager(screen, loader=self.prefetcher)
+        startup.mark("menu ready")
+
+    def draw_main_menu(self):
+        title_surface = texts.render(self.title_font, "SPACE RANGERS", True, WHITE)
+        title_rect = title_surface.get_rect(center=(self.screen_width / 2, self.screen_height / 4))
+        self.screen.blit(title_surface, title_rect)
+
+        for i, option in enumerate(main_menu_options):
+            color = WHITE if i == self.selected_option else GRAY
+            text_surface = texts.render(self.menu_font, option, True, color)
+            text_rect = text_surface.get_rect(center=(self.screen_width / 2, self.screen_height / 2 + i * 75 * self.scale))
+            self.screen.blit(text_surface, text_rect)
+
+    def draw_level_selection_menu(self):
+        title_surface = texts.render(self.title_font, "Level Selection", True, WHITE)
+        title_rect = title_surface.get_rect(center=(self.screen_width / 2, self.screen_height / 4))
+        self.screen.blit(title_surface, title_rect)
+
+        levels_left = level_options[:5]
+        levels_right = level_options[5:10]
+        level_bottom = [level_options[10]]
+
+        vertical_position = self.screen_height / 2 - 75 * self.scale
+
+        for i, option in enumerate(levels_left):
+            color = WHITE if i == self.selected_option and self.selected_option < 5 else GRAY
+            text_surface = texts.render(self.menu_font, option, True, color)
+            text_rect = text_surface.get_rect(center=(self.screen_width / 3, vertical_position + i * 60 * self.scale))
+            self.screen.blit(text_surface, text_rect)
+
+        for i, option in enumerate(levels_right):
+            color = WHITE if i + 5 == self.selected_option else GRAY
+            text_surface = texts.render(self.menu_font, option, True, color)
+            text_rect = text_surface.get_rect(center=(2 * self.screen_width / 3, vertical_position + i * 60 * self.scale))
+            self.screen.blit(text_surface, text_rect)
+
+        for i, option in enumerate(level_bottom):
+            color = WHITE if i + 10 == self.selected_option else GRAY
+            text_surface = texts.render(self.menu_font, option, True, color)
+            text_rect = text_surface.get_rect(center=(self.screen_width / 2, self.screen_height - 150 * self.scale))
+            self.screen.blit(text_surface, text_rect)
+
+    def main(self):
+        current_screen = "main_menu"
+        music_playing = False
+
+        running = True
+        while running:
+            if current_screen == "main_menu" and not music_playing:
+                pygame.display.set_caption("Main Menu")
+                # Crossfades back from the stage's track; main.mp3 stays decoded
+                music.play(MUSIC)
+                music_playing = True
+
+            for event in inputs.events():
+                self.renderer.handle_event(event)
+                if event.type == pygame.QUIT:
+                    pygame.quit()
+                    sys.exit()
+                elif event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_DOWN:
+                        if current_screen == "main_menu":
+                            self.selected_option = (self.selected_option + 1) % len(main_menu_options)
+                        elif current_screen == "level_selection":
+                            self.selected_option = (self.selected_option + 1) % len(level_options)
+                    elif event.key == pygame.K_UP:
+                        if current_screen == "main_menu":
+                            self.selected_option = (self.selected_option - 1) % len(main_menu_options)
+                        elif current_screen == "level_selection":
+                            self.selected_option = (self.selected_option - 1) % len(level_options)
+                    elif event.key == pygame.K_RETURN:
+                        if current_screen == "main_menu":
+                            if self.selected_option == 0:
+                                current_screen = "level_selection"
+                                self.selected_option = 0
+                            elif self.selected_option == 1:
+                                print("SPACE NAVIGATION")
+                                music_playing = False
+                                pygame.time.wait(100)
+                                result = self.scene_manager.push("solarsystem")
+                                if result == "quit":
+                                    pygame.quit()
+                                    sys.exit()
+                                current_screen = "main_menu"
+                                self.selected_option = 0
+                            elif self.selected_option == 2:
+                                pygame.quit()
+                                sys.exit()
+                        elif current_screen == "level_selection":
+                            music_playing = False
+                            print(f"{level_options[self.selected_option]} selected")
+                            result = self.scene_manager.push(level_scenes[self.selected_option])
+
+                            if result == "quit":
+                                pygame.quit()
+                                sys.exit()
+                            elif result == "main_menu":
+                                current_screen = "main_menu"
+                                self.selected_option = 0
+                    elif event.key == pygame.K_BACKSPACE:
+                        if current_screen == "level_selection":
+                            current_screen = "main_menu"
+                            self.selected_option = 0
 
-    for i, option in enumerate(levels_right):
-        color = WHITE if i + 5 == selected_option else GRAY
-        text_surface = MENU_FONT.render(option, True, color)
-        text_rect = text_surface.get_rect(center=(2 * screen_width / 3, vertical_position + i * 60))
-        screen.blit(text_surface, text_rect)
+            full = self.renderer.begin()
+            if current_screen == "main_menu":
+                if full:
+                    self.draw_main_menu()
+            elif current_screen == "level_selection":
+                self.prefetcher.request(STAGES[level_scenes[self.selected_option]][0])
+                if full:
+                    self.draw_level_selection_menu()
+            self.renderer.present()
+            startup.first_frame()
+            # The menus only change on input, so the loop sleeps until there is some
+            runtime.tick(30, idle=True)
 
-    for i, option in enumerate(level_bottom):
-        color = WHITE if i + 10 == selected_option else GRAY
-        text_surface = MENU_FONT.render(option, True, color)
-        text_rect = text_surface.get_rect(center=(screen_width / 2, screen_height - 150))
-        screen.blit(text_surface, text_rect)
+        music.stop(fade_ms=0)
 
-    pygame.display.flip()
 
 def main_screen():
-    global selected_option
-    current_screen = "main_menu"
-    music_playing = False
-
-    running = True
-    while running:
-        if current_screen == "main_menu" and not music_playing:
-            mixer.music.load('src/main.mp3')
-            mixer.music.play(-1)
-            music_playing = True
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_DOWN:
-                    if current_screen == "main_menu":
-                        selected_option = (selected_option + 1) % len(main_menu_options)
-                    elif current_screen == "level_selection":
-                        selected_option = (selected_option + 1) % len(level_options)
-                elif event.key == pygame.K_UP:
-                    if current_screen == "main_menu":
-                        selected_option = (selected_option - 1) % len(main_menu_options)
-                    elif current_screen == "level_selection":
-                        selected_option = (selected_option - 1) % len(level_options)
-                elif event.key == pygame.K_RETURN:
-                    if current_screen == "main_menu":
-                        if selected_option == 0:
-                            current_screen = "level_selection"
-                            selected_option = 0
-                        elif selected_option == 1:
-                            print("SPACE NAVIGATION")
-                            mixer.music.stop()
-                            music_playing = False
-                            pygame.time.wait(100)
-                            from solarsystem import SolarSystem
-                            game = SolarSystem()
-                            game.main()
-                            current_screen = "main_menu"
-                            selected_option = 0
-                        elif selected_option == 2:
-                            pygame.quit()
-                            sys.exit()
-                    elif current_screen == "level_selection":
-                        mixer.music.stop()
-                        music_playing = False
-                        if selected_option == 0:
-                            print("Prologue selected")
-                            from prologue import Prologue
-                            game = Prologue()
-                            result = game.run()
-                        elif selected_option == 1:
-                            print("Level 1 selected")
-                            from Earth import Earth
-                            game = Earth()
-                            result = game.main()
-                        elif selected_option == 2:
-                            print("Level 2 selected")
-                            from Mars import Mars
-                            game = Mars()
-                            result = game.main()
-                        elif selected_option == 3:
-                            print("Level 3 selected")
-                            from Venus import Venus
-                            game = Venus()
-                            result = game.main()
-                        elif selected_option == 4:
-                            print("Level 4 selected")
-                            from Jupiter import Jupiter
-                            game = Jupiter()
-                            result = game.main()
-                        elif selected_option == 5:
-                            print("Level 5 selected")
-                            from Saturn import Saturn
-                            game = Saturn()
-                            result = game.run()
-                        elif selected_option == 6:
-                            print("Level 6 selected")
-                            from Uranus import Uranus
-                            game = Uranus()
-                            result = game.main()
-                        elif selected_option == 7:
-                            print("Level 7 selected")
-                            from Neptune import Neptune
-                            game = Neptune()
-                            result = game.main()
-                        elif selected_option == 8:
-                            print("Level 8 selected")
-                            from Mercury import Mercury
-                            game = Mercury()
-                            result = game.main()
-                        elif selected_option == 9:
-                            print("Level 9 selected")
-                            from Sun import Sun
-                            game = Sun()
-                            result = game.main()
-                        elif selected_option == 10:
-                            print("Final selected")
-                            from final import Epilogue
-                            game = Epilogue()
-                            result = game.run()
-
-                        if result == "main_menu":
-                            current_screen = "main_menu"
-                            selected_option = 0
-                elif event.key == pygame.K_BACKSPACE:
-                    if current_screen == "level_selection":
-                        current_screen = "main_menu"
-                        selected_option = 0
-
-        if current_screen == "main_menu":
-            draw_main_menu()
-        elif current_screen == "level_selection":
-            draw_level_selection_menu()
-
-    mixer.music.stop()
+    # Entry point of the game: opens the window and runs the menus
+    startup.mark("imports done")
+    screen = get_screen()
+    startup.mark("display created")
+    MainMenu(screen).main()
+
 
 if __name__ == "__main__":
     main_screen()
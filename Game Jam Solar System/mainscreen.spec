@@ -5,8 +5,11 @@ a = Analysis(
     ['mainscreen.py'],
     pathex=[],
     binaries=[],
-    datas=[],
-    hiddenimports=[],
+    # Every image and sound, packed by "python assetpack.py build" beforehand
+    datas=[('assets.pack', '.')],
+    # Stages are imported by name when they are entered (see scenes.STAGES)
+    hiddenimports=['prologue', 'Earth', 'Mars', 'Venus', 'Jupiter', 'Saturn', 'Uranus', 'Neptune', 'Mercury', 'Sun',
+                   'final', 'solarsystem'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
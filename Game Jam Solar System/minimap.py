@@ -0,0 +1,89 @@
+import pygame
+from runtime import runtime
+
+
+class Minimap:
+    def __init__(self, size, color, icons, rate=10):
+        # A small map kept on its own surface between frames. Icons (name ->
+        # surface, already at minimap size) are moved at most rate times per
+        # second, and only icons that moved are drawn again; every other frame
+        # the map is one blit.
+        self.background = pygame.Surface(size)
+        self.background.fill(color)
+        self.surface = self.background.copy()
+        self.icons = icons
+        self.rotated = {}  # (name, whole degrees) -> surface
+        self.placed = {}  # name -> (surface, rect) as last drawn, in drawing order
+        self.interval = 1.0 / rate
+        self.updated = None  # runtime.now() of the last refresh
+
+        # Counters
+        self.refreshes = 0
+        self.redrawn = 0
+
+    def draw_static(self, name, center):
+        # Draws an icon into the background, for things that never move
+        rect = self.icons[name].get_rect(center=(int(center[0]), int(center[1])))
+        self.background.blit(self.icons[name], rect)
+        self.surface.blit(self.background, rect, rect)
+
+    def due(self):
+        # Whether it is time to move the icons again
+        now = runtime.now()
+        if self.updated is not None and now - self.updated < self.interval:
+            return False
+        self.updated = now
+        return True
+
+    def icon(self, name, angle):
+        if not angle:
+            return self.icons[name]
+        key = (name, round(angle) % 360)
+        surface = self.rotated.get(key)
+        if surface is None:
+            surface = self.rotated[key] = pygame.transform.rotate(self.icons[name], key[1])
+        return surface
+
+    def update(self, positions):
+        # positions: name -> (x, y, angle), centers in minimap pixels and the
+        # rotation in degrees counterclockwise. Call when due().
+        self.refreshes += 1
+
+        erased = []
+        for name in [name for name in self.placed if name not in positions]:
+            erased.append(self.placed.pop(name)[1])
+        for name, (x, y, angle) in positions.items():
+            surface = self.icon(name, angle)
+            rect = surface.get_rect(center=(int(x), int(y)))
+            old = self.placed.get(name)
+            if old is not None and old[0] is surface and old[1] == rect:
+                continue
+            if old is not None:
+                erased.append(old[1])
+            erased.append(rect)
+            self.placed[name] = (surface, rect)
+        if not erased:
+            return
+
+        # Icons overlapping an erased area are erased and drawn again whole, so
+        # translucent edges aren't blended twice
+        names = list(self.placed)
+        rects = [rect for surface, rect in self.placed.values()]
+        redraw = set()
+        # Each icon drawn again is erased too, so it is appended to erased and
+        # the loop goes on to check what that overlaps in turn
+        for dirty in erased:
+            for index in dirty.collidelistall(rects):
+                if names[index] not in redraw:
+                    redraw.add(names[index])
+                    erased.append(rects[index])
+
+        for rect in erased:
+            self.surface.blit(self.background, rect, rect)
+        for name, (surface, rect) in self.placed.items():
+            if name in redraw:
+                self.surface.blit(surface, rect)
+                self.redrawn += 1
+
+    def draw(self, screen, position):
+        return screen.blit(self.surface, position)
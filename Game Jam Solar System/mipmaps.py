@@ -0,0 +1,76 @@
+import pygame
+from collections import OrderedDict
+
+# Sprite rotations are rounded to this many degrees, so a turning ship reuses a
+# handful of rotated images instead of making a new one every frame
+ROTATION_STEP = 2
+
+
+def smoothscale(surface, size):
+    # smoothscale only takes 24 and 32 bit surfaces; anything else (e.g. an
+    # unconverted palette PNG when there is no display) is scaled plainly
+    if surface.get_bitsize() in (24, 32):
+        return pygame.transform.smoothscale(surface, size)
+    return pygame.transform.scale(surface, size)
+
+
+class ZoomCache:
+    def __init__(self, images, step=0.1, max_buckets=4):
+        # Scaled copies of images (name -> full-size surface), one set per zoom
+        # bucket. Zoom moves in steps of step, so each bucket is one zoom level.
+        # Sprites are made the first time they're asked for at that zoom, and
+        # the least recently used buckets are dropped past max_buckets.
+        self.images = images
+        self.step = step
+        self.max_buckets = max_buckets
+        self.buckets = OrderedDict()  # bucket -> {(name, size, angle): surface}
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def bucket(self, zoom):
+        return round(zoom / self.step)
+
+    def sprite(self, name, zoom, size, angle=0):
+        # The image scaled to size (width, height) at this zoom, then rotated by
+        # angle degrees counterclockwise
+        bucket = self.bucket(zoom)
+        sprites = self.buckets.get(bucket)
+        if sprites is None:
+            sprites = self.buckets[bucket] = {}
+            while len(self.buckets) > self.max_buckets:
+                self.buckets.popitem(last=False)
+                self.evictions += 1
+        else:
+            self.buckets.move_to_end(bucket)
+
+        angle = round(angle / ROTATION_STEP) * ROTATION_STEP % 360
+        key = (name, size, angle)
+        surface = sprites.get(key)
+        if surface is not None:
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        if angle:
+            surface = pygame.transform.rotate(self.sprite(name, zoom, size), angle)
+        else:
+            surface = smoothscale(self.images[name], (max(1, size[0]), max(1, size[1])))
+        sprites[key] = surface
+        return surface
+
+    def clear(self):
+        self.buckets.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'buckets': len(self.buckets),
+            'sprites': sum(len(sprites) for sprites in self.buckets.values()),
+        }
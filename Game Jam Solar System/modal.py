@@ -0,0 +1,99 @@
+import pygame
+from runtime import runtime
+
+# Translucent full-screen fills keyed by (size, color), made once and reused by every modal
+dims = {}
+
+
+def dim_surface(size, color):
+    key = (size, color)
+    surface = dims.get(key)
+    if surface is None:
+        surface = pygame.Surface(size, pygame.SRCALPHA)
+        surface.fill(color)
+        dims[key] = surface
+    return surface
+
+
+class Modal:
+    def __init__(self, color=(0, 0, 0, 180)):
+        # Pause, victory and defeat screens. The first frame a modal is shown,
+        # what is on the screen is copied and dimmed with color (None for no
+        # dimming) into a backdrop kept while it is up, and the modal's parts
+        # are drawn over that. Every frame after that is one opaque blit of the
+        # result, until it stops being shown or its key changes.
+        self.color = color
+        self.backdrop = None
+        self.frame = None
+        self.key = None
+        self.rects = {}  # option index -> area it was last drawn in
+        self.shown = None  # runtime frame it was last drawn in
+
+        # Counters
+        self.builds = 0
+        self.option_redraws = 0
+
+    def draw(self, screen, static=None, key=None, option=None, options=0):
+        # Call after drawing what is behind the modal. static(surface) draws
+        # what stays the same while the modal is up; a new key draws it again
+        # over the backdrop (e.g. a victory screen turning into a defeat one).
+        # For menus, option(surface, index, selected) draws one of the options
+        # and returns the area it covered, and key is the selected index: a new
+        # key then only redraws the option losing the highlight and the one
+        # gaining it.
+        if not self.showing() or self.frame is None or self.frame.get_size() != screen.get_size():
+            self.open(screen, static, key, option, options)
+        elif key != self.key:
+            if option is None:
+                self.build(static, key)
+            else:
+                for index in (self.key, key):
+                    self.redraw_option(option, index, key)
+                self.key = key
+        self.shown = runtime.frames
+        return screen.blit(self.frame, (0, 0))
+
+    def showing(self):
+        # Whether it was up last frame, in which case draw() covers the whole
+        # screen with its cached frame and what is behind it needn't be drawn
+        return self.shown is not None and runtime.frames - self.shown <= 1
+
+    def open(self, screen, static, key, option, options):
+        if self.backdrop is None or self.backdrop.get_size() != screen.get_size():
+            self.backdrop = screen.copy()
+            self.frame = screen.copy()
+        else:
+            self.backdrop.blit(screen, (0, 0))
+        if self.color is not None:
+            self.backdrop.blit(dim_surface(screen.get_size(), self.color), (0, 0))
+        if option is None:
+            self.build(static, key)
+            return
+
+        # The menu's static parts never change while it is up, so they go into
+        # the backdrop, which options are erased back to
+        if static is not None:
+            static(self.backdrop)
+        self.frame.blit(self.backdrop, (0, 0))
+        self.rects = {index: option(self.frame, index, index == key) for index in range(options)}
+        self.key = key
+        self.builds += 1
+
+    def build(self, static, key):
+        self.frame.blit(self.backdrop, (0, 0))
+        if static is not None:
+            static(self.frame)
+        self.key = key
+        self.builds += 1
+
+    def redraw_option(self, option, index, key):
+        rect = self.rects.get(index)
+        if rect is None:
+            return
+        self.frame.blit(self.backdrop, rect, rect)
+        self.rects[index] = option(self.frame, index, index == key)
+        self.option_redraws += 1
+
+    def close(self):
+        # Rebuild from the screen the next time it is shown
+        self.shown = None
@@ -0,0 +1,155 @@
+import time
+import threading
+import pygame
+from pygame import mixer
+from collections import OrderedDict, deque
+from assets import load_sound
+from sounds import reserve_channels, EFFECT_CHANNELS, MUSIC_CHANNELS
+
+FADE_MS = 600
+
+# Decoded tracks that are never dropped, so going back to them is instant
+RESIDENT = {'src/main.mp3'}
+
+
+class MusicPlayer:
+    def __init__(self, max_tracks=3):
+        # Background music is decoded in full off the main thread and played on
+        # two reserved channels, so one track can fade out while the next fades
+        # in. pygame.mixer.music can only stream one track at a time.
+        self.tracks = OrderedDict()  # path -> Sound, least recently used first
+        self.max_tracks = max_tracks
+        self.loading = {}  # path -> Event set when its decode is done
+        self.failed = set()
+        self.lock = threading.RLock()
+
+        self.channels = []
+        self.active = 0
+        self.current = None
+        # Asked for before it was decoded: (path, loops, volume, fade_ms, asked at)
+        self.pending = None
+
+        # Seconds from play() to the track starting, for the last tracks played
+        self.latencies = deque(maxlen=50)
+
+    def setup(self):
+        if self.channels:
+            return True
+        if not mixer.get_init():
+            return False
+        reserve_channels()
+        self.channels = [mixer.Channel(EFFECT_CHANNELS + i) for i in range(MUSIC_CHANNELS)]
+        return True
+
+    def decode(self, path):
+        # Blocks until the track is decoded; safe to call from a worker thread
+        with self.lock:
+            if path in self.tracks or path in self.failed:
+                return
+            done = self.loading.get(path)
+            if done is None:
+                done = self.loading[path] = threading.Event()
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            done.wait()
+            return
+
+        try:
+            sound = load_sound(path)
+        except (pygame.error, FileNotFoundError) as e:
+            print(f"Unable to load music file: {e}")
+            sound = None
+        with self.lock:
+            if sound is None:
+                self.failed.add(path)
+            else:
+                self.tracks[path] = sound
+                self.trim()
+            del self.loading[path]
+            done.set()
+            if self.pending is not None and self.pending[0] == path:
+                if sound is None:
+                    self.pending = None
+                else:
+                    self.start(*self.pending)
+
+    def preload(self, path):
+        # Starts decoding a track in the background
+        if not mixer.get_init():
+            return
+        with self.lock:
+            if path in self.tracks or path in self.loading or path in self.failed:
+                return
+        threading.Thread(target=self.decode, args=(path,), name="music-decode", daemon=True).start()
+
+    def play(self, path, loops=-1, volume=1.0, fade_ms=FADE_MS, restart=False):
+        # Crossfades from whatever is playing. Asking for the track that is
+        # already playing leaves it playing, unless restart is set.
+        if not self.setup():
+            return
+        with self.lock:
+            if path == self.current and not restart and self.channels[self.active].get_busy():
+                self.channels[self.active].set_volume(volume)
+                self.pending = None
+                return
+            self.pending = (path, loops, volume, fade_ms, time.perf_counter())
+            if path in self.tracks:
+                self.start(*self.pending)
+                return
+            if path in self.failed:
+                self.pending = None
+                return
+        # Keeps the old track playing until the new one is ready
+        self.preload(path)
+
+    def start(self, path, loops, volume, fade_ms, asked):
+        with self.lock:
+            self.pending = None
+            sound = self.tracks[path]
+            self.tracks.move_to_end(path)
+
+            old = self.channels[self.active]
+            if old.get_busy():
+                old.fadeout(fade_ms)
+            self.active = 1 - self.active
+            channel = self.channels[self.active]
+            channel.set_volume(volume)
+            channel.play(sound, loops=loops, fade_ms=fade_ms)
+            self.current = path
+
+        # Time from play() to the track starting, reported by stats()
+        self.latencies.append((path, time.perf_counter() - asked))
+
+    def stop(self, fade_ms=FADE_MS):
+        with self.lock:
+            self.pending = None
+            self.current = None
+            for channel in self.channels:
+                if fade_ms:
+                    channel.fadeout(fade_ms)
+                else:
+                    channel.stop()
+
+    def trim(self):
+        # Keeps the resident tracks, the current one and the most recently used
+        keep = RESIDENT | {self.current, self.pending[0] if self.pending else None}
+        removable = [path for path in self.tracks if path not in keep]
+        while len(self.tracks) > self.max_tracks and removable:
+            del self.tracks[removable.pop(0)]
+
+    def stats(self):
+        waits = [latency for path, latency in self.latencies]
+        return {
+            'current': self.current,
+            'decoded': list(self.tracks),
+            'loading': list(self.loading),
+            'plays': len(waits),
+            'last_latency': waits[-1] if waits else None,
+            'max_latency': max(waits) if waits else None,
+        }
+
+
+# Shared by every stage and the menus
+music = MusicPlayer()
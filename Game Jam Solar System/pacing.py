@@ -0,0 +1,106 @@
+import os
+import time
+from collections import deque
+
+# Opt-in: present in step with the display refresh (see scenes.get_screen)
+VSYNC = os.environ.get("SPACE_RANGERS_VSYNC") == "1"
+
+# time.sleep can overshoot by a millisecond or more, so it is only trusted up to
+# this long before the deadline; the rest is spent spinning on the clock
+SPIN_MARGIN = 0.002
+
+
+class FramePacer:
+    def __init__(self, history=240):
+        # Ends every frame at its scene's target rate. Deadlines advance by exactly
+        # one frame interval, so frame times don't drift the way they do when each
+        # frame waits "1 / fps minus however long this frame took".
+        self.vsync = VSYNC
+        self.rate = 0
+        self.deadline = None
+        self.last = None
+
+        # Time between consecutive frame ends, and of that the time spent asleep
+        # (not spinning), in seconds, for the last few seconds
+        self.intervals = deque(maxlen=history)
+        self.slept = deque(maxlen=history)
+        self.last_sleep = 0.0
+
+        # Counters
+        self.frames = 0
+        self.late = 0  # frames that ended more than a whole interval past their deadline
+        self.idle_waits = 0
+
+    def wait(self, fps):
+        # Returns how long it waited, in seconds. fps 0 means no cap.
+        now = time.perf_counter()
+        waited = 0.0
+        self.last_sleep = 0.0
+        if not fps:
+            self.deadline = None
+        else:
+            interval = 1.0 / fps
+            if self.deadline is None or fps != self.rate:
+                self.deadline = (self.last if self.last is not None else now) + interval
+            if now > self.deadline + interval:
+                # Too far behind to catch up without a burst of short frames: start over
+                self.late += 1
+                self.deadline = now
+            waited = self.sleep_until(self.deadline)
+            self.deadline += interval
+        self.rate = fps
+
+        end = time.perf_counter()
+        if self.last is not None:
+            self.intervals.append(end - self.last)
+            self.slept.append(self.last_sleep)
+        self.last = end
+        self.frames += 1
+        return waited
+
+    def idle(self, wait, timeout):
+        # Blocks in wait(timeout) (e.g. for input) after a frame has been paced.
+        # The schedule starts over afterwards, and the wait is not counted as a
+        # frame interval, so idle screens don't show up as late or jittery.
+        start = time.perf_counter()
+        wait(timeout)
+        self.deadline = None
+        self.last = time.perf_counter()
+        self.idle_waits += 1
+        return self.last - start
+
+    def sleep_until(self, deadline):
+        start = time.perf_counter()
+        # With vsync the flip already lines frames up with the display, so the
+        # last stretch is slept off too rather than spun
+        margin = 0.0 if self.vsync else SPIN_MARGIN
+        remaining = deadline - start
+        if remaining > margin:
+            time.sleep(remaining - margin)
+        self.last_sleep = time.perf_counter() - start
+        if not self.vsync:
+            while time.perf_counter() < deadline:
+                pass
+        return time.perf_counter() - start
+
+    def stats(self):
+        count = len(self.intervals)
+        if not count:
+            return {'target_fps': self.rate, 'frames': self.frames, 'late': self.late, 'idle_waits': self.idle_waits}
+        mean = sum(self.intervals) / count
+        jitter = (sum((interval - mean) ** 2 for interval in self.intervals) / count) ** 0.5
+        return {
+            'target_fps': self.rate,
+            'frames': self.frames,
+            'late': self.late,
+            'idle_waits': self.idle_waits,
+            'mean_ms': mean * 1000,
+            'jitter_ms': jitter * 1000,
+            'max_ms': max(self.intervals) * 1000,
+            # Share of the frame time spent asleep rather than working or spinning
+            'idle': sum(self.slept) / sum(self.intervals) if mean else 0.0,
+        }
+
+
+# Shared by every scene loop through runtime.tick
+pacing = FramePacer()
@@ -0,0 +1,115 @@
+import importlib
+import queue
+import threading
+from collections import OrderedDict
+from assets import assets
+from music import music
+
+
+class PrefetchJob:
+    def __init__(self, module_name):
+        self.module_name = module_name
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+        self.module = None
+        self.images = []
+        self.error = None
+
+
+class StagePrefetcher:
+    def __init__(self, max_warm=2):
+        # Stages whose module is imported and whose files are decoded, oldest first
+        self.warm = OrderedDict()
+        self.max_warm = max_warm
+        self.lock = threading.Lock()
+
+        self.current = None
+        self.jobs = queue.Queue()
+        self.worker = threading.Thread(target=self.work, name="stage-prefetch", daemon=True)
+        self.worker.start()
+
+        # Counters
+        self.started = 0
+        self.cancelled = 0
+        self.ready_hits = 0
+
+    def request(self, module_name):
+        # Called every menu frame with the highlighted stage; only acts when it changes
+        if self.current is not None and self.current.module_name == module_name:
+            return
+
+        # The selection moved, so whatever was loading is no longer wanted
+        if self.current is not None and not self.current.done.is_set():
+            self.current.cancelled.set()
+            self.cancelled += 1
+        self.current = None
+
+        with self.lock:
+            if module_name in self.warm:
+                self.warm.move_to_end(module_name)
+                return
+
+        self.current = PrefetchJob(module_name)
+        self.started += 1
+        self.jobs.put(self.current)
+
+    def take(self, module_name):
+        # Hands the stage module over on Enter, waiting for an in-flight prefetch
+        # rather than decoding the same files twice
+        job = self.current
+        if job is not None and job.module_name == module_name:
+            job.done.wait()
+
+        with self.lock:
+            if module_name in self.warm:
+                self.ready_hits += 1
+                self.warm.move_to_end(module_name)
+                return self.warm[module_name].module
+        return importlib.import_module(module_name)
+
+    def work(self):
+        while True:
+            job = self.jobs.get()
+            if job.cancelled.is_set():
+                job.done.set()
+                continue
+            try:
+                job.module = importlib.import_module(job.module_name)
+                for path in getattr(job.module, 'PRELOAD_IMAGES', []):
+                    if job.cancelled.is_set():
+                        break
+                    assets.preload_image(path)
+                    job.images.append(path)
+                for path in getattr(job.module, 'PRELOAD_SOUNDS', []):
+                    if job.cancelled.is_set():
+                        break
+                    assets.sound(path)
+                # The stage's track, so entering it crossfades without waiting on the decoder
+                track = getattr(job.module, 'MUSIC', None)
+                if track is not None and not job.cancelled.is_set():
+                    music.decode(track)
+            except Exception as e:
+                job.error = e
+                print(f"Unable to prefetch {job.module_name}: {e}")
+
+            if job.cancelled.is_set():
+                assets.release(job.images)
+            elif job.error is None:
+                self.make_warm(job)
+            job.done.set()
+
+    def make_warm(self, job):
+        with self.lock:
+            self.warm[job.module_name] = job
+            self.warm.move_to_end(job.module_name)
+            while len(self.warm) > self.max_warm:
+                _, old_job = self.warm.popitem(last=False)
+                assets.release(old_job.images)
+
+    def stats(self):
+        return {
+            'started': self.started,
+            'cancelled': self.cancelled,
+            'ready_hits': self.ready_hits,
+            'warm': list(self.warm.keys()),
+        }
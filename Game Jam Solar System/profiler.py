@@ -0,0 +1,128 @@
+import time
+import pygame
+from collections import deque
+from runtime import runtime
+from pacing import pacing
+from textcache import texts
+from sounds import sounds
+from music import music
+
+TOGGLE_KEY = pygame.K_F3
+
+WIDTH = 260
+LINE_HEIGHT = 18
+GRAPH_HEIGHT = 60
+GRAPH_MS = 33.3  # frame time at the top of the graph
+PADDING = 6
+
+BACKGROUND = (0, 0, 0)
+TEXT = (230, 230, 230)
+BAR = (80, 200, 120)
+SLOW_BAR = (230, 80, 60)
+GUIDE = (90, 90, 90)
+
+
+class Profiler:
+    def __init__(self):
+        # Frame time overlay, toggled with F3 in every stage. The renderer draws
+        # it just before presenting; it shows the timings of the previous frame.
+        self.visible = False
+        self.scene = None  # the running scene, for its entity_counts()
+
+        self.font = None
+        self.lines = []  # rendered text, refreshed a few times per second
+        self.graph = None
+        self.panel = None
+        self.frames = 0
+        self.window = deque(maxlen=15)  # samples since the text was last refreshed
+
+        # How long the overlay itself takes, so it can be left out of the numbers
+        self.draw_time = 0.0
+
+    def handle(self, events):
+        for event in events:
+            if event.type == pygame.KEYDOWN and event.key == TOGGLE_KEY:
+                self.visible = not self.visible
+
+    def setup(self):
+        if self.font is None:
+            self.font = texts.font(None, 20)
+        self.graph = pygame.Surface((WIDTH - 2 * PADDING, GRAPH_HEIGHT))
+        self.graph.fill(BACKGROUND)
+        self.panel = pygame.Surface((WIDTH, PADDING * 3 + GRAPH_HEIGHT))
+        self.panel.set_alpha(200)
+
+    def add_sample(self, sample):
+        # One column per frame: the graph scrolls left instead of being redrawn
+        events, update, draw, present = sample
+        frame_ms = (events + update + draw + present) * 1000
+        width, height = self.graph.get_size()
+        self.graph.scroll(-1, 0)
+        self.graph.fill(BACKGROUND, (width - 1, 0, 1, height))
+        guide = height - int(height * 16.7 / GRAPH_MS)
+        self.graph.set_at((width - 1, guide), GUIDE)
+        bar = min(height, int(height * frame_ms / GRAPH_MS))
+        if bar:
+            color = SLOW_BAR if frame_ms > 16.7 else BAR
+            self.graph.fill(color, (width - 1, height - bar, 1, bar))
+        self.window.append(sample)
+
+    def refresh(self, blits, rects, dirty_percent):
+        count = len(self.window)
+        events, update, draw, present = (sum(phase) / count * 1000 for phase in zip(*self.window))
+        frame = events + update + draw + present
+        text = [
+            f"frame {frame:.2f} ms  ({1000 / frame if frame else 0:.0f} fps)",
+            f"events {events:.2f}  update {update:.2f}",
+            f"draw {draw:.2f}  present {present:.2f} ms",
+            f"blits {blits}  rects {rects}  dirty {dirty_percent:.0f}%",
+        ]
+        counts = getattr(self.scene, 'entity_counts', None)
+        if counts is not None:
+            text.append("  ".join(f"{name} {value}" for name, value in counts().items()))
+        cache = texts.stats()
+        text.append(f"text cache {cache['hit_rate'] * 100:.0f}% hits  {cache['entries']} surfaces  "
+                    f"{cache['fonts']} fonts")
+        voices = sounds.stats()
+        text.append(f"sound {voices['played']} played  {voices['stolen']} stolen  {voices['dropped']} dropped")
+        tracks = music.stats()
+        if tracks['plays']:
+            text.append(f"music load {tracks['last_latency'] * 1000:.0f} ms  max {tracks['max_latency'] * 1000:.0f} ms")
+        pace = pacing.stats()
+        if 'mean_ms' in pace:
+            target = f"{pace['target_fps']} fps" if pace['target_fps'] else "uncapped"
+            text.append(f"pacing {target}  jitter {pace['jitter_ms']:.2f} ms  idle {pace['idle'] * 100:.0f}%")
+        text.append(f"overlay {self.draw_time * 1000:.2f} ms")
+        # Through the shared text cache like every other label; lines that
+        # haven't changed since the last refresh are reused
+        self.lines = [texts.render(self.font, line, True, TEXT) for line in text]
+
+        height = PADDING * 3 + GRAPH_HEIGHT + LINE_HEIGHT * len(self.lines)
+        if self.panel.get_height() != height:
+            self.panel = pygame.Surface((WIDTH, height))
+            self.panel.set_alpha(200)
+        self.panel.fill(BACKGROUND)
+        for i, line in enumerate(self.lines):
+            self.panel.blit(line, (PADDING, PADDING + i * LINE_HEIGHT))
+        self.window.clear()
+
+    def draw(self, screen, blits, rects, dirty_percent):
+        # Returns the area drawn over
+        start = time.perf_counter()
+        if self.graph is None:
+            self.setup()
+        if runtime.last_sample is not None:
+            self.add_sample(runtime.last_sample)
+        self.frames += 1
+        if self.window and (not self.lines or self.frames % self.window.maxlen == 0):
+            self.refresh(blits, rects, dirty_percent)
+
+        graph_y = self.panel.get_height() - PADDING - GRAPH_HEIGHT
+        self.panel.blit(self.graph, (PADDING, graph_y))
+        rect = screen.blit(self.panel, (0, 0))
+        self.draw_time = time.perf_counter() - start
+        return rect
+
+
+# Shared by every stage, like the runtime
+profiler = Profiler()
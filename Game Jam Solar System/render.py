@@ -0,0 +1,123 @@
+import os
+import time
+import pygame
+from collections import deque
+from runtime import runtime
+from profiler import profiler
+
+# Opt-in: present only the rectangles that changed instead of flipping the whole screen
+DIRTY_RECTS = os.environ.get("SPACE_RANGERS_DIRTY_RECTS") == "1"
+
+
+class Renderer:
+    def __init__(self, screen, background=None, dirty=None):
+        self.screen = screen
+        self.screen_area = screen.get_width() * screen.get_height()
+        # Cached background that changed areas are restored from
+        self.background = background
+        # Snapshot of the static part of the current frame, see capture()
+        self.backdrop = None
+        # Stages that repaint the whole screen every frame pass dirty=False
+        self.dirty = DIRTY_RECTS if dirty is None else dirty
+
+        self.full = True  # the next frame has to be redrawn and presented whole
+        self.rects = []   # changed this frame
+        self.drawn = []   # moving things drawn last frame, erased at the next begin()
+
+        # Dirty area of each presented frame, in percent of the screen
+        self.dirty_percent = 100.0
+        self.history = deque(maxlen=600)
+
+        # Blits made through the renderer this frame, and where the profiler overlay was drawn
+        self.blits = 0
+        self.overlay_rect = None
+
+    def begin(self):
+        # Returns True when the whole frame has to be drawn, which is every frame
+        # unless dirty rectangles are enabled
+        if not self.dirty or self.full:
+            if self.background is not None:
+                self.screen.blit(self.background, (0, 0))
+                self.blits += 1
+            self.backdrop = None
+            self.drawn = []
+            return True
+
+        for rect in self.drawn:
+            self.restore(rect)
+        self.drawn = []
+        return False
+
+    def capture(self):
+        # Called after drawing the parts of a full frame that stay put, so things
+        # moving on top of them can be erased without redrawing the whole scene
+        if self.dirty:
+            self.backdrop = self.screen.copy()
+
+    def restore(self, rect):
+        source = self.backdrop if self.backdrop is not None else self.background
+        if source is not None:
+            self.screen.blit(source, rect, rect)
+            self.blits += 1
+        self.mark(rect)
+
+    def blit(self, surface, pos):
+        # Blits something that moves: it is erased again at the next begin()
+        self.blits += 1
+        return self.track(self.screen.blit(surface, pos))
+
+    def track(self, rect):
+        # Same for shapes, given the rect returned by pygame.draw
+        rect = pygame.Rect(rect)
+        self.drawn.append(rect)
+        self.rects.append(rect)
+        return rect
+
+    def mark(self, rect):
+        self.rects.append(pygame.Rect(rect))
+
+    def handle_event(self, event):
+        # Static screens only change on input, so any input means a full redraw
+        if event.type != pygame.MOUSEMOTION:
+            self.full = True
+
+    def invalidate(self):
+        self.full = True
+
+    def draw_overlay(self):
+        if profiler.visible:
+            self.overlay_rect = profiler.draw(self.screen, self.blits, len(self.rects), self.dirty_percent)
+            runtime.overlay_time += profiler.draw_time
+            if self.dirty and not self.full:
+                self.track(self.overlay_rect)
+        elif self.overlay_rect is not None:
+            # Just hidden: repaint what it covered
+            self.overlay_rect = None
+            self.full = True
+
+    def present(self):
+        self.draw_overlay()
+        start = time.perf_counter()
+        if not self.dirty or self.full:
+            pygame.display.flip()
+            self.dirty_percent = 100.0
+            self.full = False
+        else:
+            pygame.display.update(self.rects)
+            # Overlapping rectangles are counted twice, so cap at the screen size
+            area = 0
+            bounds = self.screen.get_rect()
+            for rect in self.rects:
+                clipped = rect.clip(bounds)
+                area += clipped.width * clipped.height
+            self.dirty_percent = min(100.0, 100.0 * area / self.screen_area)
+        runtime.present_time += time.perf_counter() - start
+        self.history.append(self.dirty_percent)
+        self.rects = []
+        self.blits = 0
+        runtime.frame_done()
+
+    def average_dirty_percent(self):
+        if not self.history:
+            return 100.0
+        return sum(self.history) / len(self.history)
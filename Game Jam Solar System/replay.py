@@ -0,0 +1,365 @@
+import os
+import sys
+import mmap
+import time
+import struct
+import argparse
+import pygame
+from runtime import runtime
+from profiler import profiler
+
+# Recorded input of one scene run, appended frame by frame:
+#   header: magic, version, RNG seed, screen size, scene name
+#   then one tagged record per input poll, and one per frame end carrying the
+#   frame's duration in microseconds. A frame without input costs 3 bytes.
+HEADER = struct.Struct('<4sBQHHB')
+MAGIC = b'SRIN'
+VERSION = 1
+
+FRAME_END = 0
+EVENTS_NONE = 1
+EVENTS = 2
+KEYS_SAME = 3
+KEYS = 4
+MOUSE_SAME = 5
+MOUSE = 6
+
+KEY_EVENTS = (pygame.KEYDOWN, pygame.KEYUP)
+BUTTON_EVENTS = (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP)
+
+
+def write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def write_signed(out, value):
+    write_varint(out, (value << 1) ^ (value >> 63))
+
+
+def write_text(out, text):
+    data = text.encode('utf-8')
+    write_varint(out, len(data))
+    out.extend(data)
+
+
+def encode_event(out, event):
+    # Only the attributes the stages read are kept; other event types are
+    # replayed by type alone
+    write_varint(out, event.type)
+    if event.type in KEY_EVENTS:
+        write_varint(out, event.key)
+        write_varint(out, event.mod)
+        write_varint(out, getattr(event, 'scancode', 0))
+        write_text(out, getattr(event, 'unicode', ''))
+    elif event.type in BUTTON_EVENTS:
+        write_signed(out, event.pos[0])
+        write_signed(out, event.pos[1])
+        write_varint(out, event.button)
+    elif event.type == pygame.MOUSEMOTION:
+        write_signed(out, event.pos[0])
+        write_signed(out, event.pos[1])
+        write_signed(out, event.rel[0])
+        write_signed(out, event.rel[1])
+        write_varint(out, sum(1 << i for i, held in enumerate(event.buttons[:3]) if held))
+    elif event.type == pygame.MOUSEWHEEL:
+        write_signed(out, event.x)
+        write_signed(out, event.y)
+        write_varint(out, int(event.flipped))
+    elif event.type == pygame.TEXTINPUT:
+        write_text(out, event.text)
+
+
+class Recorder:
+    def __init__(self, path, scene, seed, size):
+        # One recording per file: an existing file at path is replaced. The header
+        # goes first and frames are only ever added after it.
+        self.file = open(path, 'wb')
+        name = scene.encode('utf-8')
+        self.file.write(HEADER.pack(MAGIC, VERSION, seed, size[0], size[1], len(name)) + name)
+        self.buffer = bytearray()
+        self.keys = None
+        self.mouse = None
+        self.last_time = time.perf_counter()
+        self.frames = 0
+
+    def events(self, events):
+        if not events:
+            self.buffer.append(EVENTS_NONE)
+            return
+        self.buffer.append(EVENTS)
+        write_varint(self.buffer, len(events))
+        for event in events:
+            encode_event(self.buffer, event)
+
+    def pressed(self, state):
+        keys = [index for index, held in enumerate(state) if held]
+        if keys == self.keys:
+            self.buffer.append(KEYS_SAME)
+            return
+        self.keys = keys
+        self.buffer.append(KEYS)
+        write_varint(self.buffer, len(keys))
+        for index in keys:
+            write_varint(self.buffer, index)
+
+    def mouse_pos(self, pos):
+        if pos == self.mouse:
+            self.buffer.append(MOUSE_SAME)
+            return
+        self.mouse = pos
+        self.buffer.append(MOUSE)
+        write_signed(self.buffer, pos[0])
+        write_signed(self.buffer, pos[1])
+
+    def frame_delta(self):
+        # The frame's real duration, rounded to whole microseconds so playback
+        # can add up exactly the same simulation time
+        now = time.perf_counter()
+        micros = max(0, round((now - self.last_time) * 1000000))
+        self.last_time = now
+        self.buffer.append(FRAME_END)
+        write_varint(self.buffer, micros)
+
+        self.frames += 1
+        if self.frames % 60 == 0:
+            self.flush()
+        return micros / 1000000
+
+    def flush(self):
+        self.file.write(self.buffer)
+        self.file.flush()
+        self.buffer = bytearray()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+class ReplayError(Exception):
+    pass
+
+
+class Recording:
+    def __init__(self, path):
+        # Memory-mapped, so long recordings are paged in as they are played
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.seed, width, height, name_length = HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != VERSION:
+            raise ReplayError(f"{path} is not an input recording")
+        self.size = (width, height)
+        start = HEADER.size
+        self.scene = bytes(self.data[start:start + name_length]).decode('utf-8')
+        self.offset = start + name_length
+
+        self.keys = pygame.key.ScancodeWrapper([False] * 512)
+        self.mouse = (0, 0)
+        self.frames = 0
+
+    def read_varint(self):
+        value = 0
+        shift = 0
+        while True:
+            if self.offset >= len(self.data):
+                raise ReplayError("recording ended")
+            byte = self.data[self.offset]
+            self.offset += 1
+            value |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
+
+    def read_signed(self):
+        value = self.read_varint()
+        return (value >> 1) ^ -(value & 1)
+
+    def read_text(self):
+        length = self.read_varint()
+        text = bytes(self.data[self.offset:self.offset + length]).decode('utf-8')
+        self.offset += length
+        return text
+
+    def read_tag(self, *expected):
+        if self.offset >= len(self.data):
+            raise ReplayError("recording ended")
+        tag = self.data[self.offset]
+        self.offset += 1
+        if tag not in expected:
+            # The stage polled differently than when it was recorded
+            raise ReplayError(f"replay diverged at frame {self.frames}: record {tag}, expected {expected}")
+        return tag
+
+    def decode_event(self):
+        kind = self.read_varint()
+        if kind in KEY_EVENTS:
+            attributes = {'key': self.read_varint(), 'mod': self.read_varint(), 'scancode': self.read_varint(),
+                          'unicode': self.read_text()}
+        elif kind in BUTTON_EVENTS:
+            attributes = {'pos': (self.read_signed(), self.read_signed()), 'button': self.read_varint()}
+        elif kind == pygame.MOUSEMOTION:
+            pos = (self.read_signed(), self.read_signed())
+            rel = (self.read_signed(), self.read_signed())
+            buttons = self.read_varint()
+            attributes = {'pos': pos, 'rel': rel, 'buttons': tuple(bool(buttons >> i & 1) for i in range(3))}
+        elif kind == pygame.MOUSEWHEEL:
+            attributes = {'x': self.read_signed(), 'y': self.read_signed(), 'flipped': bool(self.read_varint())}
+        elif kind == pygame.TEXTINPUT:
+            attributes = {'text': self.read_text()}
+        else:
+            attributes = {}
+        return pygame.event.Event(kind, attributes)
+
+    def events(self):
+        if self.read_tag(EVENTS_NONE, EVENTS) == EVENTS_NONE:
+            return []
+        return [self.decode_event() for _ in range(self.read_varint())]
+
+    def pressed(self):
+        if self.read_tag(KEYS_SAME, KEYS) == KEYS:
+            state = [False] * 512
+            for _ in range(self.read_varint()):
+                state[self.read_varint()] = True
+            self.keys = pygame.key.ScancodeWrapper(state)
+        return self.keys
+
+    def mouse_pos(self):
+        if self.read_tag(MOUSE_SAME, MOUSE) == MOUSE:
+            self.mouse = (self.read_signed(), self.read_signed())
+        return self.mouse
+
+    def frame_delta(self):
+        self.read_tag(FRAME_END)
+        self.frames += 1
+        return self.read_varint() / 1000000
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+
+class Input:
+    def __init__(self):
+        # What the stage loops poll instead of pygame.event.get(),
+        # pygame.key.get_pressed() and pygame.mouse.get_pos(). Live input by
+        # default, optionally recorded; or played back from a recording.
+        self.recorder = None
+        self.recording = None
+        # Taken off the queue by wait(), handed out by the next events()
+        self.held = []
+        runtime.wait_for_input = self.wait
+
+    def events(self):
+        start = time.perf_counter()
+        if self.recording is not None:
+            events = self.recording.events()
+        else:
+            events = self.held + pygame.event.get()
+            self.held = []
+            if self.recorder is not None:
+                self.recorder.events(events)
+        profiler.handle(events)
+        runtime.event_time += time.perf_counter() - start
+        return events
+
+    def pressed(self):
+        if self.recording is not None:
+            return self.recording.pressed()
+        state = pygame.key.get_pressed()
+        if self.recorder is not None:
+            self.recorder.pressed(state)
+        return state
+
+    def mouse_pos(self):
+        if self.recording is not None:
+            return self.recording.mouse_pos()
+        pos = pygame.mouse.get_pos()
+        if self.recorder is not None:
+            self.recorder.mouse_pos(pos)
+        return pos
+
+    def wait(self, timeout):
+        # Blocks until input arrives or timeout seconds pass (see runtime.tick).
+        # A recording plays back frame by frame, so it never blocks.
+        if self.recording is not None:
+            return
+        event = pygame.event.wait(max(1, int(timeout * 1000)))
+        if event.type != pygame.NOEVENT:
+            self.held.append(event)
+
+    def record(self, path, scene, size):
+        # A fresh seed per recording, stored in the header
+        runtime.configure(seed=runtime.new_seed(), headless=runtime.headless, size=runtime.size,
+                          frame_cap=runtime.frame_cap, max_frames=runtime.max_frames)
+        self.recorder = Recorder(path, scene, runtime.seed, size)
+        runtime.virtual_clock = True
+        runtime.frame_delta = self.recorder.frame_delta
+
+    def play(self, recording):
+        self.recording = recording
+        runtime.virtual_clock = True
+        runtime.frame_delta = recording.frame_delta
+
+    def stop(self):
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.recording is not None:
+            self.recording.close()
+        self.recorder = None
+        self.recording = None
+        runtime.virtual_clock = runtime.headless
+        runtime.frame_delta = None
+
+
+# Shared by every stage loop
+inputs = Input()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record a stage's input, or play a recording back")
+    commands = parser.add_subparsers(dest='command', required=True)
+    record = commands.add_parser('record', help="play a stage and record the input")
+    record.add_argument('scene')
+    record.add_argument('path')
+    play = commands.add_parser('play', help="play a recording back")
+    play.add_argument('path')
+    play.add_argument('--headless', action='store_true', help="no display, as fast as possible")
+    args = parser.parse_args()
+
+    if args.command == 'play' and args.headless:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+    from scenes import SceneManager
+    from runtime import SimulationDone
+
+    if args.command == 'record':
+        manager = SceneManager()
+        inputs.record(args.path, args.scene, manager.screen.get_size())
+        try:
+            manager.push(args.scene)
+        finally:
+            inputs.stop()
+        return 0
+
+    recording = Recording(args.path)
+    runtime.configure(seed=recording.seed, headless=args.headless, size=recording.size,
+                      frame_cap=not args.headless)
+    manager = SceneManager()
+    inputs.play(recording)
+    start = time.perf_counter()
+    try:
+        manager.push(recording.scene)
+    except (ReplayError, SimulationDone) as e:
+        print(e)
+    finally:
+        frames = recording.frames
+        inputs.stop()
+    print(f"Replayed {frames} frames of {recording.scene} in {time.perf_counter() - start:.2f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
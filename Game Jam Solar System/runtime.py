@@ -0,0 +1,121 @@
+import random
+import time
+from pacing import pacing
+
+
+# Longest an idle screen sleeps without input, so things checked once a frame
+# (e.g. the F3 overlay) still come round now and then
+IDLE_TIMEOUT = 0.5
+
+
+class SimulationDone(Exception):
+    # Raised at the end of the last frame of a run limited to max_frames
+    pass
+
+
+class Runtime:
+    def __init__(self):
+        # Randomness, time and frame pacing as seen by the stages, so a run can be
+        # made deterministic and detached from the wall clock
+        self.seed = self.new_seed()
+        self.rng = random.Random(self.seed)
+
+        self.headless = False
+        self.size = None  # virtual screen size, None for the desktop size
+        self.frame_cap = True
+
+        # Virtual clock: advances by one frame interval per presented frame, or by
+        # what frame_delta() returns when set (replay.py records and replays it)
+        self.virtual_clock = False
+        self.virtual_time = 0.0
+        self.frame_time = 1.0 / 60
+        self.frame_delta = None
+
+        self.frames = 0
+        self.max_frames = None
+        # Called with the frame number after each frame, e.g. to inject scripted input
+        self.on_frame = None
+        # Blocks until input arrives or the timeout (seconds) passes, set by replay.Input
+        self.wait_for_input = None
+
+        # Where each frame's time went, in seconds. The input poll adds the time
+        # spent getting events, FixedStep the time spent in update ticks and the
+        # renderer the time spent presenting; the rest of the frame counts as
+        # drawing, except for the profiler overlay and waiting for the next frame.
+        # Kept per frame while profiling.
+        self.event_time = 0.0
+        self.update_time = 0.0
+        self.present_time = 0.0
+        self.overlay_time = 0.0
+        self.wait_time = 0.0
+        self.frame_start = None
+        self.last_sample = None
+        self.profiling = False
+        self.samples = []  # (events, update, draw, present)
+
+    def configure(self, seed=None, headless=False, size=None, frame_cap=True, max_frames=None):
+        if seed is not None:
+            self.seed = seed
+        self.rng.seed(self.seed)
+        self.headless = headless
+        self.virtual_clock = headless
+        self.size = size
+        self.frame_cap = frame_cap
+        self.max_frames = max_frames
+        self.virtual_time = 0.0
+        self.frames = 0
+        self.frame_start = None
+        self.last_sample = None
+        self.samples = []
+
+    def now(self):
+        # Clock for the simulation (see loop.FixedStep)
+        if self.virtual_clock:
+            return self.virtual_time
+        return time.perf_counter()
+
+    def new_seed(self):
+        return random.randrange(2 ** 32)
+
+    def tick(self, fps, idle=False, timeout=None):
+        # Ends a frame of a scene loop: waits until it is time for the next one at
+        # fps frames per second (0 for no cap, see pacing.py). A scene passes idle
+        # when nothing on screen moves until the player does something; the loop
+        # then sleeps until input arrives, or timeout seconds (e.g. until a timer
+        # of the scene's own is due). Uncapped runs never sleep.
+        if fps:
+            self.frame_time = 1.0 / fps
+        self.wait_time += pacing.wait(fps if self.frame_cap else 0)
+        if idle and self.frame_cap and self.wait_for_input is not None:
+            timeout = IDLE_TIMEOUT if timeout is None else max(0.0, min(timeout, IDLE_TIMEOUT))
+            self.wait_time += pacing.idle(self.wait_for_input, timeout)
+
+    def frame_done(self):
+        # Called once per presented frame
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            draw_time = (now - self.frame_start - self.event_time - self.update_time - self.present_time
+                         - self.overlay_time - self.wait_time)
+            self.last_sample = (self.event_time, self.update_time, draw_time, self.present_time)
+            if self.profiling:
+                self.samples.append(self.last_sample)
+        self.frame_start = now
+        self.event_time = 0.0
+        self.update_time = 0.0
+        self.present_time = 0.0
+        self.overlay_time = 0.0
+        self.wait_time = 0.0
+
+        self.frames += 1
+        if self.frame_delta is not None:
+            self.virtual_time += self.frame_delta()
+        elif self.virtual_clock:
+            self.virtual_time += self.frame_time
+        if self.on_frame is not None:
+            self.on_frame(self.frames)
+        if self.max_frames is not None and self.frames >= self.max_frames:
+            raise SimulationDone()
+
+
+# Shared by every stage, like the asset manager
+runtime = Runtime()
@@ -0,0 +1,112 @@
+import os
+import time
+import importlib
+import pygame
+from runtime import runtime
+from pacing import VSYNC
+from profiler import profiler
+
+# Scene name -> (module, class, entry point). Every scene class takes the shared
+# screen surface in its constructor and returns from its entry point when done:
+#   "quit"                  the window was closed
+#   ("replace", name)       swap this scene for another one
+#   anything else           pop back to whoever pushed it (usually "main_menu")
+STAGES = {
+    "prologue": ("prologue", "Prologue", "run"),
+    "earth": ("Earth", "Earth", "main"),
+    "mars": ("Mars", "Mars", "main"),
+    "venus": ("Venus", "Venus", "main"),
+    "jupiter": ("Jupiter", "Jupiter", "main"),
+    "saturn": ("Saturn", "Saturn", "run"),
+    "uranus": ("Uranus", "Uranus", "main"),
+    "neptune": ("Neptune", "Neptune", "main"),
+    "mercury": ("Mercury", "Mercury", "main"),
+    "sun": ("Sun", "Sun", "main"),
+    "epilogue": ("final", "Epilogue", "run"),
+    "solarsystem": ("solarsystem", "SolarSystem", "main"),
+}
+
+# Resolution every stage draws at, e.g. "1920x1080", or "native" for the desktop
+# size. SDL scales the finished frame up to the display and maps mouse positions
+# back to this size, so layout and per-frame pixel work stop depending on the monitor.
+RESOLUTION = os.environ.get("SPACE_RANGERS_RESOLUTION", "1280x720")
+
+screen = None
+
+
+def parse_size(text):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def get_screen():
+    # The one display surface of the game, created on first use and again if the
+    # runtime asks for a different (virtual) size
+    global screen
+    if screen is None or (runtime.size is not None and screen.get_size() != tuple(runtime.size)):
+        pygame.init()
+        if runtime.size is not None:
+            screen = pygame.display.set_mode(runtime.size)
+        elif RESOLUTION == "native":
+            info = pygame.display.Info()
+            screen = pygame.display.set_mode((info.current_w, info.current_h))
+        else:
+            screen = pygame.display.set_mode(parse_size(RESOLUTION), pygame.SCALED | pygame.FULLSCREEN,
+                                             vsync=1 if VSYNC else 0)
+    return screen
+
+
+class SceneManager:
+    def __init__(self, screen=None, loader=None):
+        self.screen = screen or get_screen()
+        # Anything with take(module_name), e.g. the level menu's StagePrefetcher
+        self.loader = loader
+        self.stack = []
+        self.transitions = []
+
+    def create(self, name):
+        module_name, class_name, entry_point = STAGES[name]
+        if self.loader is not None:
+            module = self.loader.take(module_name)
+        else:
+            module = importlib.import_module(module_name)
+        scene = getattr(module, class_name)(self.screen)
+        return scene, entry_point
+
+    def push(self, name):
+        # Runs the scene until it finishes and returns its result to the caller
+        kind = "push"
+        while True:
+            start = time.perf_counter()
+            scene, entry_point = self.create(name)
+            self.record(kind, name, start)
+
+            self.stack.append(name)
+            outer_scene, profiler.scene = profiler.scene, scene
+            try:
+                result = getattr(scene, entry_point)()
+            finally:
+                self.stack.pop()
+                profiler.scene = outer_scene
+            self.report(name, scene)
+
+            if isinstance(result, tuple) and result[0] == "replace":
+                kind, name = "replace", result[1]
+                continue
+            return result
+
+    def record(self, kind, name, start):
+        elapsed = time.perf_counter() - start
+        self.transitions.append((kind, name, elapsed))
+        print(f"Scene {kind} {name}: {elapsed * 1000:.1f} ms")
+
+    def report(self, name, scene):
+        # How much of the screen the scene actually presented, when it tracks dirty rectangles
+        renderer = getattr(scene, 'renderer', None)
+        if renderer is not None and renderer.dirty:
+            print(f"Scene {name}: dirty area {renderer.average_dirty_percent():.1f}% of the screen")
+
+    def run(self, name):
+        # Entry point for running a single scene on its own
+        if self.push(name) == "quit":
+            pygame.quit()
@@ -1,26 +1,36 @@
 import pygame
 import math
-import sys
 import os
-import random
-from pygame import mixer
-from mainscreen import main_screen
-import ctypes
+from assets import assets
+from textcache import texts
+from modal import Modal
+from music import music
+from scenes import SceneManager
+from runtime import runtime
+from replay import inputs
+from render import Renderer
+from loop import FixedStep
+from mipmaps import ZoomCache
+from viewport import Viewport
+from minimap import Minimap
+from ephemeris import Ephemeris
+from belt import Belt
 
 
 def load_image(name):
-    return pygame.image.load(os.path.join('planets', f"{name}.png"))
+    return assets.image(os.path.join('planets', f"{name}.png"), alpha=True)
 
 
 class SolarSystem:
-    def __init__(self):
-        # Initialize Pygame
-        pygame.init()
-
-        # Get the screen size
-        user32 = ctypes.windll.user32
-        self.WIDTH = user32.GetSystemMetrics(0)
-        self.HEIGHT = user32.GetSystemMetrics(1)
+    def __init__(self, screen):
+        # Shared display surface
+        self.screen = screen
+        # The whole scene moves every frame, so there are no dirty rectangles to track
+        self.renderer = Renderer(screen, dirty=False)
+        self.pause_modal = Modal()
+        # Seeded by the runtime, so a run can be reproduced
+        self.rng = runtime.rng
+        self.WIDTH, self.HEIGHT = screen.get_size()
 
         # Adjust minimap size based on screen dimensions
         self.MINIMAP_WIDTH = int(self.WIDTH * 0.15)
@@ -30,6 +40,12 @@ class SolarSystem:
         self.BLACK = (0, 0, 0)
         self.GREY = (169, 169, 169)
         self.FPS = 60
+        self.MINIMAP_RATE = 10  # minimap updates per second
+        self.ASTEROIDS = 20000
+        self.KUIPER_OBJECTS = 10000
+
+        pygame.display.set_caption("2D Solar System")
+        music.stop()
 
         # Load images
         self.images = {
@@ -48,8 +64,14 @@ class SolarSystem:
         # Rotate spaceship image 45 degrees clockwise
         self.images['spaceship'] = pygame.transform.rotate(self.images['spaceship'], -45)
 
+        # Bodies scaled to the current zoom, kept for the last few zoom levels
+        self.sprites = ZoomCache(self.images)
+        # Decides which orbits and bodies are on screen, and counts them
+        self.viewport = Viewport(self.WIDTH, self.HEIGHT)
+
         # Adjust orbital details based on screen size
         scale_factor = min(self.WIDTH, self.HEIGHT) / 800
+        self.scale_factor = scale_factor
         self.PLANETS = {
             'mercury': (1500 * scale_factor, 20 * scale_factor, 0.0005),
             'venus': (3000 * scale_factor, 35 * scale_factor, 0.0004),
@@ -60,11 +82,10 @@ class SolarSystem:
             'uranus': (15000 * scale_factor, 50 * scale_factor, 0.0001),
             'neptune': (18000 * scale_factor, 50 * scale_factor, 0.00008),
         }
-
-        # Setup display
-        self.screen = pygame.display.set_mode((self.WIDTH, self.HEIGHT))
-        pygame.display.set_caption("2D Solar System")
-        pygame.mixer.music.stop()
+        # The same bodies as one table of arrays, which all positions are worked out from
+        self.bodies = Ephemeris()
+        for planet, (distance, radius, speed) in self.PLANETS.items():
+            self.bodies.add(planet, distance, radius, speed)
 
         # Sun's details
         self.sun_pos = (0, 0)
@@ -75,7 +96,7 @@ class SolarSystem:
         self.spaceship_speed = 7 * scale_factor
         self.spaceship_radius = 25 * scale_factor
         self.spaceship_angle = 0  # Angle in radians, 0 is now pointing right
-        self.rotation_speed = 0.1  # Radians per frame
+        self.rotation_speed = 0.1  # Radians per tick
 
         # Zoom level and scaling factor
         self.zoom_level = 1.0
@@ -85,20 +106,37 @@ class SolarSystem:
         # Create starry background
         self.starry_background = self.create_starry_background()
 
-        self.font = pygame.font.Font(None, int(74 * scale_factor))
-        self.small_font = pygame.font.Font(None, int(36 * scale_factor))
+        # Asteroid belt between Mars and Jupiter, and Kuiper belt objects past Neptune
+        self.belts = [
+            Belt(self.rng.getrandbits(32), self.ASTEROIDS, 6600 * scale_factor, 8400 * scale_factor, 0.00024,
+                 scale_factor),
+            Belt(self.rng.getrandbits(32), self.KUIPER_OBJECTS, 19500 * scale_factor, 24000 * scale_factor, 0.00007,
+                 scale_factor),
+        ]
+        self.minimap = self.create_minimap()
+
+        self.font = texts.font(None, int(74 * scale_factor))
+        self.small_font = texts.font(None, int(36 * scale_factor))
 
         # Pause state
         self.paused = False
 
+        # Orbits and the spaceship advance at a fixed rate, and are drawn
+        # interpolated between the last two ticks
+        self.loop = FixedStep(tick_rate=self.FPS)
+        self.tick = 0
+        self.positions = self.bodies.positions(self.tick)  # body positions relative to the Sun
+        self.previous_positions = self.positions
+        self.previous_spaceship_pos = list(self.spaceship_pos)
+
     def create_starry_background(self):
         background = pygame.Surface((self.WIDTH, self.HEIGHT))
         background.fill(self.BLACK)
         for _ in range(300):  # Increased number of stars
-            x = random.randint(0, self.WIDTH)
-            y = random.randint(0, self.HEIGHT)
-            brightness = random.randint(100, 255)  # Increased minimum brightness
-            star_size = random.choice([1, 1, 1, 2])  # Most stars are 1 pixel, some are 2
+            x = self.rng.randint(0, self.WIDTH)
+            y = self.rng.randint(0, self.HEIGHT)
+            brightness = self.rng.randint(100, 255)  # Increased minimum brightness
+            star_size = self.rng.choice([1, 1, 1, 2])  # Most stars are 1 pixel, some are 2
             if star_size == 1:
                 background.set_at((x, y), (brightness, brightness, brightness))
             else:
@@ -106,93 +144,126 @@ class SolarSystem:
         return background
 
     def draw_orbits(self, offset_x, offset_y):
-        for planet, (distance, radius, speed) in self.PLANETS.items():
-            orbit_radius = distance * self.zoom_level
-            orbit_pos = (
-                int(self.sun_pos[0] * self.zoom_level + offset_x),
-                int(self.sun_pos[1] * self.zoom_level + offset_y)
-            )
-            pygame.draw.circle(self.screen, self.WHITE, orbit_pos, int(orbit_radius), 1)
-
-    def draw_solar_system(self, angles):
+        # Orbits that don't cross the screen are skipped, and ones that don't fit
+        # on it are drawn as polylines along their visible arcs only
+        orbit_pos = (
+            int(self.sun_pos[0] * self.zoom_level + offset_x),
+            int(self.sun_pos[1] * self.zoom_level + offset_y)
+        )
+        # Eccentric orbits (none yet) aren't outlined
+        for distance in self.bodies.axis[self.bodies.eccentricity == 0].tolist():
+            orbit_radius = int(distance * self.zoom_level)
+            if not self.viewport.ring_visible(orbit_pos[0], orbit_pos[1], orbit_radius):
+                continue
+            if self.viewport.contains_circle(orbit_pos[0], orbit_pos[1], orbit_radius):
+                pygame.draw.circle(self.screen, self.WHITE, orbit_pos, orbit_radius, 1)
+            else:
+                for arc in self.viewport.arcs(orbit_pos[0], orbit_pos[1], orbit_radius):
+                    pygame.draw.lines(self.screen, self.WHITE, False, arc)
+
+    def entity_counts(self):
+        # Shown by the profiler overlay: orbits, bodies and rocks drawn and culled this frame
+        return {'drawn': self.viewport.drawn, 'culled': self.viewport.culled,
+                'rocks': sum(belt.blitted + belt.plotted for belt in self.belts)}
+
+    def update(self):
+        self.previous_positions = self.positions
+        self.previous_spaceship_pos = list(self.spaceship_pos)
+
+        self.update_spaceship()
+        self.tick += 1
+        self.positions = self.bodies.positions(self.tick)
+
+    def draw_solar_system(self):
         # Draw starry background
         self.screen.blit(self.starry_background, (0, 0))
 
-        offset_x = self.WIDTH // 2 - self.spaceship_pos[0] * self.zoom_level
-        offset_y = self.HEIGHT // 2 - self.spaceship_pos[1] * self.zoom_level
+        positions = self.loop.lerp(self.previous_positions, self.positions)
+        spaceship_x = self.loop.lerp(self.previous_spaceship_pos[0], self.spaceship_pos[0])
+        spaceship_y = self.loop.lerp(self.previous_spaceship_pos[1], self.spaceship_pos[1])
+
+        offset_x = self.WIDTH // 2 - spaceship_x * self.zoom_level
+        offset_y = self.HEIGHT // 2 - spaceship_y * self.zoom_level
 
+        self.viewport.begin()
         self.draw_orbits(offset_x, offset_y)
 
+        # Draw the belts, behind the Sun and planets
+        tick = self.loop.lerp(self.tick - 1, self.tick)
+        for belt in self.belts:
+            belt.draw(self.screen, self.viewport, tick, self.zoom_level,
+                      self.sun_pos[0] * self.zoom_level + offset_x, self.sun_pos[1] * self.zoom_level + offset_y)
+
         # Draw Sun
         sun_screen_pos = (self.sun_pos[0] * self.zoom_level + offset_x, self.sun_pos[1] * self.zoom_level + offset_y)
-        sun_image = pygame.transform.scale(self.images['sun'], (
-            int(self.sun_radius * 2 * self.zoom_level), int(self.sun_radius * 2 * self.zoom_level)))
-        self.screen.blit(sun_image, (int(sun_screen_pos[0] - self.sun_radius * self.zoom_level),
-                                     int(sun_screen_pos[1] - self.sun_radius * self.zoom_level)))
-
-        # Draw Planets
-        for planet, (distance, radius, speed) in self.PLANETS.items():
-            angle = angles[planet]
-            x = self.sun_pos[0] + distance * math.cos(angle)
-            y = self.sun_pos[1] + distance * math.sin(angle)
-            planet_screen_pos = (x * self.zoom_level + offset_x, y * self.zoom_level + offset_y)
-            planet_image = pygame.transform.scale(self.images[planet], (
-                int(radius * 2 * self.zoom_level), int(radius * 2 * self.zoom_level)))
+        if self.viewport.circle_visible(sun_screen_pos[0], sun_screen_pos[1], self.sun_radius * self.zoom_level):
+            sun_size = int(self.sun_radius * 2 * self.zoom_level)
+            sun_image = self.sprites.sprite('sun', self.zoom_level, (sun_size, sun_size))
+            self.screen.blit(sun_image, (int(sun_screen_pos[0] - self.sun_radius * self.zoom_level),
+                                         int(sun_screen_pos[1] - self.sun_radius * self.zoom_level)))
+
+        # Draw Planets, culled all at once; only the visible ones are visited one by one
+        screen_x = (self.sun_pos[0] + positions[0]) * self.zoom_level + offset_x
+        screen_y = (self.sun_pos[1] + positions[1]) * self.zoom_level + offset_y
+        screen_radius = self.bodies.radius * self.zoom_level
+        for i in self.viewport.circles_visible(screen_x, screen_y, screen_radius).nonzero()[0].tolist():
+            planet = self.bodies.names[i]
+            radius = self.bodies.radius[i]
+            planet_size = int(radius * 2 * self.zoom_level)
+            planet_image = self.sprites.sprite(planet, self.zoom_level, (planet_size, planet_size))
             self.screen.blit(planet_image, (
-                int(planet_screen_pos[0] - radius * self.zoom_level),
-                int(planet_screen_pos[1] - radius * self.zoom_level)))
-            angles[planet] += speed
+                int(screen_x[i] - radius * self.zoom_level),
+                int(screen_y[i] - radius * self.zoom_level)))
 
         # Draw Spaceship in the center of the screen
-        spaceship_image = pygame.transform.scale(self.images['spaceship'], (
-            int(self.spaceship_radius * 2 * self.zoom_level), int(self.spaceship_radius * 2 * self.zoom_level)))
-        rotated_spaceship = pygame.transform.rotate(spaceship_image, -math.degrees(self.spaceship_angle))
+        spaceship_size = int(self.spaceship_radius * 2 * self.zoom_level)
+        rotated_spaceship = self.sprites.sprite('spaceship', self.zoom_level, (spaceship_size, spaceship_size),
+                                                -math.degrees(self.spaceship_angle))
         spaceship_rect = rotated_spaceship.get_rect(center=(self.WIDTH // 2, self.HEIGHT // 2))
         self.screen.blit(rotated_spaceship, spaceship_rect)
 
         # Draw Minimap
-        self.draw_minimap(angles, offset_x, offset_y)
-
-        pygame.display.update()
-
-    def draw_minimap(self, angles, offset_x, offset_y):
-        minimap = pygame.Surface((self.MINIMAP_WIDTH, self.MINIMAP_HEIGHT))
-        minimap.fill((100, 120, 140))  # Bluish grey background color
-
-        # Draw Sun on minimap
-        sun_minimap_pos = (self.MINIMAP_WIDTH // 2, self.MINIMAP_HEIGHT // 2)
-        sun_minimap_image = pygame.transform.scale(self.images['sun'], (10, 10))
-        minimap.blit(sun_minimap_image, (sun_minimap_pos[0] - 5, sun_minimap_pos[1] - 5))
-
-        # Calculate maximum distance from sun
-        max_distance = max(self.PLANETS.values(), key=lambda x: x[0])[0]
-
-        # Scale factors
-        scale_x = self.MINIMAP_WIDTH / (2 * max_distance)
-        scale_y = self.MINIMAP_HEIGHT / (2 * max_distance)
-
-        # Draw Planets on minimap
-        for planet, (distance, radius, speed) in self.PLANETS.items():
-            angle = angles[planet]
-            x = sun_minimap_pos[0] + distance * scale_x * math.cos(angle)
-            y = sun_minimap_pos[1] + distance * scale_y * math.sin(angle)
-            planet_minimap_image = pygame.transform.scale(self.images[planet],
-                                                          (max(2, int(radius / 5)), max(2, int(radius / 5))))
-            minimap.blit(planet_minimap_image, (
-                int(x - planet_minimap_image.get_width() / 2), int(y - planet_minimap_image.get_height() / 2)))
-
-        # Draw Spaceship on minimap
-        spaceship_minimap_pos = (sun_minimap_pos[0] + self.spaceship_pos[0] * scale_x,
-                                 sun_minimap_pos[1] + self.spaceship_pos[1] * scale_y)
-        spaceship_minimap_image = pygame.transform.scale(self.images['spaceship'], (6, 6))
-        rotated_minimap_spaceship = pygame.transform.rotate(spaceship_minimap_image,
-                                                            -math.degrees(self.spaceship_angle))
-        minimap.blit(rotated_minimap_spaceship, (int(spaceship_minimap_pos[0] - 3), int(spaceship_minimap_pos[1] - 3)))
-
-        self.screen.blit(minimap, (self.WIDTH - self.MINIMAP_WIDTH - 10, 10))
+        self.draw_minimap(positions, offset_x, offset_y)
+
+        self.renderer.present()
+
+    def create_minimap(self):
+        # The Sun never moves, so it is part of the minimap's background
+        sun_size = max(2, int(10 * self.scale_factor))
+        ship_size = max(2, int(6 * self.scale_factor))
+        icons = {'sun': pygame.transform.scale(self.images['sun'], (sun_size, sun_size)),
+                 'spaceship': pygame.transform.scale(self.images['spaceship'], (ship_size, ship_size))}
+        for planet, radius in zip(self.bodies.names, self.bodies.radius.tolist()):
+            icons[planet] = pygame.transform.scale(self.images[planet], (max(2, int(radius / 5)), max(2, int(radius / 5))))
+        minimap = Minimap((self.MINIMAP_WIDTH, self.MINIMAP_HEIGHT), (100, 120, 140), icons,  # Bluish grey background
+                          rate=self.MINIMAP_RATE)
+        minimap.draw_static('sun', (self.MINIMAP_WIDTH // 2, self.MINIMAP_HEIGHT // 2))
+
+        # Scale factors from the farthest orbit
+        max_distance = (self.bodies.axis * (1 + self.bodies.eccentricity)).max()
+        self.minimap_scale = (self.MINIMAP_WIDTH / (2 * max_distance), self.MINIMAP_HEIGHT / (2 * max_distance))
+        return minimap
+
+    def draw_minimap(self, positions, offset_x, offset_y):
+        # Between updates the minimap is drawn as it was
+        if self.minimap.due():
+            self.update_minimap(positions)
+        margin = int(10 * self.scale_factor)
+        self.minimap.draw(self.screen, (self.WIDTH - self.MINIMAP_WIDTH - margin, margin))
+
+    def update_minimap(self, body_positions):
+        scale_x, scale_y = self.minimap_scale
+        center_x, center_y = self.MINIMAP_WIDTH // 2, self.MINIMAP_HEIGHT // 2
+        xs = (center_x + body_positions[0] * scale_x).tolist()
+        ys = (center_y + body_positions[1] * scale_y).tolist()
+        positions = {planet: (x, y, 0) for planet, x, y in zip(self.bodies.names, xs, ys)}
+        positions['spaceship'] = (center_x + self.spaceship_pos[0] * scale_x,
+                                  center_y + self.spaceship_pos[1] * scale_y,
+                                  -math.degrees(self.spaceship_angle))
+        self.minimap.update(positions)
 
     def update_spaceship(self):
-        keys = pygame.key.get_pressed()
+        keys = inputs.pressed()
         moved = False
 
         target_angle = None
@@ -222,32 +293,28 @@ class SolarSystem:
         return moved
 
     def pause_menu(self):
-        overlay = pygame.Surface((self.WIDTH, self.HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 180))
-        self.screen.blit(overlay, (0, 0))
-
-        pause_text = self.font.render("Paused", True, self.WHITE)
-        self.screen.blit(pause_text, (self.WIDTH // 2 - pause_text.get_width() // 2, self.HEIGHT // 2 - 150))
+        # The solar system isn't redrawn while paused, so the modal dims the last frame
+        self.pause_modal.draw(self.screen, self.draw_pause_options)
+        self.renderer.present()
 
-        resume_text = self.small_font.render("Press 'R' to Resume", True, self.WHITE)
-        self.screen.blit(resume_text, (self.WIDTH // 2 - resume_text.get_width() // 2, self.HEIGHT // 2 - 50))
+    def draw_pause_options(self, surface):
+        pause_text = texts.render(self.font, "Paused", True, self.WHITE)
+        surface.blit(pause_text, (self.WIDTH // 2 - pause_text.get_width() // 2, self.HEIGHT // 2 - int(150 * self.scale_factor)))
 
-        restart_text = self.small_font.render("Press 'N' to Restart", True, self.WHITE)
-        self.screen.blit(restart_text, (self.WIDTH // 2 - restart_text.get_width() // 2, self.HEIGHT // 2))
+        resume_text = texts.render(self.small_font, "Press 'R' to Resume", True, self.WHITE)
+        surface.blit(resume_text, (self.WIDTH // 2 - resume_text.get_width() // 2, self.HEIGHT // 2 - int(50 * self.scale_factor)))
 
-        quit_text = self.small_font.render("Press 'Q' to Quit", True, self.WHITE)
-        self.screen.blit(quit_text, (self.WIDTH // 2 - quit_text.get_width() // 2, self.HEIGHT // 2 + 50))
+        restart_text = texts.render(self.small_font, "Press 'N' to Restart", True, self.WHITE)
+        surface.blit(restart_text, (self.WIDTH // 2 - restart_text.get_width() // 2, self.HEIGHT // 2))
 
-        pygame.display.update()
+        quit_text = texts.render(self.small_font, "Press 'Q' to Quit", True, self.WHITE)
+        surface.blit(quit_text, (self.WIDTH // 2 - quit_text.get_width() // 2, self.HEIGHT // 2 + int(50 * self.scale_factor)))
 
     def main(self):
-        clock = pygame.time.Clock()
-        angles = {planet: 0 for planet in self.PLANETS}  # Initial angles for planets
-
         running = True
 
         while running:
-            for event in pygame.event.get():
+            for event in inputs.events():
                 if event.type == pygame.QUIT:
                     running = False
                 elif event.type == pygame.KEYDOWN:
@@ -256,9 +323,9 @@ class SolarSystem:
                     elif event.key == pygame.K_r and self.paused:
                         self.paused = False
                     elif event.key == pygame.K_n and self.paused:
-                        self.__init__()
+                        self.__init__(self.screen)
                     elif event.key == pygame.K_q and self.paused:
-                        return # main_screen()
+                        return
                         # running = False
                 elif event.type == pygame.MOUSEBUTTONDOWN and not self.paused:
                     if event.button == 4:  # Scroll up
@@ -267,17 +334,16 @@ class SolarSystem:
                         self.zoom_level = max(self.zoom_level - 0.1, self.max_zoom_in)
 
             if not self.paused:
-                self.update_spaceship()
-                self.draw_solar_system(angles)
+                self.loop.step(self.update)
+                self.draw_solar_system()
             else:
+                self.loop.hold()
                 self.pause_menu()
 
-            clock.tick(self.FPS)
+            runtime.tick(self.FPS)
 
-        pygame.quit()
-        sys.exit()
+        return "quit"
 
 
 if __name__ == "__main__":
-    game = SolarSystem()
-    game.main()
+    SceneManager().run("solarsystem")
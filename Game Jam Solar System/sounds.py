@@ -0,0 +1,107 @@
+from pygame import mixer
+from assets import assets
+
+# Effect name -> (path, most voices at once, priority). When every channel is
+# busy a new effect takes over the oldest voice of a lower or equal priority.
+EFFECTS = {
+    'laser': ('src/laser.wav', 4, 1),
+    'pop': ('src/pop.mp3', 3, 2),
+    'jump': ('src/jumpshort.mp3', 2, 2),
+    'explosion': ('src/explosion.wav', 3, 3),
+}
+
+# The first mixer channels are reserved: effects play on these, and the two
+# after them are for music (see music.py)
+EFFECT_CHANNELS = 8
+MUSIC_CHANNELS = 2
+
+
+def reserve_channels():
+    total = EFFECT_CHANNELS + MUSIC_CHANNELS
+    if mixer.get_num_channels() < total:
+        mixer.set_num_channels(total)
+    mixer.set_reserved(total)
+
+
+class SoundBank:
+    def __init__(self):
+        # Effects play on a pool of reserved mixer channels, so they never
+        # compete with anything that asks the mixer for a free channel
+        self.channels = []
+        self.voices = []  # (effect, priority, start) per channel, None when idle
+        self.clock = 0  # counts plays, to find the oldest voice
+
+        # Counters
+        self.played = 0
+        self.dropped = 0
+        self.stolen = 0
+
+    def setup(self):
+        if self.channels:
+            return True
+        if not mixer.get_init():
+            return False
+        reserve_channels()
+        self.channels = [mixer.Channel(i) for i in range(EFFECT_CHANNELS)]
+        self.voices = [None] * EFFECT_CHANNELS
+        return True
+
+    def sound(self, name):
+        # Decoded once and kept by the asset manager; the level menu prefetcher
+        # decodes a stage's PRELOAD_SOUNDS ahead of time on its worker thread
+        return assets.sound(EFFECTS[name][0])
+
+    def preload(self, names=None):
+        for name in names or EFFECTS:
+            self.sound(name)
+
+    def play(self, name):
+        if not self.setup():
+            self.dropped += 1
+            return None
+        path, max_voices, priority = EFFECTS[name]
+
+        # Forget voices that have finished
+        for i, channel in enumerate(self.channels):
+            if self.voices[i] is not None and not channel.get_busy():
+                self.voices[i] = None
+
+        # Over the effect's own limit: restart its oldest voice
+        own = [i for i, voice in enumerate(self.voices) if voice is not None and voice[0] == name]
+        if len(own) >= max_voices:
+            index = min(own, key=lambda i: self.voices[i][2])
+            self.stolen += 1
+        else:
+            index = next((i for i, voice in enumerate(self.voices) if voice is None), None)
+            if index is None:
+                candidates = [i for i, voice in enumerate(self.voices) if voice[1] <= priority]
+                if not candidates:
+                    self.dropped += 1
+                    return None
+                index = min(candidates, key=lambda i: (self.voices[i][1], self.voices[i][2]))
+                self.stolen += 1
+
+        channel = self.channels[index]
+        channel.play(self.sound(name))
+        self.clock += 1
+        self.voices[index] = (name, priority, self.clock)
+        self.played += 1
+        return channel
+
+    def stop(self):
+        for i, channel in enumerate(self.channels):
+            channel.stop()
+            self.voices[i] = None
+
+    def stats(self):
+        return {
+            'played': self.played,
+            'dropped': self.dropped,
+            'stolen': self.stolen,
+            'active': sum(1 for voice in self.voices if voice is not None),
+            'channels': len(self.channels),
+        }
+
+
+# Shared by every stage, like the asset manager
+sounds = SoundBank()
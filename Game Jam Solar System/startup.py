@@ -0,0 +1,112 @@
+import os
+import sys
+import time
+
+# Cold start, from the first line of mainscreen.py to the first menu frame on screen
+STARTUP_BUDGET = 1.5  # seconds
+
+# Modules that belong to the game rather than to Python or pygame
+GAME_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class TimedLoader:
+    # Wraps a module's loader to time running the module's body
+    def __init__(self, loader, profile, name):
+        self.loader = loader
+        self.profile = profile
+        self.name = name
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        self.profile.enter()
+        start = time.perf_counter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            self.profile.leave(self.name, getattr(module, '__file__', None), time.perf_counter() - start)
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+
+class ImportTimer:
+    # Meta path finder that finds nothing itself; it asks the finders after it
+    # and wraps the loader they return
+    def __init__(self, profile):
+        self.profile = profile
+
+    def find_spec(self, name, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+            spec.loader = TimedLoader(spec.loader, self.profile, name)
+        return spec
+
+
+class StartupProfile:
+    def __init__(self):
+        # Off unless mainscreen is run with --startup-profile
+        self.enabled = False
+        self.start = None
+        self.finder = None
+        self.imports = []  # (module, file, seconds including its own imports, seconds excluding them)
+        self.children = []  # seconds spent in nested imports, one entry per import in progress
+        self.marks = []  # (label, seconds since start)
+
+    def begin(self):
+        self.enabled = True
+        self.start = time.perf_counter()
+        self.finder = ImportTimer(self)
+        sys.meta_path.insert(0, self.finder)
+
+    def enter(self):
+        self.children.append(0.0)
+
+    def leave(self, name, path, seconds):
+        nested = self.children.pop()
+        if self.children:
+            self.children[-1] += seconds
+        self.imports.append((name, path, seconds, seconds - nested))
+
+    def mark(self, label):
+        if self.enabled:
+            self.marks.append((label, time.perf_counter() - self.start))
+
+    def first_frame(self):
+        # Called after each menu frame; reports once, after the first one
+        if not self.enabled:
+            return
+        self.mark("first frame")
+        self.enabled = False
+        if self.finder in sys.meta_path:
+            sys.meta_path.remove(self.finder)
+        self.report()
+
+    def report(self, top=15):
+        own = [entry for entry in self.imports if entry[1] and entry[1].startswith(GAME_DIR)]
+        print("Startup profile")
+        print(f"  imports: {len(self.imports)} modules, {sum(entry[3] for entry in self.imports) * 1000:.1f} ms")
+        print(f"  game modules ({len(own)}), ms including / excluding their imports:")
+        for name, path, total, alone in own:
+            print(f"    {name:<14} {total * 1000:8.1f} {alone * 1000:8.1f}")
+        print("  slowest modules, excluding their imports:")
+        for name, path, total, alone in sorted(self.imports, key=lambda entry: -entry[3])[:top]:
+            print(f"    {name:<44} {alone * 1000:8.1f}")
+        for label, seconds in self.marks:
+            print(f"  {label}: {seconds * 1000:.1f} ms")
+
+        elapsed = self.marks[-1][1]
+        verdict = "within" if elapsed <= STARTUP_BUDGET else "OVER"
+        print(f"  {elapsed * 1000:.0f} ms to the first frame, {verdict} the {STARTUP_BUDGET * 1000:.0f} ms budget")
+
+
+# Filled in by mainscreen.py when run with --startup-profile
+startup = StartupProfile()
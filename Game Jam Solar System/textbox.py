@@ -0,0 +1,130 @@
+import pygame
+from textcache import texts
+
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+BORDER = 3
+
+# Advance width of each character, keyed by (font, character)
+glyph_widths = {}
+
+
+def glyph_width(font, char):
+    key = (font, char)
+    width = glyph_widths.get(key)
+    if width is None:
+        metrics = font.metrics(char)
+        if metrics and metrics[0] is not None:
+            width = metrics[0][4]
+        else:
+            width = font.size(char)[0]
+        glyph_widths[key] = width
+    return width
+
+
+def text_width(font, text):
+    return sum(glyph_width(font, char) for char in text)
+
+
+class TextBox:
+    def __init__(self, x, y, width, height, font_size, line_spacing=5, padding=10, reveal_speed=1):
+        # Dialogue box that types its text out a few characters per frame. The
+        # box is kept on its own surface and only newly revealed characters are
+        # blitted onto it, so drawing it costs one blit however long the text is.
+        self.rect = pygame.Rect(x, y, width, height)
+        self.font = texts.font(None, font_size)
+        self.line_spacing = line_spacing
+        self.padding = padding
+        self.reveal_speed = reveal_speed
+
+        self.surface = pygame.Surface(self.rect.size)
+        self.text = ""
+        self.pages = []
+        self.current_text_index = 0
+        self.lines = []  # (content, rendered line, x offset of each character, y)
+        self.total_length = 0
+        self.reveal_index = 0
+
+        # How far the box surface has been drawn
+        self.revealed = 0
+        self.line_no = 0
+        self.char_no = 0
+
+    def set_text(self, text):
+        # A list of strings is shown one page after another (see is_finished)
+        self.text = text
+        self.pages = list(text) if isinstance(text, list) else [text]
+        self.current_text_index = 0
+        self.set_current_text()
+
+    def set_current_text(self):
+        y = self.padding
+        self.lines = []
+        for content in self.wrap_text(self.pages[self.current_text_index], self.rect.width - 2 * self.padding):
+            rendered = texts.render(self.font, content, True, WHITE)
+            offsets = [0]
+            for char in content:
+                offsets.append(min(offsets[-1] + glyph_width(self.font, char), rendered.get_width()))
+            offsets[-1] = rendered.get_width()
+            self.lines.append((content, rendered, offsets, y))
+            y += rendered.get_height() + self.line_spacing
+        self.total_length = sum(len(content) for content, rendered, offsets, y in self.lines)
+
+        self.surface.fill(BLACK)
+        pygame.draw.rect(self.surface, WHITE, self.surface.get_rect(), BORDER)
+        self.reveal_index = 0
+        self.revealed = 0
+        self.line_no = 0
+        self.char_no = 0
+
+    def wrap_text(self, text, max_width):
+        space = glyph_width(self.font, ' ')
+        wrapped_lines = []
+        for paragraph in text.split('\n'):
+            current_line = []
+            current_width = 0
+            for word in paragraph.split(' '):
+                word_width = text_width(self.font, word)
+                if current_line and current_width + word_width + space > max_width:
+                    wrapped_lines.append(' '.join(current_line))
+                    current_line = []
+                    current_width = 0
+                current_line.append(word)
+                current_width += word_width + space
+            wrapped_lines.append(' '.join(current_line))
+        return wrapped_lines
+
+    def update(self):
+        self.reveal_index = min(self.reveal_index + self.reveal_speed, self.total_length)
+
+    def reveal_all(self):
+        self.reveal_index = self.total_length
+
+    def reveal_spans(self):
+        # Copies the characters revealed since the last draw onto the box surface
+        target = min(self.reveal_index, self.total_length)
+        while self.revealed < target:
+            content, rendered, offsets, y = self.lines[self.line_no]
+            if self.char_no >= len(content):
+                self.line_no += 1
+                self.char_no = 0
+                continue
+            end = min(len(content), self.char_no + target - self.revealed)
+            left, right = offsets[self.char_no], offsets[end]
+            self.surface.blit(rendered, (self.padding + left, y), (left, 0, right - left, rendered.get_height()))
+            self.revealed += end - self.char_no
+            self.char_no = end
+
+    def draw(self, surface):
+        self.reveal_spans()
+        return surface.blit(self.surface, self.rect)
+
+    def is_finished(self):
+        # When a page is fully shown and more follow, moves on to the next one
+        if self.reveal_index < self.total_length:
+            return False
+        if self.current_text_index < len(self.pages) - 1:
+            self.current_text_index += 1
+            self.set_current_text()
+            return False
+        return True
@@ -0,0 +1,69 @@
+import pygame
+from collections import OrderedDict
+
+
+class TextCache:
+    def __init__(self, max_entries=512):
+        # Font objects keyed by (face, size), kept for the whole run
+        self.fonts = {}
+        # Rendered text keyed by (text, font, color, antialias, background), kept
+        # in least-recently-used order
+        self.rendered = OrderedDict()
+        self.max_entries = max_entries
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.font_hits = 0
+        self.font_misses = 0
+
+    def font(self, face, size):
+        # Stands in for pygame.font.Font(face, size)
+        key = (face, size)
+        font = self.fonts.get(key)
+        if font is None:
+            font = pygame.font.Font(face, size)
+            self.fonts[key] = font
+            self.font_misses += 1
+        else:
+            self.font_hits += 1
+        return font
+
+    def render(self, font, text, antialias, color, background=None):
+        # Stands in for font.render(text, antialias, color, background). The font
+        # object is part of the key, so it has to come from font() above to be reused.
+        key = (text, font, tuple(color), antialias, background if background is None else tuple(background))
+        surface = self.rendered.get(key)
+        if surface is not None:
+            self.rendered.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, antialias, color, background)
+        self.rendered[key] = surface
+        if len(self.rendered) > self.max_entries:
+            self.rendered.popitem(last=False)
+            self.evictions += 1
+        return surface
+
+    def clear(self):
+        self.rendered.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': len(self.rendered),
+            'fonts': len(self.fonts),
+            'font_hits': self.font_hits,
+            'font_misses': self.font_misses,
+        }
+
+
+# Shared by every stage, like the asset manager
+texts = TextCache()
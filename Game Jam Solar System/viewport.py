@@ -0,0 +1,93 @@
+import math
+import numpy as np
+
+
+class Viewport:
+    def __init__(self, width, height, margin=2, segment=6):
+        # The screen, in screen pixels, for deciding what is worth drawing.
+        # It is a little larger than the screen so outlines and sprites that
+        # touch the edge aren't cut off early.
+        self.left = -margin
+        self.top = -margin
+        self.right = width + margin
+        self.bottom = height + margin
+        # Longest side of the polylines that stand in for circle outlines
+        self.segment = segment
+
+        # Counters for the current frame
+        self.drawn = 0
+        self.culled = 0
+
+    def begin(self):
+        # Call at the start of each frame
+        self.drawn = 0
+        self.culled = 0
+
+    def count(self, visible):
+        if visible:
+            self.drawn += 1
+        else:
+            self.culled += 1
+        return visible
+
+    def inside(self, x, y):
+        return self.left <= x <= self.right and self.top <= y <= self.bottom
+
+    def nearest_distance(self, x, y):
+        # From (x, y) to the closest point of the viewport (0 when inside it)
+        nearest_x = min(max(x, self.left), self.right)
+        nearest_y = min(max(y, self.top), self.bottom)
+        return math.hypot(x - nearest_x, y - nearest_y)
+
+    def farthest_distance(self, x, y):
+        return math.hypot(max(x - self.left, self.right - x), max(y - self.top, self.bottom - y))
+
+    def contains_circle(self, x, y, radius):
+        return (self.left <= x - radius and x + radius <= self.right and
+                self.top <= y - radius and y + radius <= self.bottom)
+
+    def circle_visible(self, x, y, radius):
+        # Whether a filled circle (e.g. a body's bounding circle) overlaps the viewport
+        return self.count(self.nearest_distance(x, y) <= radius)
+
+    def circles_visible(self, xs, ys, radii):
+        # circle_visible for arrays of circles at once; returns a mask of the visible ones
+        nearest_x = np.clip(xs, self.left, self.right)
+        nearest_y = np.clip(ys, self.top, self.bottom)
+        visible = (xs - nearest_x) ** 2 + (ys - nearest_y) ** 2 <= radii ** 2
+        drawn = int(np.count_nonzero(visible))
+        self.drawn += drawn
+        self.culled += len(visible) - drawn
+        return visible
+
+    def ring_visible(self, x, y, radius):
+        # Whether a circle's outline crosses the viewport: it doesn't when the
+        # viewport lies wholly inside or wholly outside the circle
+        return self.count(self.nearest_distance(x, y) <= radius <= self.farthest_distance(x, y))
+
+    def arcs(self, x, y, radius):
+        # The parts of a circle's outline inside the viewport, each as a list of
+        # points for pygame.draw.lines
+        # Angles where the outline crosses the lines along the viewport's edges
+        angles = [0.0, 2 * math.pi]
+        for edge in (self.left, self.right):
+            if abs(edge - x) < radius:
+                angle = math.acos((edge - x) / radius)
+                angles += [angle, 2 * math.pi - angle]
+        for edge in (self.top, self.bottom):
+            if abs(edge - y) < radius:
+                angle = math.asin((edge - y) / radius)
+                angles += [angle % (2 * math.pi), math.pi - angle]
+        angles.sort()
+
+        # Between two crossings the outline is either wholly inside or wholly outside
+        arcs = []
+        for start, end in zip(angles, angles[1:]):
+            middle = (start + end) / 2
+            if end - start <= 0 or not self.inside(x + radius * math.cos(middle), y + radius * math.sin(middle)):
+                continue
+            steps = max(1, math.ceil((end - start) * radius / self.segment))
+            step = (end - start) / steps
+            arcs.append([(x + radius * math.cos(start + i * step), y + radius * math.sin(start + i * step))
+                         for i in range(steps + 1)])
+        return arcs